@@ -9,8 +9,9 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+from core.asgi import get_asgi_application  # django's, reading streaming responses (the recipe export) off the event loop
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+os.environ.setdefault('SERVER_MODE', 'asgi')  # serve the async versions of the views, see SERVER_MODE in settings
 
 application = get_asgi_application()
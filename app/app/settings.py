@@ -36,6 +36,15 @@ ALLOWED_HOSTS.extend(
     )
 )
 
+# 1 for workers that only serve the api (production): leaves out the admin, the swagger ui (api/docs/) and the browsable API renderer,
+# so workers import, and keep in memory, less; see the profile_imports command
+API_ONLY = bool(int(os.environ.get('API_ONLY', 0)))
+
+# uwsgi workers (the most cheaper mode may grow to) and request threads in each, exported by scripts/run.sh with these same defaults;
+# a worker serves at most UWSGI_THREADS requests at once, the per process pools below are sized from them
+UWSGI_PROCESSES = int(os.environ.get('UWSGI_PROCESSES', (os.cpu_count() or 1) * 2 + 1))
+UWSGI_THREADS = int(os.environ.get('UWSGI_THREADS', 2))
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -45,6 +54,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # full text search (recipe search)
     # add apps here
     'core',
     'rest_framework',
@@ -53,8 +63,12 @@ INSTALLED_APPS = [
     'user',
     'recipe',
 ]
+if API_ONLY:
+    INSTALLED_APPS.remove('django.contrib.admin')  # also skips importing core.admin, which only the admin's autodiscovery does
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',  # first, so its timings cover all the other middleware
+    'core.middleware.CompressionMiddleware',  # before anything that changes the body, and inside the metrics so they record bytes on the wire
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,20 +102,122 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# 'pgbouncer' when DB_HOST/DB_PORT point at pgbouncer (the pgbouncer service in docker-compose, in transaction pooling mode) instead of
+# postgres itself, '' to connect directly; the db_pool metrics (core.db_pool) then include pgbouncer's pools too
+DB_POOL = os.environ.get('DB_POOL', '')
+# server connections pgbouncer keeps for the app (its DEFAULT_POOL_SIZE, set from the same DB_POOL_SIZE in docker-compose-deploy.yml);
+# one per request thread, UWSGI_PROCESSES x UWSGI_THREADS, means a request never waits for one, fewer share them (core.checks warns)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', UWSGI_PROCESSES * UWSGI_THREADS))
+
 DATABASES = {
     'default': {
     # THIS IS THE BASIC SQL DATABASE BUILT IN FOR DJANGO
         # 'ENGINE': 'django.db.backends.sqlite3',
         # 'NAME': BASE_DIR / 'db.sqlite3',
         # configuring the postgres db that docker-compose references so docker can get environ variables to build, login to db server
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.backends.postgresql',  # django's postgresql backend plus connection metrics and CONN_HEALTH_CHECKS
         'HOST': os.environ.get('DB_HOST'),
+        'PORT': os.environ.get('DB_PORT', ''),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # each worker thread keeps its connection for this many seconds instead of connecting (tcp + auth) on every request; 0 closes
+        # it after each request, None never does. the app needs a connection per uwsgi worker thread, workers x threads in total
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': bool(int(os.environ.get('DB_CONN_HEALTH_CHECKS', 1))),  # check a reused connection still works before a request uses it
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOL == 'pgbouncer',  # pgbouncer's transaction pooling can't keep a cursor open across transactions
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
     }
 }
 
+# read replicas of the default database, comma separated host[:port] ie DB_REPLICA_HOSTS=replica1,replica2:5433, each added as an alias
+# (replica1, replica2, ...) with the default's other settings; safe requests to the recipe, tag and ingredient views read from one of
+# them (core.db_router). in tests a replica mirrors the default database; the suite runs without replicas (docker-compose.yml),
+# recipe.tests.test_recipe_replicas adds a stand-in replica alias itself
+DB_REPLICAS = []
+for number, replica in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = replica.strip().partition(':')
+    DB_REPLICAS.append(f'replica{number}')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# a user's reads stay on the primary this long after they write; the pin is kept in the default cache, which must be shared by every
+# worker for the others to see it (checked by core.checks before the app starts)
+DB_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 10))
+DB_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))  # seconds a replica may lag before reads fall back to the primary; keep below the pin
+DB_REPLICA_LAG_CHECK_SECONDS = float(os.environ.get('DB_REPLICA_LAG_CHECK_SECONDS', 5))  # how often each worker measures a replica's lag
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# local memory by default (per process, used in tests/dev); point CACHE_BACKEND/CACHE_LOCATION at a shared cache in production, ie
+# the memcached service of docker-compose-deploy.yml: CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache CACHE_LOCATION=cache:11211
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# seconds a cached recipe list/detail response is kept for (recipe.cache); writes invalidate it sooner, 0 turns the cache off
+RECIPE_CACHE_TIMEOUT = int(os.environ.get('RECIPE_CACHE_TIMEOUT', 300))
+
+# response compression (core.middleware.CompressionMiddleware): bodies smaller than COMPRESSION_MIN_SIZE bytes are sent as is, brotli
+# is used when the Brotli package is installed, and the compressed bytes of the paths in COMPRESSION_CACHED_PATHS are cached
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+COMPRESSION_CACHED_PATHS = ['/api/schema/']
+COMPRESSION_CACHE_TIMEOUT = int(os.environ.get('COMPRESSION_CACHE_TIMEOUT', 3600))
+
+# recipe bulk import/export (recipe.bulk): rows validated and inserted per transaction, and the most rows one import request may hold;
+# an export streams all of a user's recipes in one request, under uwsgi it must finish within UWSGI_HARAKIRI (scripts/run.sh, 300s by
+# default, sized for it) or the worker is killed mid-stream and the client gets a truncated file; raise both together for bigger exports
+RECIPE_IMPORT_CHUNK_SIZE = int(os.environ.get('RECIPE_IMPORT_CHUNK_SIZE', 500))
+RECIPE_IMPORT_MAX_ROWS = int(os.environ.get('RECIPE_IMPORT_MAX_ROWS', 10000))
+
+# token -> user cache used by core.authentication.CachedTokenAuthentication
+# entries live in each worker process for up to TTL seconds, so without a shared tier a deleted token or deactivated user keeps working in
+# the other workers for up to that long; set TOKEN_AUTH_SHARED_CACHE to a CACHES alias to share the entries between workers and have every
+# worker see an eviction on its next request (at the cost of one shared cache get per request)
+TOKEN_AUTH_CACHE_TTL = int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60))
+TOKEN_AUTH_CACHE_SIZE = int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 10000))
+TOKEN_AUTH_SHARED_CACHE = os.environ.get('TOKEN_AUTH_SHARED_CACHE') or None
+
+
+# request metrics (core.middleware.RequestMetricsMiddleware), served per worker at /api/metrics/
+REQUEST_METRICS_SAMPLE_RATE = float(os.environ.get('REQUEST_METRICS_SAMPLE_RATE', 1.0))  # fraction of requests timed, logged and given Server-Timing headers
+REQUEST_METRICS_WINDOW = int(os.environ.get('REQUEST_METRICS_WINDOW', 1000))  # latest requests kept per view for the histograms
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))  # queries slower than this are logged (for every request), 0 disables
+METRICS_ALLOWED_IPS = list(filter(None, os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1').split(',')))  # besides staff users
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'app.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'WARNING'),  # INFO logs a json line per sampled request
+            'propagate': False,
+        },
+        'app.db.slow': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -121,6 +237,21 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# password hashing runs on a bounded thread pool (core.hashers) so login/sign up bursts can't take over every uwsgi worker
+# the 'pbkdf2_sha256' hasher comes first (used for new hashes), the others can still verify old hashes
+PASSWORD_HASHERS = [
+    'core.hashers.PooledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 260000))  # django 3.2's default
+# the pool is per process, so workers + queue must stay below UWSGI_THREADS for it to ever fill up and answer 503 rather than have
+# every request thread of the process hashing or waiting to; by default half the threads may hash and one is always kept out of it
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', max(UWSGI_THREADS // 2, 1)))
+PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', max(UWSGI_THREADS - PASSWORD_HASH_WORKERS - 1, 0)))  # hashes allowed to wait for a free worker
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 2))  # seconds to wait for a queue slot before answering 503
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -143,10 +274,30 @@ USE_TZ = True
 STATIC_URL = '/static/static/'
 MEDIA_URL = '/static/media/'
 
-# docker container location
-STATIC_ROOT = '/vol/web/static'
+# docker container location; the image collects static files into its own STATIC_ROOT at build time, scripts/run.sh copies them to
+# /vol/web/static for nginx
+STATIC_ROOT = os.environ.get('STATIC_ROOT', '/vol/web/static')
 MEDIA_ROOT = '/vol/web/media'
 
+# hashed static file names (core.storage), served by nginx with immutable caching
+STATICFILES_STORAGE = 'core.storage.ManifestStaticStorage'
+
+# 'public': nginx serves uploaded images straight from /static/media/; 'protected': image urls point at /api/media/, which checks the
+# image belongs to the requesting user and then has nginx send the file (X-Accel-Redirect to MEDIA_ACCEL_REDIRECT_PREFIX, an internal
+# location in proxy/default.conf.tpl); set the proxy's MEDIA_ACCESS to the same value. without a prefix (ie runserver) django sends the file
+MEDIA_ACCESS = os.environ.get('MEDIA_ACCESS', 'public')
+if MEDIA_ACCESS == 'protected':
+    MEDIA_URL = '/api/media/'
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX', '' if DEBUG else '/protected/media/')
+
+# uploads bigger than this are streamed to a temp file on disk in chunks instead of being held in memory
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.environ.get('FILE_UPLOAD_MAX_MEMORY_SIZE', 512 * 1024))
+
+# resized recipe image variants (recipe.images) are generated on a background pool: 'process', 'thread' or 'sync' (inline, for tests)
+IMAGE_PROCESSING_EXECUTOR = os.environ.get('IMAGE_PROCESSING_EXECUTOR', 'process')
+IMAGE_PROCESSING_WORKERS = int(os.environ.get('IMAGE_PROCESSING_WORKERS', 1))
+IMAGE_PROCESSING_ATTEMPTS = int(os.environ.get('IMAGE_PROCESSING_ATTEMPTS', 3))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -158,9 +309,39 @@ AUTH_USER_MODEL = 'core.User'  # why is this not core.models.User?
 # configure the django rest framework to USE the drf_spectacular auto schema generator
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',  # orjson when installed, same output as DRF's JSONRenderer
+    ] + ([] if API_ONLY else ['rest_framework.renderers.BrowsableAPIRenderer']),
+    # nginx (proxy/) appends the address it got the request from to X-Forwarded-For, so that last entry is the client's IP for the throttles;
+    # anything before it came from the client and can't be trusted. 0 when nothing sits in front of the app, to use REMOTE_ADDR
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 1)),
+    # rates for the throttles in user.throttles, applied to /api/user/token/; their counts are kept in the default cache, so with the
+    # local memory one each worker process counts on its own and the real limit is the rate times the number of workers
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.environ.get('LOGIN_IP_THROTTLE_RATE', '30/min'),
+        'login_email': os.environ.get('LOGIN_EMAIL_THROTTLE_RATE', '10/min'),
+    },
 }
 
+# default page size for the paginated list endpoints (recipe.pagination), api users can lower/raise it per request up to the pagination class max
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 50))
+
+# render the recipe/tag/ingredient lists from .values() rows instead of model instances (recipe.fast), set to 0 to use the serializers
+API_FAST_READ_PATH = bool(int(os.environ.get('API_FAST_READ_PATH', 1)))
+
 # need to set this setting to be able to view images in our swagger api site
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
+
+# the OpenAPI schema is generated once per code version into SCHEMA_ROOT (core.schema, the generate_schema command in the Dockerfile);
+# set APP_VERSION (ie the git sha) at build time, otherwise the version is a hash of the source files
+SCHEMA_ROOT = os.environ.get('SCHEMA_ROOT', '/vol/web/schema')
+APP_VERSION = os.environ.get('APP_VERSION', '')
+
+# 'wsgi' (uwsgi, app.wsgi) or 'asgi' (gunicorn + uvicorn workers, app.asgi), chosen by scripts/run.sh; under ASGI the health check,
+# the recipe/tag/ingredient lists and image uploads are served by async views (core.async_views), which is set when the urls load
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+
+# address of the uwsgi stats server (the same env var uwsgi reads its --stats option from, see scripts/run.sh), added to the metrics endpoint
+UWSGI_STATS = os.environ.get('UWSGI_STATS', '')
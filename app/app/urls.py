@@ -13,26 +13,39 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-)
-from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
 from core import views as core_views
+from recipe import views as recipe_views
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
-    path('api/health-check/', core_views.health_check, name='health-check'),  # to check our api's health
-    path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),  # this url endpoint will auto generate the SCHEMA for our API
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs'),  # this url endpoint will use our defined schema to create a graphical interface for the api
+    path(
+        'api/health-check/',
+        core_views.health_check_async if settings.SERVER_MODE == 'asgi' else core_views.health_check,
+        name='health-check',
+    ),  # to check our api's health
+    path('api/metrics/', core_views.metrics, name='metrics'),  # internal per view latency/db metrics
+    path('api/schema/', core_views.schema, name='api-schema'),  # the SCHEMA for our API, generated once per code version by the generate_schema command
     path('api/user/', include('user.urls')),  # include allows us to include urls from diff apps
     path('api/recipe/', include('recipe.urls')),
+    path('api/media/<path:path>', recipe_views.media, name='media'),  # recipe images for their owners only, when MEDIA_ACCESS is 'protected'
 ]
 
+# left out of workers that only serve the api (API_ONLY in settings)
+if not settings.API_ONLY:
+    from django.contrib import admin  # importing it loads the admin even when it's not installed
+
+    urlpatterns += [
+        path('admin/', admin.site.urls),
+        path(
+            'api/docs/',
+            core_views.lazy_view('core.docs.SchemaSwaggerView', url_name='api-schema'),
+            name='api-docs',
+        ),  # this url endpoint will use our defined schema to create a graphical interface for the api, imported on its first request
+    ]
+
 # if dev mode (debugging) then include in urlpatterns a path to our mock user upload media files
 if settings.DEBUG:
     urlpatterns += static(
@@ -10,7 +10,12 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# import the urlconf, and with it every view, now rather than on each worker's first request: uwsgi loads this module in its master
+# process and forks the workers from it, so they share the imported code's memory (copy on write) instead of each importing its own
+get_resolver().url_patterns
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core import signals  # noqa: F401 connects the token cache invalidation receivers
+        from core import hashers  # noqa: F401 registers the hashing pool metrics
+        from core import db_pool  # noqa: F401 registers the database connection metrics
+        from core import uwsgi_stats  # noqa: F401 registers the uwsgi server metrics
+        from core import db_router  # noqa: F401 registers the read replica metrics
+        from core import checks  # noqa: F401 registers the system checks
@@ -0,0 +1,50 @@
+"""
+ASGI handler for serving the app over ASGI (SERVER_MODE=asgi, app.asgi).
+"""
+from itertools import islice
+
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+
+
+STREAMING_PARTS_PER_CALL = 64  # parts of a streaming response read per trip to the sync thread, ie 64 recipes of an export
+
+
+# django 3.2's handler reads a streaming response's iterator on the event loop, so one that queries the database as it goes (the
+# recipe export, recipe.bulk.export_recipes) raises SynchronousOnlyOperation once the headers are already sent; this one reads it on
+# the thread sync views run on, a few parts at a time, and sends them from the loop
+class StreamingASGIHandler(ASGIHandler):
+    """ASGI handler that iterates streaming responses off the event loop."""
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        response_headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            response_headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            response_headers.append((b'Set-Cookie', cookie.output(header='').encode('ascii').strip()))
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': response_headers})
+
+        parts = iter(response)  # __iter__ rather than streaming_content, like django, in case a subclass overrides it
+        read_parts = sync_to_async(lambda: list(islice(parts, STREAMING_PARTS_PER_CALL)), thread_sensitive=True)
+        while True:
+            batch = await read_parts()
+            if not batch:
+                break
+            for part in batch:
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def get_asgi_application():
+    """Set up django and return the app's ASGI handler, like django.core.asgi.get_asgi_application."""
+    django.setup(set_prefix=False)
+    return StreamingASGIHandler()
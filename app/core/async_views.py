@@ -0,0 +1,37 @@
+"""
+Async views for serving the app over ASGI (SERVER_MODE=asgi, app.asgi).
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+
+from django.db import close_old_connections
+
+from core.metrics import current_timings
+from core.middleware import instrument_connections
+
+
+# django 3.2 has no async ORM and runs sync views on a single thread per process under ASGI (thread_sensitive), so one slow view
+# would hold up every other one; this runs the view on the default thread pool instead, in parallel with the other requests
+def run_in_thread_pool(view):
+    """Return an async view that runs the sync view in the thread pool."""
+    def run(request, *args, **kwargs):
+        timings = current_timings.get()  # set by RequestMetricsMiddleware in the request's context, which sync_to_async copies
+        try:
+            if timings is None:
+                response = view(request, *args, **kwargs)
+            else:
+                with instrument_connections(timings):  # this thread's connections, the middleware only sees the event loop's
+                    response = view(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response.render()  # here rather than on the single thread django renders template responses on
+            return response
+        finally:
+            close_old_connections()  # what django does at the end of a request, for the connection this pool thread opened
+
+    run_async = sync_to_async(run, thread_sensitive=False)
+
+    @functools.wraps(view)  # keeps csrf_exempt, cls, actions etc. of DRF views
+    async def async_view(request, *args, **kwargs):
+        return await run_async(request, *args, **kwargs)
+    return async_view
@@ -0,0 +1,137 @@
+"""
+Authentication classes for the APIs.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache():
+    """Bounded, thread safe LRU cache of token key -> (user, token, shared generation) with a TTL."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # ordered oldest -> most recently used
+        self._lock = threading.Lock()  # uwsgi runs with --enable-threads
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)  # evict the least recently used token
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            for key in [k for k, (_, (user, *_)) in self._entries.items() if user.pk == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# one per process. with TOKEN_AUTH_SHARED_CACHE set, each hit is checked against the user's generation in the shared tier, which an
+# eviction in any process bumps, so a deleted token or deactivated user is rejected everywhere on the next request; without it the
+# other processes only drop their entry once its TTL runs out, up to TOKEN_AUTH_CACHE_TTL seconds after the eviction
+token_cache = TokenCache(
+    max_size=settings.TOKEN_AUTH_CACHE_SIZE,
+    ttl=settings.TOKEN_AUTH_CACHE_TTL,
+)
+
+
+def _shared_cache():
+    """Return the optional shared cache tier, or None if it isn't configured."""
+    alias = settings.TOKEN_AUTH_SHARED_CACHE
+    return caches[alias] if alias else None
+
+
+def _shared_key(key):
+    return 'auth:token:%s' % hashlib.sha256(key.encode()).hexdigest()  # don't store raw tokens as cache keys
+
+
+def _generation_key(user_id):
+    return f'auth:generation:{user_id}'
+
+
+def _user_generation(shared, user_id):
+    """Return the user's generation in the shared tier, which changes whenever their cached tokens are evicted."""
+    generation = shared.get(_generation_key(user_id))
+    if generation is None:
+        generation = time.time_ns()  # start from a new number if the key was evicted, so entries cached before can't match it
+        if not shared.add(_generation_key(user_id), generation, timeout=None):  # add() won't overwrite a bump by a concurrent request
+            generation = shared.get(_generation_key(user_id), generation)
+    return generation
+
+
+def _bump_generation(shared, user_id):
+    def bump():
+        shared.set(_generation_key(user_id), time.time_ns(), timeout=None)
+    bump()  # now, so the other processes stop using their entries
+    transaction.on_commit(bump)  # and after commit, in case one cached the pre-commit rows meanwhile
+
+
+def evict_token(key, user_id=None):
+    """Remove a token from every cache tier, and from every process's local tier if its user is given."""
+    token_cache.delete(key)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(_shared_key(key))
+        if user_id is not None:
+            _bump_generation(shared, user_id)
+
+
+def evict_user(user_id, token_keys=()):
+    """Remove all cached tokens of a user, in every process."""
+    token_cache.delete_user(user_id)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete_many([_shared_key(key) for key in token_keys])
+        _bump_generation(shared, user_id)
+
+
+# drop in replacement for TokenAuthentication that skips the token/user query for tokens seen recently
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication with a per-process (and optional shared) token cache."""
+
+    def authenticate_credentials(self, key):
+        shared = _shared_cache()
+        cached = token_cache.get(key)
+        if cached is not None and shared is not None and cached[2] != _user_generation(shared, cached[0].pk):
+            cached = None  # evicted by another process since this one cached it
+        if cached is None:
+            user_token = shared.get(_shared_key(key)) if shared is not None else None
+            if user_token is None:
+                user_token = super().authenticate_credentials(key)  # raises AuthenticationFailed for unknown keys/inactive users, those aren't cached
+                if shared is not None:
+                    shared.set(_shared_key(key), user_token, settings.TOKEN_AUTH_CACHE_TTL)
+            user, token = user_token
+            cached = (user, token, _user_generation(shared, user.pk) if shared is not None else None)
+            token_cache.set(key, cached)
+        user, token, _ = cached
+        return (copy.copy(user), token)  # a copy, so a view changing request.user can't change the cached user for other requests
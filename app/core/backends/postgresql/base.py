@@ -0,0 +1,39 @@
+"""
+Django's postgresql backend, with connection metrics and health checks for persistent connections.
+"""
+import time
+
+from django.db.backends.postgresql import base
+
+from core.db_pool import connection_stats
+
+
+# CONN_HEALTH_CHECKS is django 4.1's setting, backported: a persistent connection is checked (SELECT 1) the first time each request
+# uses it, and replaced if the server went away (ie a postgres/pgbouncer restart) instead of failing the request
+class DatabaseWrapper(base.DatabaseWrapper):
+    health_check_pending = False
+
+    def get_new_connection(self, conn_params):
+        start = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        connection_stats.opened(self.alias, (time.perf_counter() - start) * 1000)  # the time a request waits for a connection
+        return connection
+
+    def close(self):
+        was_open = self.connection is not None
+        super().close()
+        if was_open and self.connection is None:  # still set if it was only marked for closing at the end of an atomic block
+            connection_stats.closed(self.alias)
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()  # at the start and end of each request
+        if self.connection is not None and self.settings_dict.get('CONN_HEALTH_CHECKS'):
+            self.health_check_pending = True  # checked when first used, requests without queries don't pay for it
+
+    def ensure_connection(self):
+        if self.health_check_pending and self.connection is not None and not self.in_atomic_block:
+            self.health_check_pending = False
+            if not self.is_usable():
+                connection_stats.health_check_failed(self.alias)
+                self.close()
+        super().ensure_connection()
@@ -0,0 +1,54 @@
+"""
+System checks for settings the app can't run correctly with in production.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+DUMMY_CACHE = 'django.core.cache.backends.dummy.DummyCache'
+
+
+# deploy checks, run by scripts/run.sh (check --deploy --tag caches --tag database) before the app server starts, so an error fails the container;
+# the tests and the dev server keep their local memory cache
+@register(Tags.caches, deploy=True)
+def check_response_cache_shared(app_configs, **kwargs):
+    """Error when cached recipe responses are kept in a cache each worker process has its own copy of."""
+    if settings.CACHES['default']['BACKEND'] != LOCMEM_CACHE or settings.RECIPE_CACHE_TIMEOUT <= 0:
+        return []
+    return [Error(
+        'The recipe response cache (recipe.cache) is in a per process local memory cache.',
+        hint='A write only bumps the user\'s cache version in its own worker, the others keep serving the old responses and answering 304 '
+             'for up to RECIPE_CACHE_TIMEOUT seconds. Point CACHE_BACKEND/CACHE_LOCATION at a shared cache (the memcached service of '
+             'docker-compose-deploy.yml).',
+        id='core.E001',
+    )]
+
+
+@register(Tags.caches, deploy=True)
+def check_replica_pin_shared(app_configs, **kwargs):
+    """Error when the read replicas are used with a cache the primary pins can't be shared through."""
+    backend = settings.CACHES['default']['BACKEND']
+    if not settings.DB_REPLICAS or backend not in (LOCMEM_CACHE, DUMMY_CACHE):
+        return []
+    return [Error(
+        'DB_REPLICAS is set but the default cache is not shared between worker processes.',
+        hint='A user\'s reads are pinned to the primary after they write (core.db_router) through the cache, so with this backend the '
+             'next request, served by another worker, may read from a replica that doesn\'t have the write yet. Point CACHE_BACKEND/'
+             'CACHE_LOCATION at a shared cache (the memcached service of docker-compose-deploy.yml).',
+        id='core.E002',
+    )]
+
+
+@register(Tags.database, deploy=True)
+def check_pool_size(app_configs, **kwargs):
+    """Warn when pgbouncer has fewer server connections than the app has request threads."""
+    threads = settings.UWSGI_PROCESSES * settings.UWSGI_THREADS
+    if settings.DB_POOL != 'pgbouncer' or settings.DB_POOL_SIZE >= threads:
+        return []
+    return [Warning(
+        f'DB_POOL_SIZE ({settings.DB_POOL_SIZE}) is below the app\'s {threads} request threads (UWSGI_PROCESSES x UWSGI_THREADS).',
+        hint='Requests wait in pgbouncer for a server connection whenever more than DB_POOL_SIZE of them are in a transaction at once. '
+             'Raise DB_POOL_SIZE (in the pgbouncer service too) unless that sharing is intended.',
+        id='core.W003',
+    )]
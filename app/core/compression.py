@@ -0,0 +1,91 @@
+"""
+Response compression, used by core.middleware.CompressionMiddleware.
+"""
+import gzip
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+try:
+    import brotli
+except ImportError:  # optional, responses are gzipped without it
+    brotli = None
+
+
+# text formats worth compressing; images (except svg), archives etc. are already compressed and would only cost cpu
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'application/xml',
+    'application/vnd.oai.openapi',  # the /api/schema/ document
+    'image/svg+xml',
+)
+COMPRESSIBLE_SUFFIXES = ('+json', '+xml')
+
+
+def is_compressible(content_type):
+    """Return whether a response with the content type is worth compressing."""
+    media_type = content_type.split(';')[0].strip().lower()
+    return media_type.startswith(COMPRESSIBLE_TYPES) or media_type.endswith(COMPRESSIBLE_SUFFIXES)
+
+
+def parse_accept_encoding(header):
+    """Return {coding: q value} for an Accept-Encoding header, ie 'gzip, br;q=0.5' -> {'gzip': 1.0, 'br': 0.5}."""
+    codings = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding.strip().lower()] = q
+    return codings
+
+
+def choose_encoding(header, streaming=False):
+    """Return the best encoding the client accepts: 'br', 'gzip' or None."""
+    codings = parse_accept_encoding(header)
+    available = ['gzip'] if streaming or brotli is None else ['br', 'gzip']  # brotli isn't used for streams, it buffers too much to flush per chunk
+    accepted = [
+        (codings.get(coding, codings.get('*', 0.0)), -index, coding)  # equal q values keep our preference order
+        for index, coding in enumerate(available)
+    ]
+    q, _, coding = max(accepted)
+    return coding if q > 0 else None
+
+
+def compress(data, encoding):
+    """Return data compressed with the encoding."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)  # mtime=0 so equal bodies compress to equal bytes
+
+
+def compress_cached(data, encoding):
+    """Return data compressed with the encoding, reusing the result for bodies compressed before."""
+    key = f'compression:{encoding}:{hashlib.md5(data).hexdigest()}'  # hashing is an order of magnitude cheaper than compressing
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = compress(data, encoding)
+        cache.set(key, compressed, settings.COMPRESSION_CACHE_TIMEOUT)
+    return compressed
+
+
+def compress_stream(chunks, encoding='gzip'):
+    """Yield the chunks gzip compressed, flushing after each so streamed rows reach the client as they are produced."""
+    compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # 16+ writes the gzip header/trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,106 @@
+"""
+Database connection and pool metrics.
+"""
+import threading
+import time
+
+import psycopg2
+
+from django.conf import settings
+
+from core import metrics
+
+
+class ConnectionStats():
+    """Counts the database connections this process opens and closes, per alias."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._aliases = {}
+
+    def _get(self, alias):
+        return self._aliases.setdefault(alias, {
+            'open': 0,
+            'opened': 0,
+            'closed': 0,
+            'health_check_failures': 0,
+            'connect_ms_total': 0.0,
+            'connect_ms_max': 0.0,
+        })
+
+    def opened(self, alias, connect_ms):
+        with self._lock:
+            stats = self._get(alias)
+            stats['open'] += 1
+            stats['opened'] += 1
+            stats['connect_ms_total'] += connect_ms
+            stats['connect_ms_max'] = max(stats['connect_ms_max'], connect_ms)
+
+    def closed(self, alias):
+        with self._lock:
+            stats = self._get(alias)
+            stats['open'] -= 1
+            stats['closed'] += 1
+
+    def health_check_failed(self, alias):
+        with self._lock:
+            self._get(alias)['health_check_failures'] += 1
+
+    def snapshot(self):
+        """Return a copy of the counters, with the average time waited for a new connection."""
+        with self._lock:
+            aliases = {alias: dict(stats) for alias, stats in self._aliases.items()}
+        for stats in aliases.values():
+            stats['connect_ms_avg'] = round(stats['connect_ms_total'] / stats['opened'], 3) if stats['opened'] else 0.0
+            stats['connect_ms_total'] = round(stats['connect_ms_total'], 3)
+            stats['connect_ms_max'] = round(stats['connect_ms_max'], 3)
+        return aliases
+
+
+connection_stats = ConnectionStats()  # updated by core.backends.postgresql
+
+
+# pool columns of pgbouncer's SHOW POOLS: clients connected/waiting for a server connection, server connections in use/idle, and how
+# long (seconds + microseconds) the oldest waiting client has waited
+PGBOUNCER_POOL_COLUMNS = ('cl_active', 'cl_waiting', 'sv_active', 'sv_idle', 'sv_used', 'maxwait', 'maxwait_us', 'pool_mode')
+
+
+def pgbouncer_pools():
+    """Return pgbouncer's SHOW POOLS rows for the default database, read from its admin console."""
+    database = settings.DATABASES['default']
+    connection = psycopg2.connect(
+        host=database['HOST'],
+        port=database['PORT'] or None,
+        dbname='pgbouncer',  # the admin console, DB_USER must be in pgbouncer's stats_users
+        user=database['USER'],
+        password=database['PASSWORD'],
+        connect_timeout=2,
+    )
+    try:
+        connection.autocommit = True  # the console has no transactions
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW POOLS')
+            columns = [column.name for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        connection.close()
+    return [
+        {'user': row['user'], **{column: row.get(column) for column in PGBOUNCER_POOL_COLUMNS}}
+        for row in rows if row['database'] == database['NAME']
+    ]
+
+
+def pool_metrics():
+    """Return the connection counters of this process, and pgbouncer's pools when connecting through it."""
+    data = {'mode': settings.DB_POOL or 'direct', 'connections': connection_stats.snapshot()}
+    if settings.DB_POOL == 'pgbouncer':
+        start = time.perf_counter()
+        try:
+            data['pgbouncer'] = pgbouncer_pools()
+        except psycopg2.Error as exc:
+            data['pgbouncer'] = {'error': str(exc).strip()}
+        data['pgbouncer_query_ms'] = round((time.perf_counter() - start) * 1000, 3)
+    return data
+
+
+metrics.register_source('db_pool', pool_metrics)
@@ -0,0 +1,137 @@
+"""
+Database router sending the reads of selected requests to read replicas.
+"""
+import contextvars
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+
+from core import metrics
+
+
+# alias the reads of the current request go to, set by views for safe requests (recipe.views.ReplicaReadMixin); None is the primary.
+# a context variable, so each thread (uwsgi) and each request's context (asgi) has its own
+read_alias = contextvars.ContextVar('read_alias', default=None)
+
+
+# seconds behind the primary: 0 when it has replayed everything it received, otherwise since the last transaction it replayed;
+# NULL (unknown) when it hasn't replayed any yet
+REPLICA_LAG_SQL = '''
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+'''
+
+
+class ReplicaStatus():
+    """Keeps each replica's lag, measured at most every DB_REPLICA_LAG_CHECK_SECONDS per process, and counts the routed requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lag = {}  # alias -> (checked at, seconds behind or None if unknown/unreachable)
+        self._routed = {}
+
+    def lag(self, alias):
+        """Return the replica's lag in seconds, or None if it couldn't be measured."""
+        with self._lock:
+            checked_at, lag = self._lag.get(alias, (None, None))
+        if checked_at is None or time.monotonic() - checked_at >= settings.DB_REPLICA_LAG_CHECK_SECONDS:
+            lag = measure_lag(alias)  # outside the lock, threads checking at the same time just both query
+            with self._lock:
+                self._lag[alias] = (time.monotonic(), lag)
+        return lag
+
+    def routed(self, target):
+        with self._lock:
+            self._routed[target] = self._routed.get(target, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'replicas': {alias: {'lag_seconds': lag} for alias, (_, lag) in self._lag.items()},
+                'routed': dict(self._routed),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._lag.clear()
+            self._routed.clear()
+
+
+replica_status = ReplicaStatus()
+
+
+def measure_lag(alias):
+    """Query the replica's lag in seconds, None if it's unreachable or unknown."""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0  # ie the sqlite stand-in replica of the tests, which is the default database itself
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(REPLICA_LAG_SQL)
+            lag = cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+    return None if lag is None else float(lag)
+
+
+# in the default cache, so the pin follows the user to whichever worker or replica of the app serves their next request; a per process
+# cache would only pin them on this one, which is why core.checks refuses to start with one when DB_REPLICAS is set
+def _pin_key(user_id):
+    return f'db:primary:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Send the user's reads to the primary for DB_REPLICA_PIN_SECONDS, so they see their own writes."""
+    if not settings.DB_REPLICAS:
+        return
+    cache.set(_pin_key(user_id), True, settings.DB_REPLICA_PIN_SECONDS)  # now, for the rest of this request
+    transaction.on_commit(lambda: cache.set(_pin_key(user_id), True, settings.DB_REPLICA_PIN_SECONDS))  # and from when the write is visible
+
+
+def choose_read_alias(user_id):
+    """Return the alias to read the user's data from: a replica, or None for the primary if they wrote recently or every replica lags."""
+    if not settings.DB_REPLICAS:
+        return None
+    if cache.get(_pin_key(user_id)):
+        replica_status.routed('primary_pinned')
+        return None
+    replicas = list(settings.DB_REPLICAS)
+    random.shuffle(replicas)  # spread the reads
+    for alias in replicas:
+        lag = replica_status.lag(alias)
+        if lag is not None and lag <= settings.DB_REPLICA_MAX_LAG:
+            replica_status.routed(alias)
+            return alias
+    replica_status.routed('primary_lagging')
+    return None
+
+
+# reads go to the request's replica when a view chose one, everything else (writes, migrations, other views' reads) to the primary
+class ReplicaRouter():
+    """Route reads to the alias the current request chose."""
+
+    def db_for_read(self, model, **hints):
+        return read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS  # also for instances read from a replica, which django would otherwise save back to it
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DB_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True  # the same data
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DB_REPLICAS:
+            return False  # replicas get the schema through replication
+        return None
+
+
+metrics.register_source('db_replicas', lambda: replica_status.snapshot() if settings.DB_REPLICAS else None)
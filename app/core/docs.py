@@ -0,0 +1,18 @@
+"""
+API documentation views, imported when first requested (core.views.lazy_view in app.urls).
+"""
+from drf_spectacular.plumbing import set_query_parameters
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SpectacularSwaggerView
+
+from django.urls import reverse
+
+from core import schema as schema_documents
+
+
+# swagger ui loads the schema from its versioned url, so browsers cache it until the code changes
+class SchemaSwaggerView(SpectacularSwaggerView):
+    @extend_schema(exclude=True)
+    def get(self, request, *args, **kwargs):
+        self.url = set_query_parameters(reverse(self.url_name), v=schema_documents.code_version())
+        return super().get(request, *args, **kwargs)
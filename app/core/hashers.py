@@ -0,0 +1,101 @@
+"""
+Password hashers for the app.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core import metrics
+
+
+class PasswordHashingBusy(APIException):
+    """Raised when too many passwords are already waiting to be hashed."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many login requests, please try again shortly.')
+    default_code = 'password_hashing_busy'
+
+
+# a small fixed set of threads does all the hashing, so a burst of logins queues up here (and is turned away once the queue is full) instead of using every cpu/worker
+class HashingPool():
+    """Bounded thread pool for password hashing with queue depth metrics."""
+
+    def __init__(self, workers, queue_size, queue_timeout):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_size)  # running + waiting jobs
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_seconds = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._pid != os.getpid():  # threads don't survive a fork (ie uwsgi workers), so each process gets its own pool
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+                self._pid = os.getpid()
+            return self._executor
+
+    def run(self, fn, *args):
+        """Run fn(*args) on the pool and return its result."""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._rejected += 1
+            raise PasswordHashingBusy()
+        submitted = time.monotonic()
+
+        def job():
+            with self._lock:
+                self._wait_seconds += time.monotonic() - submitted
+            return fn(*args)
+
+        try:
+            with self._lock:
+                self._in_flight += 1
+            return self._get_executor().submit(job).result()  # hashlib releases the GIL, so the other request threads keep running meanwhile
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+            self._slots.release()
+
+    def metrics(self):
+        """Return a snapshot of the pool counters."""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'in_flight': self._in_flight,
+                'queued': max(self._in_flight - self.workers, 0),
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'wait_seconds_total': round(self._wait_seconds, 6),
+            }
+
+
+hashing_pool = HashingPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    queue_timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT,
+)
+metrics.register_source('password_hashing', hashing_pool.metrics)
+
+
+# same 'pbkdf2_sha256' algorithm as django's default, so existing hashes still verify; verify() and set_password() both go through encode()
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 hasher that hashes on the bounded hashing pool."""
+    iterations = settings.PASSWORD_HASH_ITERATIONS  # changing this re-hashes users' passwords on their next login
+
+    def encode(self, password, salt, iterations=None):
+        return hashing_pool.run(super().encode, password, salt, iterations)
@@ -0,0 +1,292 @@
+"""
+Django command to load test the API.
+"""
+import io
+import json
+import random
+import socket
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.metrics import percentile
+from core.models import Recipe, Tag, Ingredient
+from recipe.images import delete_image_variants
+
+
+SCENARIOS = ['recipe-list', 'recipe-detail', 'upload-image', 'token']
+PASSWORD = 'benchmark-password'
+EMAIL_DOMAIN = 'benchmark.example.com'
+
+
+def client_addr(i):
+    """Return the client address of the i-th in process request, spread over many so the login IP throttle doesn't skew the numbers."""
+    return f'10.0.{i // 250 % 250}.{i % 250 + 1}'
+
+
+def sample_image():
+    """Return the bytes of a small JPEG to upload."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (640, 480), color=(200, 120, 40)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+# drives the real url routes either in process (django test client, also counts db queries) or over http against a running server (--base-url)
+class Command(BaseCommand):
+    """Django command to benchmark the API."""
+    help = 'Seed users/recipes and report latency percentiles, throughput and queries per request for the API routes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Users to seed.')
+        parser.add_argument('--recipes', type=int, default=100, help='Recipes per user.')
+        parser.add_argument('--tags', type=int, default=10, help='Tags per user (each recipe gets up to 3).')
+        parser.add_argument('--ingredients', type=int, default=20, help='Ingredients per user (each recipe gets up to 5).')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario.')
+        parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight at once.')
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f'Comma separated, any of {SCENARIOS}.')
+        parser.add_argument(
+            '--base-url',
+            help='Send requests over HTTP to this server instead of in process (no query counts); they all come from this one address, '
+                 'so for the token scenario start the server with a LOGIN_IP_THROTTLE_RATE above --requests per minute.',
+        )
+        parser.add_argument(
+            '--slow-clients', type=int, default=0,
+            help='Image uploads kept trickling in alongside each scenario, to compare how app servers cope with slow clients (needs --base-url; '
+                 'point it at the app server itself, ie gunicorn/uwsgi --http, nginx buffers request bodies before passing them on).',
+        )
+        parser.add_argument('--slow-rate', type=int, default=2048, help='Bytes per second each slow client sends.')
+        parser.add_argument('--json', dest='json_path', help='Also write the report as JSON to this file (- for stdout).')
+        parser.add_argument('--keep', action='store_true', help="Don't delete the seeded data afterwards.")
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        scenarios = [s for s in options['scenarios'].split(',') if s]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+        if options['slow_clients'] and not options['base_url']:
+            raise CommandError('--slow-clients needs --base-url, in process requests have no network to be slow on.')
+
+        users = self._seed(options)
+        try:
+            with override_settings(ALLOWED_HOSTS=['*']):  # the test client sends Host: testserver
+                results = {
+                    name: self._run(name, users, options)
+                    for name in scenarios
+                }
+        finally:
+            if not options['keep']:
+                self._cleanup()
+
+        report = {
+            'options': {k: options[k] for k in ('users', 'recipes', 'requests', 'concurrency', 'base_url', 'slow_clients', 'slow_rate')},
+            'database': connection.vendor,
+            'scenarios': results,
+        }
+        self._print(report)
+        if options['json_path'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        elif options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+    def _seed(self, options):
+        """Create the users, tokens, tags, ingredients and recipes; return [(user, token key, recipe ids)]."""
+        self.stdout.write('Seeding data...')
+        self._cleanup()  # leftovers from a run with --keep
+        password = make_password(PASSWORD)  # hash once and share it, hashing per user would dominate the seeding time
+        User = get_user_model()
+        User.objects.bulk_create([
+            User(email=f'user{i}@{EMAIL_DOMAIN}', name=f'Benchmark {i}', password=password)
+            for i in range(options['users'])
+        ])
+        seeded = []
+        for user in User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').order_by('id'):
+            token = Token.objects.create(user=user)
+            Tag.objects.bulk_create([Tag(user=user, name=f'Tag {i}') for i in range(options['tags'])])
+            Ingredient.objects.bulk_create([Ingredient(user=user, name=f'Ingredient {i}') for i in range(options['ingredients'])])
+            tag_ids = list(Tag.objects.filter(user=user).values_list('id', flat=True))
+            ingredient_ids = list(Ingredient.objects.filter(user=user).values_list('id', flat=True))
+            Recipe.objects.bulk_create([
+                Recipe(user=user, title=f'Recipe {i}', description='Benchmark recipe', time_minutes=10, price='5.00')
+                for i in range(options['recipes'])
+            ], batch_size=1000)
+            recipe_ids = list(Recipe.objects.filter(user=user).values_list('id', flat=True))
+            Recipe.tags.through.objects.bulk_create([
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in random.sample(tag_ids, min(3, len(tag_ids)))
+            ], batch_size=1000)
+            Recipe.ingredients.through.objects.bulk_create([
+                Recipe.ingredients.through(recipe_id=recipe_id, ingredient_id=ingredient_id)
+                for recipe_id in recipe_ids
+                for ingredient_id in random.sample(ingredient_ids, min(5, len(ingredient_ids)))
+            ], batch_size=1000)
+            seeded.append((user, token.key, recipe_ids))
+        return seeded
+
+    def _cleanup(self):
+        """Delete the seeded users (cascades to their data) and uploaded images."""
+        users = get_user_model().objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')
+        for recipe in Recipe.objects.filter(user__in=users).exclude(image='').exclude(image__isnull=True):
+            delete_image_variants(recipe.image.name)
+            recipe.image.delete(save=False)
+        users.delete()
+
+    def _request_for(self, name, users, i):
+        """Return (method, path, body, content type, headers) for the i-th request of a scenario."""
+        user, key, recipe_ids = users[i % len(users)]
+        headers = {'Authorization': f'Token {key}'}
+        if name == 'recipe-list':
+            return 'GET', reverse('recipe:recipe-list'), None, None, headers
+        if name == 'recipe-detail':
+            return 'GET', reverse('recipe:recipe-detail', args=[random.choice(recipe_ids)]), None, None, headers
+        if name == 'upload-image':
+            boundary = uuid.uuid4().hex
+            body = (
+                f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="bench.jpg"\r\n'
+                'Content-Type: image/jpeg\r\n\r\n'
+            ).encode() + self._image + f'\r\n--{boundary}--\r\n'.encode()
+            path = reverse('recipe:recipe-upload-image', args=[random.choice(recipe_ids)])
+            return 'POST', path, body, f'multipart/form-data; boundary={boundary}', headers
+        body = json.dumps({'email': user.email, 'password': PASSWORD}).encode()
+        return 'POST', reverse('user:token'), body, 'application/json', {}
+
+    def _send_in_process(self, client, method, path, body, content_type, headers, remote_addr):
+        extra = {'HTTP_' + k.upper().replace('-', '_'): v for k, v in headers.items()}
+        extra['REMOTE_ADDR'] = remote_addr
+        if method == 'GET':
+            return client.get(path, **extra).status_code
+        return client.generic(method, path, body, content_type=content_type, **extra).status_code
+
+    def _send_http(self, base_url, method, path, body, content_type, headers):
+        request = urllib.request.Request(base_url.rstrip('/') + path, data=body, method=method, headers=headers)
+        if content_type:
+            request.add_header('Content-Type', content_type)
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as exc:
+            return exc.code
+
+    def _send_slowly(self, base_url, rate, stop, method, path, body, content_type, headers):
+        """Send the request's body at rate bytes/s, like a client on a slow link; give up once stop is set."""
+        url = urllib.parse.urlsplit(base_url)
+        lines = [f'{method} {url.path.rstrip("/")}{path} HTTP/1.1', f'Host: {url.netloc}', 'Connection: close']
+        lines += [f'Content-Type: {content_type}', f'Content-Length: {len(body)}']
+        lines += [f'{key}: {value}' for key, value in headers.items()]
+        chunk = max(rate // 10, 1)  # a tenth of a second's worth at a time
+        try:
+            with socket.create_connection((url.hostname, url.port or 80), timeout=30) as sock:
+                sock.sendall(('\r\n'.join(lines) + '\r\n\r\n').encode())
+                for offset in range(0, len(body), chunk):
+                    if stop.wait(0.1):
+                        return
+                    sock.sendall(body[offset:offset + chunk])
+                sock.recv(65536)
+        except OSError:
+            pass  # the server gave up on us, ie a timeout; the next slow request starts over
+
+    def _start_slow_clients(self, users, options):
+        """Start the --slow-clients threads uploading images slowly until the returned event is set."""
+        stop = threading.Event()
+
+        def slow_client(index):
+            i = index
+            while not stop.is_set():
+                self._send_slowly(options['base_url'], options['slow_rate'], stop, *self._request_for('upload-image', users, i))
+                i += options['slow_clients']
+
+        threads = [threading.Thread(target=slow_client, args=(i,), daemon=True) for i in range(options['slow_clients'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)  # let them connect and start holding whatever the server gives a request in progress
+        return stop, threads
+
+    def _run(self, name, users, options):
+        """Send the scenario's requests and return its stats."""
+        self._image = sample_image()
+        total, concurrency, base_url = options['requests'], max(options['concurrency'], 1), options['base_url']
+        latencies, query_counts, statuses = [], [], {}
+        lock = threading.Lock()
+
+        def worker(indexes):
+            client = Client()
+            for i in indexes:
+                request = self._request_for(name, users, i)
+                with CaptureQueriesContext(connection) as ctx:  # connections are per thread, so this only sees this worker's queries
+                    start = time.perf_counter()
+                    if base_url:
+                        code = self._send_http(base_url, *request)
+                    else:
+                        code = self._send_in_process(client, *request, remote_addr=client_addr(i))
+                    elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    query_counts.append(len(ctx.captured_queries))
+                    statuses[code] = statuses.get(code, 0) + 1
+            if concurrency > 1:
+                connection.close()  # worker threads each opened their own connection
+
+        chunks = [range(i, total, concurrency) for i in range(concurrency)]
+        self.stdout.write(f'Running {name}: {total} requests, concurrency {concurrency}, {options["slow_clients"]} slow clients...')
+        stop, slow_threads = self._start_slow_clients(users, options) if options['slow_clients'] else (None, [])
+        start = time.perf_counter()
+        try:
+            if concurrency == 1:
+                worker(chunks[0])
+            else:
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    list(pool.map(worker, chunks))
+            wall = time.perf_counter() - start
+        finally:
+            if stop is not None:
+                stop.set()
+                for thread in slow_threads:
+                    thread.join()
+
+        latencies.sort()
+        return {
+            'requests': len(latencies),
+            'errors': sum(count for code, count in statuses.items() if code >= 400),
+            'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+            'requests_per_second': round(len(latencies) / wall, 2) if wall else None,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 3),
+                'p95': round(percentile(latencies, 95), 3),
+                'p99': round(percentile(latencies, 99), 3),
+                'mean': round(statistics.mean(latencies), 3),
+            } if latencies else {},
+            'queries_per_request': None if base_url or not query_counts else round(statistics.mean(query_counts), 2),
+        }
+
+    def _print(self, report):
+        """Write a human readable summary of the report."""
+        slow = report['options']['slow_clients']
+        heading = f'Results ({report["database"]}' + (f', {slow} slow clients at {report["options"]["slow_rate"]} B/s)' if slow else ')')
+        self.stdout.write(self.style.MIGRATE_HEADING(heading))
+        for name, stats in report['scenarios'].items():
+            latency = stats['latency_ms']
+            self.stdout.write(
+                f'{name:<14} {stats["requests_per_second"]:>8} req/s  '
+                f'p50 {latency.get("p50")} ms  p95 {latency.get("p95")} ms  p99 {latency.get("p99")} ms  '
+                f'queries/req {stats["queries_per_request"]}  errors {stats["errors"]}'
+            )
@@ -0,0 +1,120 @@
+"""
+Django command to measure response compression.
+"""
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from core import compression, schema
+from core.renderers import FastJSONRenderer
+
+
+WORDS = (
+    'chicken garlic tofu lentil curry roast spicy quick vegan salad soup pasta lemon herb '
+    'ginger smoky tomato basil bean rice noodle crispy baked grilled sweet sour stew'
+).split()
+
+
+def recipe_list_page(size, rng):
+    """Return the rendered JSON of a recipe list page with size recipes, shaped like the real endpoint's."""
+    def attrs(count):
+        return [
+            {'id': rng.randint(1, 10000), 'name': ' '.join(rng.sample(WORDS, 2)).title(), 'recipe_count': rng.randint(0, 50)}
+            for _ in range(count)
+        ]
+
+    results = [
+        {
+            'id': 100000 - i,
+            'title': ' '.join(rng.sample(WORDS, 4)).capitalize(),
+            'time_minutes': rng.randint(5, 120),
+            'price': f'{rng.randint(100, 9999) / 100:.2f}',  # DecimalField renders as a string
+            'link': f'https://example.com/recipes/{rng.randint(1, 10 ** 6)}',
+            'tags': attrs(rng.randint(0, 3)),
+            'ingredients': attrs(rng.randint(1, 5)),
+        }
+        for i in range(size)
+    ]
+    page = {'next': 'http://localhost:8000/api/recipe/recipes/?cursor=cD0xMjM0', 'previous': None, 'results': results}
+    return FastJSONRenderer().render(page)
+
+
+def schema_document():
+    """Return the rendered /api/schema/ document."""
+    return schema.generate()['yaml']
+
+
+# reports bytes on the wire and the cpu time compressing costs per response, for each payload and encoding setting
+class Command(BaseCommand):
+    """Django command to benchmark response compression."""
+    help = 'Report compressed sizes and CPU time per response for recipe list pages and the schema document.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,50,100', help='Comma separated recipe list page sizes.')
+        parser.add_argument('--gzip-levels', default='1,6,9', help='Comma separated gzip levels to compare.')
+        parser.add_argument('--brotli-qualities', default='4,5,11', help='Comma separated brotli qualities to compare (needs Brotli).')
+        parser.add_argument('--runs', type=int, default=20, help='Compressions timed per payload and setting.')
+        parser.add_argument('--no-schema', action='store_true', help='Skip the schema document.')
+        parser.add_argument('--json', dest='json_path', help='Also write the report as JSON to this file (- for stdout).')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size]
+            settings_list = [('gzip', int(level)) for level in options['gzip_levels'].split(',') if level]
+            if compression.brotli is not None:
+                settings_list += [('br', int(quality)) for quality in options['brotli_qualities'].split(',') if quality]
+        except ValueError as exc:
+            raise CommandError(f'Invalid number: {exc}')
+        if compression.brotli is None:
+            self.stdout.write(self.style.WARNING('Brotli is not installed, only gzip is measured.'))
+
+        rng = random.Random(0)  # same payloads every run
+        payloads = [(f'recipe list ({size})', recipe_list_page(size, rng)) for size in sizes]
+        if not options['no_schema']:
+            payloads.append(('schema', schema_document()))
+
+        report = {'payloads': {}}
+        for name, body in payloads:
+            rows = [{'encoding': 'identity', 'level': None, 'bytes': len(body), 'ratio': 1.0, 'cpu_ms': 0.0}]
+            for encoding, level in settings_list:
+                rows.append(self._measure(body, encoding, level, options['runs']))
+            report['payloads'][name] = rows
+
+        self._print(report)
+        if options['json_path']:
+            text = json.dumps(report, indent=2)
+            if options['json_path'] == '-':
+                self.stdout.write(text)
+            else:
+                with open(options['json_path'], 'w') as report_file:
+                    report_file.write(text)
+
+    def _measure(self, body, encoding, level, runs):
+        """Compress body runs times and return its size and median cpu time."""
+        setting = 'COMPRESSION_BROTLI_QUALITY' if encoding == 'br' else 'COMPRESSION_GZIP_LEVEL'
+        durations = []
+        with override_settings(**{setting: level}):
+            for _ in range(runs):
+                start = time.process_time()  # cpu time, what compressing costs a worker regardless of other load
+                compressed = compression.compress(body, encoding)
+                durations.append((time.process_time() - start) * 1000)
+        return {
+            'encoding': encoding,
+            'level': level,
+            'bytes': len(compressed),
+            'ratio': round(len(compressed) / len(body), 3),
+            'cpu_ms': round(statistics.median(durations), 3),
+        }
+
+    def _print(self, report):
+        for name, rows in report['payloads'].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f'  {"encoding":<10}{"level":>6}{"bytes":>10}{"ratio":>8}{"cpu ms":>10}')
+            for row in rows:
+                level = '' if row['level'] is None else row['level']
+                self.stdout.write(f'  {row["encoding"]:<10}{level:>6}{row["bytes"]:>10}{row["ratio"]:>8}{row["cpu_ms"]:>10}')
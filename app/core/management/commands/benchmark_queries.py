@@ -0,0 +1,93 @@
+"""
+Django command to benchmark the hot recipe/tag/ingredient queries.
+"""
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction, NotSupportedError
+
+from core.models import Recipe, Tag, Ingredient
+
+
+# seeds a throwaway dataset, then prints the query plan and timing of each hot query; everything is rolled back at the end so it is safe to run against a dev db
+class Command(BaseCommand):
+    """Django command to show query plans and timings for the hot queries."""
+    help = 'Seed a throwaway dataset and show query plans/timings for the hot recipe queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Number of users to seed.')
+        parser.add_argument('--recipes', type=int, default=500, help='Recipes per user.')
+        parser.add_argument('--attrs', type=int, default=100, help='Tags and ingredients per user.')
+        parser.add_argument('--runs', type=int, default=20, help='Times each query is run for the timing.')
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Also report the plans/timings with the indexes and constraints from migration 0007 dropped.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        with transaction.atomic():
+            user = self._seed(options['users'], options['recipes'], options['attrs'])
+            self._report('With indexes', user, options['runs'])
+            if options['compare']:
+                try:
+                    self._drop_indexes()
+                    self._report('Without indexes', user, options['runs'])
+                except NotSupportedError:  # ie sqlite can't alter tables inside a transaction
+                    self.stdout.write(self.style.WARNING(f'--compare is not supported on {connection.vendor}.'))
+            transaction.set_rollback(True)  # throw away the seeded data and restore any dropped index
+
+    def _seed(self, users, recipes, attrs):
+        """Bulk insert the dataset and return the user the queries run for."""
+        self.stdout.write(f'Seeding {users} users x {recipes} recipes x {attrs} tags/ingredients...')
+        emails = [f'benchmark{i}@example.com' for i in range(users)]
+        get_user_model().objects.bulk_create([
+            get_user_model()(email=email, password='!')  # '!' is an unusable password, skips hashing
+            for email in emails
+        ])
+        user_objs = list(get_user_model().objects.filter(email__in=emails))  # sqlite doesn't return ids from bulk_create
+        for user in user_objs:
+            Tag.objects.bulk_create([Tag(user=user, name=f'Tag {i}') for i in range(attrs)])
+            Ingredient.objects.bulk_create([Ingredient(user=user, name=f'Ingredient {i}') for i in range(attrs)])
+            Recipe.objects.bulk_create([
+                Recipe(user=user, title=f'Recipe {i}', time_minutes=10, price='5.00')
+                for i in range(recipes)
+            ], batch_size=1000)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE core_recipe, core_tag, core_ingredient')  # refresh planner statistics for the new rows
+        return user_objs[len(user_objs) // 2]
+
+    def _queries(self, user):
+        """Return the hot queries keyed by a description."""
+        names = [f'Tag {i}' for i in range(0, 30, 3)]
+        return {
+            'recipe list (user, -id)': Recipe.objects.filter(user=user).order_by('-id')[:50],
+            'tag list (user, -name)': Tag.objects.filter(user=user).order_by('-name')[:50],
+            'ingredient list (user, -name)': Ingredient.objects.filter(user=user).order_by('-name')[:50],
+            'tag lookup (user, name in ...)': Tag.objects.filter(user=user, name__in=names),
+        }
+
+    def _report(self, title, user, runs):
+        """Print the plan and median timing of each hot query."""
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for description, queryset in self._queries(user).items():
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                list(queryset.all())  # .all() clones the queryset so every run hits the db
+                timings.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(f'{description}: median {statistics.median(timings):.3f} ms over {runs} runs')
+            self.stdout.write(queryset.explain())
+
+    def _drop_indexes(self):
+        """Drop the indexes/constraints added in migration 0007 (inside the outer transaction)."""
+        with connection.schema_editor() as editor:
+            for index in Recipe._meta.indexes:
+                editor.remove_index(Recipe, index)
+            for model in (Tag, Ingredient):
+                for constraint in model._meta.constraints:
+                    editor.remove_constraint(model, constraint)
@@ -0,0 +1,24 @@
+"""
+Django command to generate the OpenAPI schema documents served at /api/schema/.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import schema
+
+
+class Command(BaseCommand):
+    """Django command to precompute the OpenAPI schema."""
+    help = 'Write the OpenAPI schema (YAML and JSON) to SCHEMA_ROOT, unless it is already there for this code version.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate even if the schema for this version exists.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        version = schema.code_version()
+        if not options['force'] and schema.read_documents(settings.SCHEMA_ROOT, version) is not None:
+            self.stdout.write(f'Schema for version {version} is up to date.')
+            return
+        schema.write_documents(settings.SCHEMA_ROOT, version, schema.generate())
+        self.stdout.write(self.style.SUCCESS(f'Wrote schema for version {version} to {settings.SCHEMA_ROOT}.'))
@@ -0,0 +1,84 @@
+"""
+Django command to apply migrations from one replica at a time.
+"""
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+
+
+MIGRATION_LOCK_ID = zlib.crc32(b'app.migrate')  # any fixed bigint, the same in every replica
+
+
+# every replica runs this on start (scripts/run.sh) or a one off job does (run.sh migrate): the first to get a postgres advisory lock
+# migrates while the rest wait for it, then find nothing left to apply; with nothing to apply there's no lock to wait for at all
+class Command(BaseCommand):
+    """Django command to migrate under a leader lock."""
+    help = 'Apply unapplied migrations while holding a postgres advisory lock, so concurrent replicas never migrate at the same time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database to migrate.')
+        parser.add_argument('--lock-timeout', type=float, default=300, help='Seconds to wait for another replica\'s migrations.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        connection = connections[options['database']]
+        if not self.pending(connection):
+            self.stdout.write('No migrations to apply.')
+            return
+        if connection.vendor != 'postgresql':  # ie sqlite in development, no other replicas to race with
+            self.migrate(options)
+            return
+
+        with self.lock(connection, options['lock_timeout']):
+            if self.pending(connection):  # another replica may have applied them while we waited
+                self.migrate(options)
+            else:
+                self.stdout.write('Migrations were applied by another replica.')
+
+    def pending(self, connection):
+        """Return whether the database has unapplied migrations."""
+        executor = MigrationExecutor(connection)
+        return bool(executor.migration_plan(executor.loader.graph.leaf_nodes()))
+
+    @contextmanager
+    def lock(self, connection, timeout):
+        """Hold the migration lock, waiting for another replica to release it."""
+        if settings.DB_POOL:
+            # pgbouncer's transaction pooling may run each query on a different server connection, so a session lock could be taken
+            # on one and never released; a transaction's lock is released with it, at the cost of migrating in a single transaction
+            with transaction.atomic(using=connection.alias):
+                self.acquire(connection, timeout, 'pg_try_advisory_xact_lock')
+                yield
+            return
+
+        self.acquire(connection, timeout, 'pg_try_advisory_lock')
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [MIGRATION_LOCK_ID])
+
+    def acquire(self, connection, timeout, function):
+        """Take the lock with function, polling until another holder releases it or the timeout passes."""
+        deadline = time.monotonic() + timeout
+        waiting = False
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT {function}(%s)', [MIGRATION_LOCK_ID])
+                if cursor.fetchone()[0]:
+                    return
+            if time.monotonic() >= deadline:
+                raise CommandError(f'Another replica held the migration lock for over {timeout:g} seconds.')
+            if not waiting:
+                self.stdout.write('Waiting for another replica to finish migrating...')
+                waiting = True
+            time.sleep(1)
+
+    def migrate(self, options):
+        call_command('migrate', database=options['database'], interactive=False, verbosity=options['verbosity'], stdout=self.stdout)
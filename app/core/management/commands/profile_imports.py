@@ -0,0 +1,107 @@
+"""
+Django command to profile the imports of a worker process at start up.
+"""
+import json
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# run in a fresh interpreter, so nothing this process already imported is missed: what a uwsgi worker imports before serving
+# its first request (the wsgi module runs django.setup(), the urlconf loads every view), then its memory and module count
+WORKER_SCRIPT = '''
+import importlib, json, resource, sys
+importlib.import_module(sys.argv[1])
+if sys.argv[2] == '1':
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+print(json.dumps({'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, 'modules': len(sys.modules)}))
+'''
+
+
+def parse_importtime(text):
+    """Return [(module, self_us, cumulative_us)] from python -X importtime output."""
+    rows = []
+    for line in text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            rows.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue  # the header line
+    return rows
+
+
+def group_for(module, apps):
+    """Return the installed app module belongs to (the longest matching name), or its top level package."""
+    matches = [app for app in apps if module == app or module.startswith(app + '.')]
+    return max(matches, key=len) if matches else module.split('.')[0]
+
+
+def summarize(rows, apps):
+    """Return [{group, modules, self_ms}] for the rows grouped by installed app or package, slowest first."""
+    groups = {}
+    for module, self_us, _ in rows:
+        group = groups.setdefault(group_for(module, apps), {'modules': 0, 'self_us': 0})
+        group['modules'] += 1
+        group['self_us'] += self_us
+    summary = [
+        {'group': name, 'modules': group['modules'], 'self_ms': round(group['self_us'] / 1000, 1)}
+        for name, group in groups.items()
+    ]
+    return sorted(summary, key=lambda row: row['self_ms'], reverse=True)
+
+
+# a summary of python -X importtime per installed app (the rest by top level package), with the worker's resident memory, to see
+# what each part of the app costs a worker's boot; run it with API_ONLY=1 to compare the production mode leaving parts out
+class Command(BaseCommand):
+    """Django command to profile start up imports."""
+    help = 'Report the import time of each installed app and package when a worker starts, and its memory after.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default=settings.WSGI_APPLICATION.rsplit('.', 1)[0], help='Module a worker imports first.')
+        parser.add_argument('--no-urls', action='store_true', help='Don\'t load the urlconf (and the views) after the module.')
+        parser.add_argument('--limit', type=int, default=25, help='Groups and modules to list.')
+        parser.add_argument('--json', dest='json_path', help='Also write the report as JSON to this file (- for stdout).')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', WORKER_SCRIPT, options['module'], '0' if options['no_urls'] else '1'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )  # same environment, so the same settings module
+        if proc.returncode != 0:
+            raise CommandError(f'Importing {options["module"]} failed:\n{proc.stderr[-2000:]}')
+
+        rows = parse_importtime(proc.stderr)
+        slowest = sorted(rows, key=lambda row: row[1], reverse=True)[:options['limit']]
+        report = {
+            'module': options['module'],
+            'total_ms': round(sum(row[1] for row in rows) / 1000, 1),
+            **json.loads(proc.stdout.strip().splitlines()[-1]),
+            'groups': summarize(rows, settings.INSTALLED_APPS),
+            'slowest': [{'module': name, 'self_ms': round(self_us / 1000, 1)} for name, self_us, _ in slowest],
+        }
+
+        self._print(report, options['limit'])
+        if options['json_path']:
+            text = json.dumps(report, indent=2)
+            if options['json_path'] == '-':
+                self.stdout.write(text)
+            else:
+                with open(options['json_path'], 'w') as report_file:
+                    report_file.write(text)
+
+    def _print(self, report, limit):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{report["module"]}: {report["total_ms"]} ms importing {report["modules"]} modules, {report["max_rss_kb"] / 1024:.1f} MB max RSS'
+        ))
+        self.stdout.write(f'  {"installed app / package":<36}{"modules":>8}{"self ms":>10}')
+        for row in report['groups'][:limit]:
+            self.stdout.write(f'  {row["group"]:<36}{row["modules"]:>8}{row["self_ms"]:>10}')
+        self.stdout.write(self.style.MIGRATE_HEADING('slowest modules'))
+        for row in report['slowest']:
+            self.stdout.write(f'  {row["module"]:<52}{row["self_ms"]:>10}')
@@ -6,26 +6,50 @@ import time
 
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.conf import settings
+from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 # this is the minimum code required to run a django management command. use the BaseCommand class and the handle method to handle the command
 class Command(BaseCommand):
     """Django command to wait for database."""
 
+    def check_pool(self):
+        """Run a query through the pool, which only succeeds once pgbouncer can reach postgres too."""
+        connection = connections['default']
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        finally:
+            connection.close()  # don't keep a pool slot while the other startup commands run
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=float, default=60, help='Seconds to keep trying before failing (exit status 1).')
+        parser.add_argument('--max-delay', type=float, default=5, help='Longest wait between attempts, in seconds.')
+
     # this handle method for BaseCommand is the method that is automatically run when running the command in CLI
     def handle(self, *args, **options):
         """Entrypoint for command."""
         self.stdout.write('Waiting for database...') # this stdout.write method writes a log to the command line
+        deadline = time.monotonic() + options['timeout']
+        delay = 0.1  # doubled after each failed attempt up to --max-delay: a db that's almost up is found quickly, one that's down isn't hammered
         db_up = False # set db is running to False
         while db_up is False:
             # try checking if there is a database ready, if not, handle the exception by waiting then running again
             try:
                 self.check(databases=['default']) # checks if default database in django app
+                if settings.DB_POOL:
+                    self.check_pool()  # pgbouncer accepts connections before postgres is up, so check a query gets through
                 db_up = True
             except (Psycopg2Error, OperationalError):
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1) # wait 1 second then run loop again to check for live database
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(f'Database unavailable after {options["timeout"]:g} seconds.')  # fails run.sh, so the container restarts
+                wait = min(delay, remaining)
+                self.stdout.write(f'Database unavailable, waiting {wait:.1f} seconds...')
+                time.sleep(wait) # wait then run loop again to check for live database
+                delay = min(delay * 2, options['max_delay'])
 
         self.stdout.write(self.style.SUCCESS('Database available!!!'))
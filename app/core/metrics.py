@@ -0,0 +1,139 @@
+"""
+In process request metrics.
+"""
+import contextlib
+import contextvars
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+
+# upper bounds (ms) of the histogram buckets reported by the metrics endpoint, the last bucket is everything slower
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+
+def percentile(ordered, pct):
+    """Return the pct percentile (nearest rank) of a sorted, non empty list."""
+    return ordered[max(int(round(pct / 100 * len(ordered))) - 1, 0)]
+
+
+class RollingHistogram():
+    """Keeps the last `size` samples of a view's requests."""
+
+    def __init__(self, size):
+        self._samples = deque(maxlen=size)  # old samples fall off as new ones arrive
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def add(self, sample):
+        with self._lock:
+            self._samples.append(sample)
+            self.total += 1
+
+    def snapshot(self):
+        with self._lock:
+            samples = list(self._samples)
+            total = self.total
+        if not samples:
+            return {'total': total, 'window': 0}
+        durations = sorted(s['total_ms'] for s in samples)
+        buckets = {f'le_{bound}': 0 for bound in LATENCY_BUCKETS_MS}
+        buckets['inf'] = 0
+        for duration in durations:
+            bound = next((b for b in LATENCY_BUCKETS_MS if duration <= b), None)
+            buckets[f'le_{bound}' if bound else 'inf'] += 1
+        count = len(samples)
+        return {
+            'total': total,
+            'window': count,
+            'latency_ms': {
+                'p50': round(percentile(durations, 50), 3),
+                'p95': round(percentile(durations, 95), 3),
+                'p99': round(percentile(durations, 99), 3),
+                'max': round(durations[-1], 3),
+                'buckets': buckets,
+            },
+            'db_queries_avg': round(sum(s['db_queries'] for s in samples) / count, 2),
+            'db_ms_avg': round(sum(s['db_ms'] for s in samples) / count, 3),
+            'serialize_ms_avg': round(sum(s['serialize_ms'] for s in samples) / count, 3),
+            'response_bytes_avg': round(sum(s['response_bytes'] for s in samples) / count),
+            'errors': sum(1 for s in samples if s['status'] >= 500),
+        }
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+_sources = {}
+
+
+def record(view_name, sample):
+    """Add a request sample to the view's histogram."""
+    histogram = _histograms.get(view_name)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(view_name, RollingHistogram(settings.REQUEST_METRICS_WINDOW))
+    histogram.add(sample)
+
+
+def register_source(name, fn):
+    """Include fn()'s dict under name in the metrics snapshot (ie pool stats), unless it returns None."""
+    _sources[name] = fn
+
+
+def snapshot():
+    """Return all the metrics of this process."""
+    with _histograms_lock:
+        histograms = dict(_histograms)
+    data = {'views': {name: histogram.snapshot() for name, histogram in sorted(histograms.items())}}
+    for name, fn in _sources.items():
+        value = fn()
+        if value is not None:  # ie the uwsgi stats when not running under uwsgi
+            data[name] = value
+    return data
+
+
+def reset():
+    """Forget all the recorded request samples."""
+    with _histograms_lock:
+        _histograms.clear()
+
+
+class RequestTimings():
+    """Timings collected while handling one request."""
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_ms = 0.0
+        self.serialize_ms = 0.0
+        self.serialize_depth = 0
+
+
+current_timings = contextvars.ContextVar('current_timings', default=None)  # set by core.middleware.RequestMetricsMiddleware
+
+
+@contextlib.contextmanager
+def timed_serialization():
+    """Count the time spent inside the block as serialization in the request's Server-Timing/metrics."""
+    timings = current_timings.get()
+    if timings is None or timings.serialize_depth:  # not measuring, or nested inside serialization already being timed
+        yield
+        return
+    timings.serialize_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.serialize_ms += (time.perf_counter() - start) * 1000
+        timings.serialize_depth -= 1
+
+
+# add to a serializer to count the time spent building its output in the request's Server-Timing/metrics
+class TimedSerializerMixin():
+    def to_representation(self, instance):
+        timings = current_timings.get()
+        if timings is None or timings.serialize_depth:  # checked here too, so nested serializers skip the context manager overhead
+            return super().to_representation(instance)
+        with timed_serialization():
+            return super().to_representation(instance)
@@ -0,0 +1,181 @@
+"""
+Middleware for the app.
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from core import metrics
+from core.compression import is_compressible, choose_encoding, compress, compress_cached, compress_stream
+from core.metrics import RequestTimings, current_timings
+
+
+request_logger = logging.getLogger('app.requests')
+slow_query_logger = logging.getLogger('app.db.slow')
+
+
+def _db_wrapper(timings):
+    def wrapper(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            timings.db_queries += 1
+            timings.db_ms += duration
+            if duration >= settings.SLOW_QUERY_MS:
+                slow_query_logger.warning(json.dumps({
+                    'duration_ms': round(duration, 3),
+                    'alias': context['connection'].alias,
+                    'sql': sql[:2000],
+                }))
+    return wrapper
+
+
+@contextmanager
+def instrument_connections(timings):
+    """Count the queries run on this thread's connections inside the block in timings."""
+    with ExitStack() as stack:
+        for connection in connections.all():  # every db alias, ie replicas too
+            stack.enter_context(connection.execute_wrapper(_db_wrapper(timings)))
+        yield
+
+
+# async capable, so under ASGI async views run on the event loop without a hop to a thread for the middleware; connections are
+# per thread, so the queries of a view are only counted where the view runs inside instrument_connections (core.async_views)
+class RequestMetricsMiddleware():
+    """Record timing, db and size metrics for each (sampled) request."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine  # marks the instance as async, like django's MiddlewareMixin
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        sampled = random.random() < settings.REQUEST_METRICS_SAMPLE_RATE
+        if not sampled and settings.SLOW_QUERY_MS <= 0:
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            with instrument_connections(timings):
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self._finish(request, response, sampled, timings, start)
+
+    async def __acall__(self, request):
+        sampled = random.random() < settings.REQUEST_METRICS_SAMPLE_RATE
+        if not sampled and settings.SLOW_QUERY_MS <= 0:
+            return await self.get_response(request)
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)  # copied into the context of the threads sync_to_async runs the view in
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self._finish(request, response, sampled, timings, start)
+
+    def _finish(self, request, response, sampled, timings, start):
+        """Record the request's sample and add its Server-Timing header."""
+        total_ms = (time.perf_counter() - start) * 1000
+        if not sampled:
+            return response
+
+        match = request.resolver_match
+        view_name = f'{request.method} {match.view_name if match else "unresolved"}'
+        size = len(response.content) if not response.streaming else None
+        sample = {
+            'total_ms': total_ms,
+            'db_queries': timings.db_queries,
+            'db_ms': timings.db_ms,
+            'serialize_ms': timings.serialize_ms,
+            'response_bytes': size or 0,
+            'status': response.status_code,
+        }
+        metrics.record(view_name, sample)
+        response['Server-Timing'] = (
+            f'total;dur={total_ms:.3f}, '
+            f'db;dur={timings.db_ms:.3f};desc="{timings.db_queries} queries", '
+            f'serialize;dur={timings.serialize_ms:.3f}'
+        )
+        request_logger.info(json.dumps({
+            'view': view_name,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(total_ms, 3),
+            'db_queries': timings.db_queries,
+            'db_ms': round(timings.db_ms, 3),
+            'serialize_ms': round(timings.serialize_ms, 3),
+            'response_bytes': size,
+        }))
+        return response
+
+
+# like django's GZipMiddleware, plus brotli, a configurable size threshold, content type checks and cached compression of fixed documents
+class CompressionMiddleware():
+    """Compress responses with the best encoding the client accepts."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self._compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._compress(request, await self.get_response(request))  # on the event loop, a list page compresses in about a ms
+
+    def _compress(self, request, response):
+        """Return response compressed for the request, when it's worth it."""
+        if response.has_header('Content-Encoding') or not is_compressible(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response  # small bodies fit in a packet or two anyway, compressing them only costs cpu
+
+        patch_vary_headers(response, ['Accept-Encoding'])
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), streaming=response.streaming)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(response.streaming_content, encoding)
+            if response.has_header('Content-Length'):
+                del response['Content-Length']  # unknown until the stream is done
+        else:
+            if request.path in settings.COMPRESSION_CACHED_PATHS:  # ie the schema, the same large document on every request
+                compressed = compress_cached(response.content, encoding)
+            else:
+                compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag  # the bytes differ from the uncompressed body, so a strong ETag no longer fits
+        response['Content-Encoding'] = encoding
+        return response
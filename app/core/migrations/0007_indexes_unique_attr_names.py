@@ -0,0 +1,57 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:11
+
+from django.db import migrations, models
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Keep one tag/ingredient per (user, name) so the unique constraints can be added."""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field_name in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = Recipe._meta.get_field(field_name).remote_field.through
+        fk = f'{model_name.lower()}_id'
+        duplicates = (
+            model.objects.values('user', 'name')
+            .annotate(keep_id=models.Min('id'), total=models.Count('id'))
+            .filter(total__gt=1)
+        )
+        for duplicate in duplicates:
+            keep_id = duplicate['keep_id']
+            extra_ids = list(
+                model.objects.filter(user=duplicate['user'], name=duplicate['name'])
+                .exclude(id=keep_id)
+                .values_list('id', flat=True)
+            )
+            linked = set(through.objects.filter(**{f'{fk}__in': extra_ids}).values_list('recipe_id', flat=True))
+            already = set(through.objects.filter(**{fk: keep_id}).values_list('recipe_id', flat=True))
+            through.objects.bulk_create([
+                through(recipe_id=recipe_id, **{fk: keep_id}) for recipe_id in linked - already
+            ])
+            model.objects.filter(id__in=extra_ids).delete()
+    if schema_editor.connection.vendor == 'postgresql':
+        # run the deferred foreign key checks of the deletes/inserts above now: postgres refuses the ALTER TABLEs below in a transaction
+        # with trigger events still pending on their tables ("cannot ALTER TABLE because it has pending trigger events")
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], name='recipe_user_id_desc_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_ingredient_name_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_tag_name_per_user'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:23
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# the GIN index and the backfill only exist on postgres; other databases use recipe.search's in process index
+POSTGRES_FORWARD = [
+    'CREATE INDEX recipe_search_vector_gin ON core_recipe USING gin (search_vector)',
+    """
+    UPDATE core_recipe AS r SET search_vector =
+        setweight(to_tsvector('english', coalesce(r.title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce((
+            SELECT string_agg(name, ' ') FROM (
+                SELECT t.name FROM core_tag t
+                JOIN core_recipe_tags rt ON rt.tag_id = t.id WHERE rt.recipe_id = r.id
+                UNION ALL
+                SELECT i.name FROM core_ingredient i
+                JOIN core_recipe_ingredients ri ON ri.ingredient_id = i.id WHERE ri.recipe_id = r.id
+            ) AS names
+        ), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(r.description, '')), 'C')
+    """,
+]
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS recipe_search_vector_gin',
+]
+
+
+def run_on_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(run_on_postgres(POSTGRES_FORWARD), run_on_postgres(POSTGRES_BACKWARD)),
+    ]
@@ -4,7 +4,10 @@ Database models.
 import uuid, os
 
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -59,6 +62,22 @@ class User(AbstractBaseUser, PermissionsMixin):  # don't forget to add this mode
     USERNAME_FIELD = 'email'  # this to switch default user authentication field from username to email
 
 
+# tags and ingredients keep a denormalized count of the recipes using them, maintained by recipe.signals
+class RecipeAttrQuerySet(models.QuerySet):
+    """QuerySet for recipe attributes (tags and ingredients)."""
+
+    def live_recipe_count(self):
+        """Return an expression counting each row's recipes from the m2m link table."""
+        rel = self.model._meta.get_field('recipe')  # reverse side of Recipe.tags/Recipe.ingredients
+        attr_id = f'{rel.field.m2m_reverse_field_name()}_id'  # ie tag_id
+        links = rel.through.objects.filter(**{attr_id: models.OuterRef('pk')}).order_by().values(attr_id)
+        return Coalesce(Subquery(links.annotate(count=models.Count('id')).values('count')), 0)
+
+    def refresh_recipe_counts(self):
+        """Recount recipe_count for every row in the queryset, returning the number of rows updated."""
+        return self.update(recipe_count=self.live_recipe_count())  # recounted rather than +1/-1 so no-op adds/removes can't drift it
+
+
 class Tag(models.Model):
     """Tag for filtering recipes."""
     name = models.CharField(max_length=255)
@@ -66,6 +85,18 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,  # ref our main user model
         on_delete=models.CASCADE  # if delete user, delete their tags
     )
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)  # number of recipes using the tag
+
+    objects = RecipeAttrQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # the unique index on (user, name) also covers the per-user name lookups and ORDER BY name
+            models.UniqueConstraint(fields=['user', 'name'], name='unique_tag_name_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'recipe_count'], name='tag_user_count_idx'),  # assigned_only (recipe_count > 0) and ordering by usage
+        ]
 
     def __str__(self):
         return self.name
@@ -78,11 +109,72 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = RecipeAttrQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='unique_ingredient_name_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'recipe_count'], name='ingredient_user_count_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
 
+# custom queryset so the recipe views can ask for exactly the related data each action needs (avoids N+1 queries on nested tags/ingredients)
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet for recipes."""
+    LIST_DEFERRED_FIELDS = ['description', 'image', 'image_variants', 'search_vector']  # columns the list serializer never renders
+
+    NESTED_FIELDS = {'tags': Tag, 'ingredients': Ingredient}
+
+    def with_nested(self, *fields):
+        """Prefetch the tags and ingredients (or just the given ones) rendered by the recipe serializers."""
+        return self.prefetch_related(*[  # 1 extra query per relation for the whole page instead of 1 per recipe
+            models.Prefetch(field, queryset=model.objects.order_by('id'))  # ordered so the output is stable (and matches recipe.fast)
+            for field, model in self.NESTED_FIELDS.items()
+            if not fields or field in fields
+        ])
+
+    def for_fields(self, fields):
+        """Load only the columns and relations needed to render the given serializer fields."""
+        columns = {'id'} | {field for field in fields if field not in self.NESTED_FIELDS}
+        if 'image_variants' in columns:
+            columns.add('image')  # the variant urls are built from the image name
+        nested = [field for field in self.NESTED_FIELDS if field in fields]
+        queryset = self.prefetch_related(None).only(*columns)  # only() replaces the action's defer()
+        return queryset.with_nested(*nested) if nested else queryset
+
+    def for_action(self, action):
+        """Return the queryset shaped for the given viewset action."""
+        if action == 'list':
+            return self.with_nested().defer(*self.LIST_DEFERRED_FIELDS)
+        if action in ('retrieve', 'update', 'partial_update'):
+            return self.with_nested().defer('search_vector')
+        return self  # destroy, upload_image etc. don't render nested objects
+
+    def with_related(self, field, ids, match_all=False):
+        """Filter to recipes linked to any (or with match_all, every) one of the ids on the m2m field."""
+        m2m = self.model._meta.get_field(field)
+        through = m2m.remote_field.through  # query the link table directly instead of joining it in, so no DISTINCT is needed
+        recipe_id, related_id = f'{m2m.m2m_field_name()}_id', f'{m2m.m2m_reverse_field_name()}_id'  # ie recipe_id, tag_id
+        ids = set(ids)
+        if match_all:
+            # recipes with one link row per requested id: SELECT recipe_id ... GROUP BY recipe_id HAVING COUNT(*) = len(ids)
+            matched = through.objects.filter(**{f'{related_id}__in': ids}).values(recipe_id).annotate(
+                matches=models.Count('id'),
+            ).filter(matches=len(ids)).values(recipe_id)
+            return self.filter(pk__in=matched)
+        # WHERE EXISTS (SELECT 1 FROM link WHERE recipe_id = recipe.id AND tag_id IN ...) stops at the first match per recipe
+        return self.filter(models.Exists(through.objects.filter(
+            **{recipe_id: models.OuterRef('pk'), f'{related_id}__in': ids}
+        )))
+
+
 class Recipe(models.Model):  # don't forget to add this model to admin.py
     """Recipe object."""
     # set relationship to the user model
@@ -98,6 +190,15 @@ class Recipe(models.Model):  # don't forget to add this model to admin.py
     tags = models.ManyToManyField(Tag)  # can place the many to many field in either model, creates an intermediary model with FK to both related models; can either ref Tag or 'Tag' but since Tag is defined later, doesn't work;
     ingredients = models.ManyToManyField(Ingredient)
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)  # just pass in a ref to fn in upload_to, don't call the fn
+    image_variants = models.JSONField(default=dict, blank=True)  # resized copies of image, filled in the background by recipe.images
+    search_vector = SearchVectorField(null=True, editable=False)  # title/tags/ingredients/description for full text search on postgres, kept up to date by recipe.search
+
+    objects = RecipeQuerySet.as_manager()  # Recipe.objects.all() now returns a RecipeQuerySet
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='recipe_user_id_desc_idx'),  # covers the recipe list query: WHERE user_id = ... ORDER BY id DESC
+        ]
 
     def __str__(self):
         return self.title
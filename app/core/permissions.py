@@ -0,0 +1,15 @@
+"""
+Permissions for the core APIs.
+"""
+from django.conf import settings
+
+from rest_framework.permissions import BasePermission
+
+
+class IsInternalRequest(BasePermission):
+    """Allow staff users, or requests from the internal IPs in METRICS_ALLOWED_IPS."""
+
+    def has_permission(self, request, view):
+        if request.user and request.user.is_staff:
+            return True
+        return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
@@ -0,0 +1,30 @@
+"""
+Renderers for the APIs.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib json used by JSONRenderer is the fallback
+    orjson = None
+
+
+# same bytes as DRF's JSONRenderer (compact, utf-8, \u2028/\u2029 escaped), encoded by orjson when it's installed
+class FastJSONRenderer(JSONRenderer):
+    """JSON renderer using orjson, falling back to the stdlib json encoder."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:  # ie the browsable api, pretty printed
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,  # Decimal, lazy strings, querysets etc. are converted the way DRF does
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,  # datetimes go to default too, DRF trims them to ms
+            )
+        except TypeError:  # orjson.JSONEncodeError, ie ints over 64 bits, which the stdlib encoder handles
+            return super().render(data, accepted_media_type, renderer_context)
+        # JSONRenderer always escapes these so the output is also valid javascript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
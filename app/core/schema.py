@@ -0,0 +1,107 @@
+"""
+Precomputed OpenAPI schema documents.
+"""
+import functools
+import hashlib
+import json
+import os
+import threading
+
+import django
+import drf_spectacular
+import rest_framework
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+# format -> (renderer, file name, content type); the generator and renderers are only imported when generating (generate_schema at
+# build time), a worker serving the saved documents never loads them
+FORMATS = {
+    'yaml': ('drf_spectacular.renderers.OpenApiYamlRenderer', 'openapi.yaml', 'application/vnd.oai.openapi; charset=utf-8'),
+    'json': ('drf_spectacular.renderers.OpenApiJsonRenderer', 'openapi.json', 'application/vnd.oai.openapi+json'),
+}
+MANIFEST = 'manifest.json'
+
+_documents = {}  # (directory, version) -> {format: (body, etag)}, so each worker reads the files once
+_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _source_fingerprint():
+    """Return a hash of the app's python source and the packages that shape the schema."""
+    digest = hashlib.sha256()
+    for package in (django, rest_framework, drf_spectacular):
+        digest.update(f'{package.__name__}={package.__version__};'.encode())
+    digest.update(repr(sorted(getattr(settings, 'SPECTACULAR_SETTINGS', {}).items())).encode())
+    for root, dirs, files in os.walk(settings.BASE_DIR):
+        dirs[:] = sorted(d for d in dirs if d not in ('tests', 'migrations', '__pycache__'))  # can't change the schema
+        for name in sorted(files):
+            if name.endswith('.py'):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, settings.BASE_DIR).encode())
+                with open(path, 'rb') as source:
+                    digest.update(source.read())
+    return digest.hexdigest()[:16]
+
+
+def code_version():
+    """Return the version of the deployed code, APP_VERSION (ie the git sha) or a fingerprint of the source."""
+    return settings.APP_VERSION or _source_fingerprint()
+
+
+def etag_for(body):
+    """Return a strong ETag for a document body."""
+    return '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+
+def generate():
+    """Generate the schema and return {format: body}."""
+    from drf_spectacular.generators import SchemaGenerator
+
+    schema = SchemaGenerator().get_schema(request=None, public=True)  # what SpectacularAPIView serves anonymous requests
+    return {fmt: import_string(renderer)().render(schema, renderer_context={}) for fmt, (renderer, _, _) in FORMATS.items()}
+
+
+def read_documents(directory, version):
+    """Return {format: body} saved in directory for version, or None if missing or for another version."""
+    try:
+        with open(os.path.join(directory, MANIFEST)) as manifest_file:
+            if json.load(manifest_file).get('version') != version:
+                return None
+        documents = {}
+        for fmt, (_, file_name, _) in FORMATS.items():
+            with open(os.path.join(directory, file_name), 'rb') as document_file:
+                documents[fmt] = document_file.read()
+        return documents
+    except (OSError, ValueError):
+        return None
+
+
+def write_documents(directory, version, documents):
+    """Save the documents for version in directory, each file replaced atomically."""
+    os.makedirs(directory, exist_ok=True)
+    files = [(FORMATS[fmt][1], body) for fmt, body in documents.items()]
+    files.append((MANIFEST, json.dumps({'version': version}).encode()))  # last, so a reader never sees a manifest for documents not yet written
+    for file_name, body in files:
+        tmp_path = os.path.join(directory, f'.{file_name}.{os.getpid()}.tmp')
+        with open(tmp_path, 'wb') as tmp_file:
+            tmp_file.write(body)
+        os.replace(tmp_path, os.path.join(directory, file_name))
+
+
+def get_document(fmt):
+    """Return (body, etag) of the schema in fmt, from disk or generated (and saved) if missing or stale."""
+    version = code_version()
+    key = (settings.SCHEMA_ROOT, version)
+    if key not in _documents:
+        with _lock:
+            if key not in _documents:
+                documents = read_documents(settings.SCHEMA_ROOT, version)
+                if documents is None:  # generate_schema didn't run for this version, ie local development
+                    documents = generate()
+                    try:
+                        write_documents(settings.SCHEMA_ROOT, version, documents)
+                    except OSError:
+                        pass  # read only filesystem, keep it in memory only
+                _documents[key] = {name: (body, etag_for(body)) for name, body in documents.items()}
+    return _documents[key][fmt]
@@ -0,0 +1,26 @@
+"""
+Signal handlers for the core models.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from core.authentication import evict_token, evict_user
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    """Stop accepting a cached token once it is deleted."""
+    evict_token(instance.key, instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def evict_changed_user(sender, instance, **kwargs):
+    """Drop cached tokens of a user that was changed (ie deactivated) or deleted."""
+    if kwargs.get('created'):
+        return  # a new user has no tokens yet
+    token_keys = Token.objects.filter(user_id=instance.pk).values_list('key', flat=True)
+    evict_user(instance.pk, token_keys)
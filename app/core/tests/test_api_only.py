@@ -0,0 +1,49 @@
+"""
+Tests for leaving parts of the app out of workers that only serve the api.
+"""
+import importlib
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from app import urls
+from core.views import lazy_view
+
+
+def load_urlpatterns(api_only):
+    """Return {name or route: pattern} of the app's urls with API_ONLY set to api_only."""
+    with override_settings(API_ONLY=api_only):
+        patterns = importlib.reload(urls).urlpatterns
+    return {getattr(pattern, 'name', None) or str(pattern.pattern): pattern for pattern in patterns}
+
+
+class ApiOnlyTests(SimpleTestCase):
+    """Test the urls served with and without API_ONLY."""
+
+    def tearDown(self):
+        importlib.reload(urls)  # back to the patterns for the test settings
+
+    def test_admin_and_docs_left_out(self):
+        """Test the admin and the swagger ui are only routed without API_ONLY."""
+        full = load_urlpatterns(api_only=False)
+        api_only = load_urlpatterns(api_only=True)
+
+        self.assertIn('admin/', full)
+        self.assertIn('api-docs', full)
+        self.assertNotIn('admin/', api_only)
+        self.assertNotIn('api-docs', api_only)
+        self.assertEqual(set(full) - set(api_only), {'admin/', 'api-docs'})
+
+    def test_docs_route_is_lazy(self):
+        """Test the swagger ui isn't imported with the urlconf."""
+        docs = load_urlpatterns(api_only=False)['api-docs']
+
+        self.assertFalse(hasattr(docs.callback, 'cls'))  # the wrapper, not SchemaSwaggerView's view
+
+    def test_lazy_view(self):
+        """Test the view at the dotted path is imported and set up with the initkwargs when called."""
+        view = lazy_view('django.views.generic.base.RedirectView', url='/api/health-check/')
+
+        res = view(RequestFactory().get('/'))
+
+        self.assertTrue(view.csrf_exempt)
+        self.assertEqual(res['Location'], '/api/health-check/')
@@ -0,0 +1,108 @@
+"""
+Tests for the views and middleware used under ASGI.
+"""
+import asyncio
+import shutil
+import tempfile
+import threading
+
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from core import metrics
+from core.async_views import run_in_thread_pool
+from core.metrics import RequestTimings, current_timings
+from core.views import health_check, health_check_async
+
+
+class AsyncHealthCheckTests(TestCase):
+    """Test the async health check."""
+
+    async def test_health_check(self):
+        """Test the async health check answers like the DRF one."""
+        res = await health_check_async(RequestFactory().get('/api/health-check/'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertEqual(res.content, b'{"healthy": true}')
+
+    async def test_health_check_get_only(self):
+        """Test the async health check rejects other methods."""
+        res = await health_check_async(RequestFactory().post('/api/health-check/'))
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_documented_like_drf_view(self):
+        """Test the schema generator sees the DRF view class."""
+        self.assertTrue(asyncio.iscoroutinefunction(health_check_async))
+        self.assertIs(health_check_async.cls, health_check.cls)
+
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=1.0, SLOW_QUERY_MS=0)
+class AsyncMiddlewareTests(TestCase):
+    """Test the app's middleware handles requests served over ASGI."""
+
+    def setUp(self):
+        metrics.reset()
+        self.schema_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(SCHEMA_ROOT=self.schema_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.schema_root)
+
+    async def test_metrics_and_compression(self):
+        """Test requests through the async handler get timings and compressed bodies."""
+        res = await self.async_client.get(reverse('api-schema'), ACCEPT_ENCODING='gzip')  # django 3.2's AsyncClient takes bare header names
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('total;dur=', res['Server-Timing'])
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn('GET api-schema', metrics.snapshot()['views'])
+
+
+class RunInThreadPoolTests(TransactionTestCase):  # the view runs on another thread, with its own connection, so data must be committed
+    """Test wrapping sync views to run in the thread pool."""
+
+    def test_runs_off_the_event_loop_thread(self):
+        """Test the view runs in the thread pool and its response is rendered there."""
+        threads = []
+
+        @api_view(['GET'])
+        def view(request):
+            threads.append(threading.current_thread())
+            return Response({'ok': True})
+
+        wrapped = run_in_thread_pool(view)
+        res = async_to_sync(wrapped)(RequestFactory().get('/'))
+
+        self.assertTrue(asyncio.iscoroutinefunction(wrapped))
+        self.assertTrue(wrapped.csrf_exempt)
+        self.assertIsNot(threads[0], threading.current_thread())
+        self.assertTrue(res.is_rendered)
+        self.assertEqual(res.content, b'{"ok":true}')
+
+    def test_counts_queries(self):
+        """Test the queries the view runs on the pool thread are counted in the request's timings."""
+        def view(request):
+            return HttpResponse(str(get_user_model().objects.count()))
+
+        get_user_model().objects.create_user(email='user@example.com', password='password123')
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            res = async_to_sync(run_in_thread_pool(view))(RequestFactory().get('/'))
+        finally:
+            current_timings.reset(token)
+
+        self.assertEqual(res.content, b'1')
+        self.assertEqual(timings.db_queries, 1)
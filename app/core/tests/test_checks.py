@@ -0,0 +1,73 @@
+"""
+Tests for the app's system checks.
+"""
+from django.test import SimpleTestCase, override_settings
+
+from core import checks
+
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+MEMCACHED = {'default': {'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache', 'LOCATION': 'cache:11211'}}
+
+
+class ResponseCacheCheckTests(SimpleTestCase):
+    """Test the check that the recipe response cache is shared between workers."""
+
+    @override_settings(CACHES=LOCMEM, RECIPE_CACHE_TIMEOUT=300)
+    def test_local_memory_cache_is_an_error(self):
+        """Test a per process cache for the responses is an error."""
+        errors = checks.check_response_cache_shared(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+
+    @override_settings(CACHES=MEMCACHED, RECIPE_CACHE_TIMEOUT=300)
+    def test_shared_cache_passes(self):
+        """Test a shared cache passes."""
+        self.assertEqual(checks.check_response_cache_shared(None), [])
+
+    @override_settings(CACHES=LOCMEM, RECIPE_CACHE_TIMEOUT=0)
+    def test_caching_turned_off_passes(self):
+        """Test there's nothing to share with the response cache turned off."""
+        self.assertEqual(checks.check_response_cache_shared(None), [])
+
+
+class ReplicaPinCheckTests(SimpleTestCase):
+    """Test the check that the replica pins are shared between workers."""
+
+    @override_settings(CACHES=LOCMEM, DB_REPLICAS=['replica1'])
+    def test_local_memory_cache_with_replicas_is_an_error(self):
+        """Test replicas with a per process cache are an error."""
+        errors = checks.check_replica_pin_shared(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E002'])
+
+    @override_settings(CACHES=MEMCACHED, DB_REPLICAS=['replica1'])
+    def test_shared_cache_with_replicas_passes(self):
+        """Test replicas with a shared cache pass."""
+        self.assertEqual(checks.check_replica_pin_shared(None), [])
+
+    @override_settings(CACHES=LOCMEM, DB_REPLICAS=[])
+    def test_no_replicas_passes(self):
+        """Test there's nothing to pin without replicas."""
+        self.assertEqual(checks.check_replica_pin_shared(None), [])
+
+
+class PoolSizeCheckTests(SimpleTestCase):
+    """Test the check that pgbouncer's pool covers the app's request threads."""
+
+    @override_settings(DB_POOL='pgbouncer', DB_POOL_SIZE=4, UWSGI_PROCESSES=9, UWSGI_THREADS=2)
+    def test_pool_below_threads_warns(self):
+        """Test a pool smaller than processes x threads is a warning."""
+        warnings = checks.check_pool_size(None)
+
+        self.assertEqual([warning.id for warning in warnings], ['core.W003'])
+
+    @override_settings(DB_POOL='pgbouncer', DB_POOL_SIZE=18, UWSGI_PROCESSES=9, UWSGI_THREADS=2)
+    def test_pool_covering_threads_passes(self):
+        """Test a pool with a connection per request thread passes."""
+        self.assertEqual(checks.check_pool_size(None), [])
+
+    @override_settings(DB_POOL='', DB_POOL_SIZE=4, UWSGI_PROCESSES=9, UWSGI_THREADS=2)
+    def test_no_pool_passes(self):
+        """Test the size doesn't matter without pgbouncer."""
+        self.assertEqual(checks.check_pool_size(None), [])
@@ -1,13 +1,20 @@
 """
 Test custom Django mgmt commands.
 """
+import json
+import tempfile
+
+from io import StringIO
 from unittest.mock import patch # needed to MOCK the behavior of the database, to save time testing vs actually depending on database behavior
 
 from psycopg2 import OperationalError as Psycopg2Error # one possible error we may receive before the database is ready
 
-from django.core.management import call_command # helper fn that allows us to call the command that we're testing
+from django.core.management import call_command, CommandError # helper fn that allows us to call the command that we're testing
 from django.db.utils import OperationalError # another exception we might encounter when database is created/run
-from django.test import SimpleTestCase # basic testing for unit tests. using simple test to avoid migrations folder etc needed for a standard database
+from django.test import SimpleTestCase, TestCase, override_settings # basic testing for unit tests. using simple test to avoid migrations folder etc needed for a standard database
+
+from core.management.commands import profile_imports
+from core.models import Recipe
 
 
 # @patch() decorator to mock functions. we're going to simulate database running without actually running it
@@ -43,3 +50,196 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6) # checking that the 'check' command in @patch decorator fn is being called exactly 6 times as input in side_effect
         patched_check.assert_called_with(databases=['default']) # using called_with vs called_once_with since there's multiple calls being made here
+
+    # waits double after each failed attempt, up to --max-delay
+    @patch('time.sleep')
+    def test_wait_for_db_backoff(self, patched_sleep, patched_check):
+        """Test the waits between attempts grow exponentially."""
+        patched_check.side_effect = [OperationalError] * 6 + [True]
+
+        call_command('wait_for_db', max_delay=1, stdout=StringIO())
+
+        waits = [call.args[0] for call in patched_sleep.call_args_list]
+        self.assertEqual(waits, [0.1, 0.2, 0.4, 0.8, 1, 1])
+
+    # gives up with an error, so run.sh fails and the container is restarted, instead of waiting forever
+    @patch('time.sleep')
+    def test_wait_for_db_timeout(self, patched_sleep, patched_check):
+        """Test waiting for the database gives up after the timeout."""
+        patched_check.side_effect = OperationalError
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', timeout=0, stdout=StringIO())
+
+        self.assertEqual(patched_check.call_count, 1)
+        patched_sleep.assert_not_called()
+
+    # with DB_POOL set the command also waits until a query gets through the pool, ie pgbouncer reaching postgres
+    @override_settings(DB_POOL='pgbouncer')
+    @patch('time.sleep')
+    @patch('core.management.commands.wait_for_db.Command.check_pool')
+    def test_wait_for_db_pool(self, patched_check_pool, patched_sleep, patched_check):
+        """Test waiting for the connection pool to reach the database."""
+        patched_check.return_value = True
+        patched_check_pool.side_effect = [OperationalError] * 2 + [None]
+
+        call_command('wait_for_db')
+
+        self.assertEqual(patched_check_pool.call_count, 3)
+        self.assertEqual(patched_check.call_count, 3)
+
+
+class BenchmarkQueriesCommandTests(TestCase):
+    """Test the benchmark_queries command."""
+
+    def test_benchmark_queries_reports_and_rolls_back(self):
+        """Test the command reports each hot query and leaves no seeded data behind."""
+        out = StringIO()
+
+        call_command('benchmark_queries', users=2, recipes=5, attrs=3, runs=1, stdout=out)
+
+        self.assertIn('recipe list (user, -id)', out.getvalue())
+        self.assertIn('tag lookup (user, name in ...)', out.getvalue())
+        self.assertFalse(Recipe.objects.exists())  # seeded rows were rolled back
+
+
+class BenchmarkApiCommandTests(TestCase):
+    """Test the benchmark_api command."""
+
+    def test_benchmark_api_json_report(self):
+        """Test the command reports stats per scenario as JSON and cleans up."""
+        with tempfile.NamedTemporaryFile(suffix='.json') as report_file:
+            call_command(
+                'benchmark_api',
+                users=2, recipes=3, requests=4, concurrency=1,
+                scenarios='recipe-list,recipe-detail',
+                json_path=report_file.name,
+                stdout=StringIO(),
+            )
+            report = json.load(report_file)
+
+        stats = report['scenarios']['recipe-list']
+        self.assertEqual(stats['requests'], 4)
+        self.assertEqual(stats['errors'], 0)
+        self.assertEqual(set(stats['latency_ms']), {'p50', 'p95', 'p99', 'mean'})
+        self.assertIsNotNone(stats['queries_per_request'])
+        self.assertIn('recipe-detail', report['scenarios'])
+        self.assertFalse(Recipe.objects.exists())  # seeded data was deleted
+
+    def test_benchmark_api_unknown_scenario(self):
+        """Test an unknown scenario name is an error."""
+        with self.assertRaises(CommandError):
+            call_command('benchmark_api', scenarios='nope', stdout=StringIO())
+
+
+class BenchmarkCompressionCommandTests(TestCase):
+    """Test the benchmark_compression command."""
+
+    def test_benchmark_compression_report(self):
+        """Test the command reports sizes and cpu time per payload and encoding."""
+        out = StringIO()
+
+        call_command('benchmark_compression', sizes='5', gzip_levels='1,6', runs=1, no_schema=True, json_path='-', stdout=out)
+
+        report = json.loads(out.getvalue()[out.getvalue().index('{'):])
+        rows = report['payloads']['recipe list (5)']
+        self.assertEqual([(row['encoding'], row['level']) for row in rows][:3], [('identity', None), ('gzip', 1), ('gzip', 6)])
+        self.assertLess(rows[2]['bytes'], rows[0]['bytes'])
+
+
+class ProfileImportsCommandTests(SimpleTestCase):
+    """Test the profile_imports command."""
+
+    def test_summarize_groups_by_installed_app(self):
+        """Test modules are grouped by the longest installed app name, the rest by top level package."""
+        rows = profile_imports.parse_importtime(
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:      1500 |       1500 |     django.contrib.admin.sites\n'
+            'import time:       500 |       2000 |   django.contrib.admin\n'
+            'import time:      2000 |       2000 | django.db\n'
+            'import time:       250 |        250 | yaml.reader\n'
+        )
+
+        summary = profile_imports.summarize(rows, ['django.contrib.admin', 'core'])
+
+        self.assertEqual(rows[0], ('django.contrib.admin.sites', 1500, 1500))
+        self.assertEqual(summary, [
+            {'group': 'django.contrib.admin', 'modules': 2, 'self_ms': 2.0},
+            {'group': 'django', 'modules': 1, 'self_ms': 2.0},
+            {'group': 'yaml', 'modules': 1, 'self_ms': 0.2},
+        ])
+
+    def test_profile_imports_report(self):
+        """Test the command profiles a fresh interpreter importing the app."""
+        out = StringIO()
+
+        call_command('profile_imports', limit=5, json_path='-', stdout=out)
+
+        report = json.loads(out.getvalue()[out.getvalue().index('{'):])
+        self.assertEqual(report['module'], 'app.wsgi')
+        self.assertGreater(report['max_rss_kb'], 0)
+        self.assertIn('core', [row['group'] for row in report['groups']])
+        self.assertEqual(len(report['slowest']), 5)
+
+
+class MigrateLockedCommandTests(TestCase):
+    """Test the migrate_locked command."""
+
+    def test_migrate_locked_nothing_to_apply(self):
+        """Test the command doesn't migrate or take the lock when the database is up to date."""
+        out = StringIO()
+
+        with patch('core.management.commands.migrate_locked.call_command') as patched_migrate:
+            call_command('migrate_locked', stdout=out)
+
+        patched_migrate.assert_not_called()
+        self.assertIn('No migrations to apply.', out.getvalue())
+
+    @patch('core.management.commands.migrate_locked.Command.pending', return_value=True)
+    def test_migrate_locked_without_postgres(self, patched_pending):
+        """Test databases without advisory locks are migrated directly."""
+        with patch('core.management.commands.migrate_locked.call_command') as patched_migrate, \
+                patch('core.management.commands.migrate_locked.Command.acquire') as patched_acquire:
+            call_command('migrate_locked', stdout=StringIO())
+
+        patched_acquire.assert_not_called()
+        patched_migrate.assert_called_once()
+        self.assertEqual(patched_migrate.call_args.args, ('migrate',))
+        self.assertFalse(patched_migrate.call_args.kwargs['interactive'])
+
+    @patch('core.management.commands.migrate_locked.Command.pending', side_effect=[True, False])
+    @patch('core.management.commands.migrate_locked.connections')
+    def test_migrate_locked_applied_while_waiting(self, patched_connections, patched_pending):
+        """Test a replica that gets the lock after another one migrated doesn't migrate again, and releases the lock."""
+        connection = patched_connections.__getitem__.return_value
+        connection.vendor = 'postgresql'
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = (True,)
+        out = StringIO()
+
+        with patch('core.management.commands.migrate_locked.call_command') as patched_migrate:
+            call_command('migrate_locked', stdout=out)
+
+        patched_migrate.assert_not_called()
+        self.assertIn('applied by another replica', out.getvalue())
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        self.assertEqual(statements, ['SELECT pg_try_advisory_lock(%s)', 'SELECT pg_advisory_unlock(%s)'])
+
+    @override_settings(DB_POOL='pgbouncer')
+    @patch('core.management.commands.migrate_locked.Command.pending', return_value=True)
+    @patch('core.management.commands.migrate_locked.transaction')
+    @patch('core.management.commands.migrate_locked.connections')
+    def test_migrate_locked_through_pool(self, patched_connections, patched_transaction, patched_pending):
+        """Test migrating through pgbouncer takes a transaction's lock instead of a session's."""
+        connection = patched_connections.__getitem__.return_value
+        connection.vendor = 'postgresql'
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = (True,)
+
+        with patch('core.management.commands.migrate_locked.call_command') as patched_migrate:
+            call_command('migrate_locked', stdout=StringIO())
+
+        patched_migrate.assert_called_once()
+        patched_transaction.atomic.assert_called_once_with(using=connection.alias)
+        statements = [call.args[0] for call in cursor.execute.call_args_list]
+        self.assertEqual(statements, ['SELECT pg_try_advisory_xact_lock(%s)'])
@@ -0,0 +1,123 @@
+"""
+Tests for response compression.
+"""
+import gzip
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import compression
+from core.models import Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+SCHEMA_URL = reverse('api-schema')
+
+
+class CompressionHelperTests(SimpleTestCase):
+    """Test the compression helpers."""
+
+    def test_is_compressible(self):
+        """Test text types are compressed and already compressed media isn't."""
+        for content_type in ['application/json', 'application/x-ndjson', 'text/html; charset=utf-8',
+                             'application/vnd.oai.openapi; charset=utf-8', 'application/problem+json', 'image/svg+xml']:
+            self.assertTrue(compression.is_compressible(content_type), content_type)
+        for content_type in ['image/jpeg', 'image/webp', 'application/zip', 'application/octet-stream', '']:
+            self.assertFalse(compression.is_compressible(content_type), content_type)
+
+    def test_choose_encoding(self):
+        """Test the encoding is negotiated from Accept-Encoding q values."""
+        self.assertIsNone(compression.choose_encoding(''))
+        self.assertIsNone(compression.choose_encoding('identity'))
+        self.assertIsNone(compression.choose_encoding('gzip;q=0'))
+        self.assertEqual(compression.choose_encoding('deflate, gzip;q=0.5'), 'gzip')
+        self.assertEqual(compression.choose_encoding('*'), 'br' if compression.brotli else 'gzip')
+        self.assertEqual(compression.choose_encoding('gzip, br', streaming=True), 'gzip')
+
+    @skipIf(compression.brotli is None, 'Brotli is not installed')
+    def test_choose_brotli(self):
+        """Test brotli is preferred when accepted equally."""
+        self.assertEqual(compression.choose_encoding('gzip, deflate, br'), 'br')
+        self.assertEqual(compression.choose_encoding('gzip, br;q=0.5'), 'gzip')
+
+
+@override_settings(COMPRESSION_MIN_SIZE=500)
+class CompressionMiddlewareTests(TestCase):
+    """Test the compression middleware."""
+
+    def setUp(self):
+        cache.clear()
+        self.schema_root = tempfile.mkdtemp()  # the schema requests save the generated documents there
+        self.settings_override = override_settings(SCHEMA_ROOT=self.schema_root)
+        self.settings_override.enable()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.schema_root)
+
+    def create_recipes(self, count):
+        for i in range(count):
+            Recipe.objects.create(user=self.user, title=f'Recipe {i}', time_minutes=5, price=Decimal('1.00'))
+
+    def test_large_response_gzipped(self):
+        """Test responses over the threshold are gzipped when accepted."""
+        self.create_recipes(20)
+        plain = self.client.get(RECIPES_URL)
+
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(int(res['Content-Length']), len(res.content))
+        self.assertIn('Accept-Encoding', res['Vary'])
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+        self.assertNotIn('Content-Encoding', plain)
+
+    def test_small_response_not_compressed(self):
+        """Test responses under the threshold are sent as is."""
+        self.create_recipes(1)
+
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertNotIn('Content-Encoding', res)
+
+    def test_etag_weakened_and_matched(self):
+        """Test compressed responses get a weak ETag that still revalidates."""
+        self.create_recipes(20)
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(res['ETag'].startswith('W/"'))
+
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_streaming_response_gzipped(self):
+        """Test streamed responses are gzipped chunk by chunk."""
+        self.create_recipes(3)
+        plain = b''.join(self.client.get(reverse('recipe:recipe-export')).streaming_content)
+
+        res = self.client.get(reverse('recipe:recipe-export'), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(res.streaming_content)), plain)
+
+    def test_schema_compression_cached(self):
+        """Test the compressed schema document is reused between requests."""
+        with patch('core.compression.compress', wraps=compression.compress) as compress:
+            first = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(compress.call_count, 1)
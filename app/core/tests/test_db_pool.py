@@ -0,0 +1,92 @@
+"""
+Tests for the database connection metrics and health checks.
+"""
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+
+from core import db_pool
+from core.backends.postgresql.base import DatabaseWrapper
+
+
+def create_wrapper(**settings):
+    """Return a connection of the app's postgresql backend, without a server behind it."""
+    settings_dict = {**connection.settings_dict, 'NAME': 'pool_test', 'CONN_MAX_AGE': None, **settings}
+    return DatabaseWrapper(settings_dict, alias='pool_test')
+
+
+@patch('django.db.backends.base.base.connection_created')  # its receivers (ie django.contrib.postgres) would query the mock connection
+@patch('django.db.backends.postgresql.base.DatabaseWrapper.get_new_connection', side_effect=lambda params: MagicMock())
+class PostgresqlBackendTests(SimpleTestCase):
+    """Test the postgresql backend's connection metrics and health checks."""
+
+    def setUp(self):
+        self.stats = db_pool.ConnectionStats()
+        patcher = patch('core.backends.postgresql.base.connection_stats', self.stats)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_counts_connections(self, patched_connect, patched_signal):
+        """Test opening and closing connections is counted."""
+        wrapper = create_wrapper()
+        wrapper.ensure_connection()
+        wrapper.ensure_connection()  # reused
+        stats = self.stats.snapshot()['pool_test']
+        self.assertEqual((stats['open'], stats['opened'], stats['closed']), (1, 1, 0))
+
+        wrapper.close()
+        stats = self.stats.snapshot()['pool_test']
+        self.assertEqual((stats['open'], stats['opened'], stats['closed']), (0, 1, 1))
+        self.assertEqual(patched_connect.call_count, 1)
+
+    def test_health_check_replaces_broken_connection(self, patched_connect, patched_signal):
+        """Test a reused connection that fails its health check is replaced on first use."""
+        wrapper = create_wrapper(CONN_HEALTH_CHECKS=True)
+        wrapper.ensure_connection()
+        wrapper.close_if_unusable_or_obsolete()  # the end of a request
+
+        with patch.object(wrapper, 'is_usable', return_value=False) as patched_usable:
+            wrapper.ensure_connection()
+            wrapper.ensure_connection()  # checked once per request only
+
+        self.assertEqual(patched_usable.call_count, 1)
+        self.assertEqual(patched_connect.call_count, 2)
+        stats = self.stats.snapshot()['pool_test']
+        self.assertEqual((stats['open'], stats['health_check_failures']), (1, 1))
+
+    def test_no_health_check_when_disabled(self, patched_connect, patched_signal):
+        """Test reused connections aren't checked without CONN_HEALTH_CHECKS."""
+        wrapper = create_wrapper(CONN_HEALTH_CHECKS=False)
+        wrapper.ensure_connection()
+        wrapper.close_if_unusable_or_obsolete()
+
+        with patch.object(wrapper, 'is_usable') as patched_usable:
+            wrapper.ensure_connection()
+
+        patched_usable.assert_not_called()
+        self.assertEqual(patched_connect.call_count, 1)
+
+
+class PoolMetricsTests(SimpleTestCase):
+    """Test the db_pool metrics."""
+
+    @override_settings(DB_POOL='')
+    def test_direct(self):
+        """Test only the process' counters are reported without a pool."""
+        data = db_pool.pool_metrics()
+
+        self.assertEqual(data['mode'], 'direct')
+        self.assertNotIn('pgbouncer', data)
+
+    @override_settings(DB_POOL='pgbouncer')
+    @patch('core.db_pool.pgbouncer_pools')
+    def test_pgbouncer(self, patched_pools):
+        """Test pgbouncer's pools are included, or the error reading them."""
+        patched_pools.return_value = [{'user': 'app', 'cl_active': 2, 'cl_waiting': 0}]
+        self.assertEqual(db_pool.pool_metrics()['pgbouncer'], patched_pools.return_value)
+
+        patched_pools.side_effect = psycopg2.OperationalError('connection refused\n')
+        self.assertEqual(db_pool.pool_metrics()['pgbouncer'], {'error': 'connection refused'})
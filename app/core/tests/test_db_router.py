@@ -0,0 +1,70 @@
+"""
+Tests for the read replica database router.
+"""
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from core import db_router
+from core.models import Recipe
+
+
+@override_settings(DB_REPLICAS=['replica1', 'replica2'], DB_REPLICA_MAX_LAG=5, DB_REPLICA_PIN_SECONDS=10)
+class ReplicaRouterTests(SimpleTestCase):
+    """Test routing queries between the primary and the replicas."""
+
+    def setUp(self):
+        cache.clear()
+        db_router.replica_status.reset()
+        self.router = db_router.ReplicaRouter()
+
+    def test_reads_follow_the_request(self):
+        """Test reads go to the alias the request chose, writes always to the primary."""
+        self.assertIsNone(self.router.db_for_read(Recipe))
+
+        token = db_router.read_alias.set('replica1')
+        try:
+            self.assertEqual(self.router.db_for_read(Recipe), 'replica1')
+            self.assertEqual(self.router.db_for_write(Recipe), 'default')
+        finally:
+            db_router.read_alias.reset(token)
+
+    def test_relations_and_migrations(self):
+        """Test objects read from a replica can be related to the primary's, and replicas aren't migrated."""
+        replica_recipe, primary_recipe, other_recipe = Recipe(), Recipe(), Recipe()
+        replica_recipe._state.db, primary_recipe._state.db, other_recipe._state.db = 'replica1', 'default', 'other'
+
+        self.assertTrue(self.router.allow_relation(replica_recipe, primary_recipe))
+        self.assertIsNone(self.router.allow_relation(replica_recipe, other_recipe))
+        self.assertFalse(self.router.allow_migrate('replica2', 'core'))
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+    @patch('core.db_router.measure_lag', side_effect=lambda alias: {'replica1': 60.0, 'replica2': 1.5}[alias])
+    def test_choose_skips_lagging_replicas(self, patched_measure_lag):
+        """Test a replica within DB_REPLICA_MAX_LAG is chosen over one lagging further behind."""
+        for _ in range(5):
+            self.assertEqual(db_router.choose_read_alias(1), 'replica2')
+
+        self.assertEqual(patched_measure_lag.call_count, 2)  # each replica measured once
+        self.assertEqual(db_router.replica_status.snapshot()['replicas']['replica1'], {'lag_seconds': 60.0})
+
+    @patch('core.db_router.transaction.on_commit')  # no transaction here, and the test has no database to ask whether there is one
+    @patch('core.db_router.measure_lag', return_value=0.0)
+    def test_pin_to_primary(self, patched_measure_lag, patched_on_commit):
+        """Test a pinned user reads from the primary until the pin expires."""
+        db_router.pin_to_primary(1)
+        patched_on_commit.assert_called_once()
+
+        self.assertIsNone(db_router.choose_read_alias(1))
+        self.assertIn(db_router.choose_read_alias(2), ('replica1', 'replica2'))
+        cache.delete('db:primary:1')  # expired
+        self.assertIn(db_router.choose_read_alias(1), ('replica1', 'replica2'))
+
+    @override_settings(DB_REPLICAS=[])
+    def test_no_replicas(self):
+        """Test everything reads from the primary without replicas, and nothing is pinned."""
+        db_router.pin_to_primary(1)
+
+        self.assertIsNone(db_router.choose_read_alias(1))
+        self.assertIsNone(cache.get('db:primary:1'))
@@ -0,0 +1,93 @@
+"""
+Tests for the pooled password hasher.
+"""
+import threading
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.test import SimpleTestCase
+
+from core.hashers import HashingPool, PasswordHashingBusy, hashing_pool
+
+
+class HashingPoolTests(SimpleTestCase):
+    """Test the bounded hashing pool."""
+
+    def test_runs_on_pool_thread(self):
+        """Test jobs run on a pool thread and return their result."""
+        pool = HashingPool(workers=1, queue_size=0, queue_timeout=1)
+
+        name = pool.run(lambda: threading.current_thread().name)
+
+        self.assertTrue(name.startswith('password-hash'))
+        self.assertEqual(pool.metrics()['completed'], 1)
+
+    def test_rejects_when_full(self):
+        """Test a job is rejected once the workers and queue are all taken."""
+        pool = HashingPool(workers=1, queue_size=0, queue_timeout=0.01)
+        started, release = threading.Event(), threading.Event()
+
+        def blocking_job():
+            started.set()
+            release.wait(5)
+
+        thread = threading.Thread(target=pool.run, args=(blocking_job,))
+        thread.start()
+        started.wait(5)
+        try:
+            with self.assertRaises(PasswordHashingBusy):
+                pool.run(lambda: None)
+            self.assertEqual(pool.metrics()['in_flight'], 1)
+            self.assertEqual(pool.metrics()['rejected'], 1)
+        finally:
+            release.set()
+            thread.join()
+
+    def test_configured_pool_sheds_load(self):
+        """Test the pool as configured turns logins away while every request thread of a process is hashing."""
+        if settings.UWSGI_THREADS < 2:
+            self.skipTest('a single threaded process only ever hashes one password at a time')
+        pool = HashingPool(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_SIZE, queue_timeout=0.05)
+        slots = settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_SIZE
+        release = threading.Event()
+        results = []
+
+        def request():  # one of the process's request threads, logging in
+            try:
+                pool.run(release.wait, 5)
+                results.append('hashed')
+            except PasswordHashingBusy:
+                results.append('busy')
+
+        threads = [threading.Thread(target=request) for _ in range(settings.UWSGI_THREADS)]
+        for thread in threads:
+            thread.start()
+        try:
+            for _ in range(100):  # the threads left without a slot give up after the queue timeout
+                if len(results) >= settings.UWSGI_THREADS - slots:
+                    break
+                release.wait(0.05)
+        finally:
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertLess(slots, settings.UWSGI_THREADS)
+        self.assertEqual(results.count('busy'), settings.UWSGI_THREADS - slots)
+        self.assertEqual(results.count('hashed'), slots)
+        self.assertEqual(pool.metrics()['rejected'], settings.UWSGI_THREADS - slots)
+
+
+class PooledHasherTests(SimpleTestCase):
+    """Test the hasher used for user passwords."""
+
+    def test_hash_and_verify_on_pool(self):
+        """Test passwords are hashed and verified through the pool."""
+        completed = hashing_pool.metrics()['completed']
+
+        encoded = make_password('password123')
+
+        self.assertTrue(encoded.startswith('pbkdf2_sha256$'))
+        self.assertTrue(check_password('password123', encoded))
+        self.assertFalse(check_password('wrong', encoded))
+        self.assertEqual(hashing_pool.metrics()['completed'], completed + 3)
@@ -0,0 +1,92 @@
+"""
+Tests for the request metrics middleware and endpoint.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Recipe
+
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class RequestMetricsTests(TestCase):
+    """Test the request metrics."""
+
+    def setUp(self):
+        metrics.reset()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.client.force_authenticate(self.user)
+        Recipe.objects.create(user=self.user, title='Sample', time_minutes=5, price=Decimal('1.00'))
+
+    def test_server_timing_header(self):
+        """Test responses include a Server-Timing header."""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertIn('total;dur=', res['Server-Timing'])
+        self.assertIn('queries"', res['Server-Timing'])
+        self.assertIn('serialize;dur=', res['Server-Timing'])
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_unsampled_request(self):
+        """Test requests outside the sample rate aren't measured."""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
+        self.assertEqual(metrics.snapshot()['views'], {})
+
+    def test_request_log_line(self):
+        """Test a structured log line is written per request."""
+        with self.assertLogs('app.requests', level='INFO') as logs:
+            self.client.get(RECIPES_URL)
+
+        self.assertIn('"view": "GET recipe:recipe-list"', logs.output[0])
+        self.assertIn('"db_queries":', logs.output[0])
+
+    @override_settings(SLOW_QUERY_MS=0.000001)
+    def test_slow_query_log(self):
+        """Test queries over the threshold are logged."""
+        with self.assertLogs('app.db.slow', level='WARNING') as logs:
+            self.client.get(RECIPES_URL)
+
+        self.assertIn('core_recipe', '\n'.join(logs.output))
+
+    def test_metrics_per_view(self):
+        """Test the metrics endpoint reports per view histograms."""
+        for _ in range(3):
+            self.client.get(RECIPES_URL)
+
+        res = self.client.get(METRICS_URL)  # test client requests come from 127.0.0.1
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        view = res.data['views']['GET recipe:recipe-list']
+        self.assertEqual(view['window'], 3)
+        self.assertEqual(sum(view['latency_ms']['buckets'].values()), 3)
+        self.assertGreater(view['db_queries_avg'], 0)
+        self.assertGreater(view['serialize_ms_avg'], 0)
+        self.assertGreater(view['response_bytes_avg'], 0)
+        self.assertIn('password_hashing', res.data)
+
+    def test_metrics_not_public(self):
+        """Test non staff users from other IPs can't read the metrics."""
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='10.0.0.5')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics_staff_allowed(self):
+        """Test staff users can read the metrics from anywhere."""
+        self.user.is_staff = True
+        self.user.save()
+
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='10.0.0.5')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -0,0 +1,54 @@
+"""
+Tests for the data migrations.
+"""
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+
+class MergeDuplicateAttrNamesTests(TransactionTestCase):
+    """Test duplicate tag/ingredient names are merged before the unique constraints are added."""
+
+    migrate_from = [('core', '0006_recipe_image')]
+    migrate_to = [('core', '0007_indexes_unique_attr_names')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        self.apps = executor.loader.project_state(self.migrate_from).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())  # back to the latest schema for the other tests
+
+    def test_duplicates_merged_keeping_recipe_links(self):
+        """Test each user keeps one tag per name, linked to every recipe any of the duplicates were."""
+        User = self.apps.get_model('core', 'User')
+        Recipe = self.apps.get_model('core', 'Recipe')
+        Tag = self.apps.get_model('core', 'Tag')
+        Ingredient = self.apps.get_model('core', 'Ingredient')
+        user = User.objects.create(email='user@example.com', password='x')
+        other_user = User.objects.create(email='other@example.com', password='x')
+        recipes = [Recipe.objects.create(user=user, title=f'Recipe {i}', time_minutes=1, price='1.00') for i in range(3)]
+        spicy = [Tag.objects.create(user=user, name='Spicy') for _ in range(3)]
+        for recipe, tag in zip(recipes, spicy):
+            recipe.tags.add(tag)
+        recipes[0].tags.add(spicy[1])  # already linked to the kept one too
+        Tag.objects.create(user=other_user, name='Spicy')  # another user's, not a duplicate
+        rice = [Ingredient.objects.create(user=user, name='Rice') for _ in range(2)]
+        recipes[2].ingredients.add(rice[1])
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()  # picks up the migrations applied above
+        executor.migrate(self.migrate_to)
+        apps = executor.loader.project_state(self.migrate_to).apps
+
+        Tag = apps.get_model('core', 'Tag')
+        Recipe = apps.get_model('core', 'Recipe')
+        self.assertEqual(list(Tag.objects.filter(user_id=user.id).values_list('id', flat=True)), [spicy[0].id])
+        self.assertEqual(Tag.objects.filter(user_id=other_user.id).count(), 1)
+        for recipe_id in [recipe.id for recipe in recipes]:
+            self.assertEqual(list(Recipe.objects.get(id=recipe_id).tags.values_list('id', flat=True)), [spicy[0].id])
+        Ingredient = apps.get_model('core', 'Ingredient')
+        self.assertEqual(list(Ingredient.objects.values_list('id', flat=True)), [rice[0].id])
+        self.assertEqual(list(Recipe.objects.get(id=recipes[2].id).ingredients.values_list('id', flat=True)), [rice[0].id])
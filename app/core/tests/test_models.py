@@ -4,6 +4,7 @@ Tests for models. Unlike api tests, no requests needed here, just internal.
 from unittest.mock import patch  # tool used to mock functions for purposes of testing
 from decimal import Decimal
 
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from django.contrib.auth import get_user_model  # is a helper fn to get the default user model for this project, so if you customize the user model will update here
 
@@ -99,6 +100,17 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(ingredient), ingredient.name)
 
+    def test_tag_and_ingredient_names_unique_per_user(self):
+        """Test a user can't have two tags/ingredients with the same name."""
+        user = create_user()
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='password123')
+        for model in (models.Tag, models.Ingredient):
+            model.objects.create(user=user, name='Salt')
+            model.objects.create(user=other_user, name='Salt')  # same name for a different user is fine
+
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                model.objects.create(user=user, name='Salt')
+
     # create a test to return a unique url path for a user uploaded media file
     # we're using the patch decorator to modify the uuid functionality to mock its behavior of creating a uuid
     @patch('core.models.uuid.uuid4')
@@ -0,0 +1,60 @@
+"""
+Tests for the API renderers.
+"""
+import datetime
+import uuid
+from decimal import Decimal
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from core import renderers
+from core.renderers import FastJSONRenderer
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Test FastJSONRenderer output matches JSONRenderer."""
+
+    def assertSameOutput(self, data, accepted_media_type=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type),
+        )
+
+    @skipIf(renderers.orjson is None, 'orjson is not installed')
+    def test_uses_orjson(self):
+        """Test compact output is encoded without the stdlib fallback."""
+        with patch.object(JSONRenderer, 'render', side_effect=AssertionError('fell back')):
+            self.assertEqual(FastJSONRenderer().render({'a': Decimal('1.5')}), b'{"a":1.5}')
+
+    def test_same_output(self):
+        """Test a mix of types renders to the same bytes."""
+        self.assertSameOutput({
+            'id': 1,
+            'price': Decimal('5.50'),
+            'ratio': 0.1,
+            'title': 'Crème brûlée     "quoted"',
+            'created': datetime.datetime(2024, 4, 19, 23, 42, 1, 123456, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2024, 4, 19),
+            'at': datetime.time(23, 42, 1, 500),
+            'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'lazy': gettext_lazy('This field is required.'),
+            'error': ErrorDetail('Invalid', code='invalid'),
+            'nested': ReturnDict([('b', [1, None, True]), ('a', {})], serializer=None),
+            1: 'int key',
+        })
+
+    def test_fallback(self):
+        """Test data orjson can't encode falls back to the stdlib encoder."""
+        self.assertSameOutput({'big': 2 ** 70})
+
+    def test_indent_and_empty(self):
+        """Test pretty printed and empty output match."""
+        self.assertSameOutput({'a': [1, 2]}, 'application/json; indent=4')
+        self.assertSameOutput(None)
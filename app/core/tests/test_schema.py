@@ -0,0 +1,94 @@
+"""
+Tests for the precomputed OpenAPI schema.
+"""
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import schema
+
+
+SCHEMA_URL = reverse('api-schema')
+DOCS_URL = reverse('api-docs')
+
+
+class SchemaTests(TestCase):
+    """Test generating and serving the schema."""
+
+    def setUp(self):
+        self.schema_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(SCHEMA_ROOT=self.schema_root, APP_VERSION='abc123')
+        self.settings_override.enable()
+        self.client = APIClient()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.schema_root)
+
+    def test_command_writes_once_per_version(self):
+        """Test generate_schema writes the documents and skips an up to date version."""
+        out = StringIO()
+        call_command('generate_schema', stdout=out)
+        self.assertIn('Wrote schema for version abc123', out.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(self.schema_root, 'openapi.yaml')))
+
+        with patch('core.schema.generate') as generate:
+            call_command('generate_schema', stdout=out)
+            generate.assert_not_called()
+        self.assertIn('is up to date', out.getvalue())
+
+        with override_settings(APP_VERSION='def456'):
+            call_command('generate_schema', stdout=out)
+        with open(os.path.join(self.schema_root, 'manifest.json')) as manifest:
+            self.assertEqual(json.load(manifest)['version'], 'def456')
+
+    def test_served_from_disk_with_etag(self):
+        """Test the schema is served from the generated file with a strong ETag."""
+        call_command('generate_schema', stdout=StringIO())
+
+        with patch('core.schema.generate') as generate:
+            res = self.client.get(SCHEMA_URL)
+            generate.assert_not_called()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('application/vnd.oai.openapi'))
+        self.assertIn(b'/api/recipe/recipes/', res.content)
+        self.assertTrue(res['ETag'].startswith('"'))
+        self.assertIn('no-cache', res['Cache-Control'])
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_json_and_versioned_url(self):
+        """Test JSON is served on request and the versioned url is cached long term."""
+        res = self.client.get(SCHEMA_URL, {'format': 'json', 'v': 'abc123'})
+
+        self.assertEqual(json.loads(res.content)['openapi'], '3.0.3')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('max-age=31536000', res['Cache-Control'])
+        self.assertTrue(os.path.exists(os.path.join(self.schema_root, 'openapi.json')))  # generated on first use when missing
+
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT='application/json')
+        self.assertEqual(json.loads(res.content)['openapi'], '3.0.3')
+
+    def test_docs_use_versioned_url(self):
+        """Test the swagger page loads the schema from its versioned url."""
+        res = self.client.get(DOCS_URL)
+
+        self.assertContains(res, f'{SCHEMA_URL}?v=abc123')
+
+    def test_code_version_fingerprint(self):
+        """Test the version falls back to a stable hash of the source."""
+        with override_settings(APP_VERSION=''):
+            self.assertEqual(schema.code_version(), schema.code_version())
+            self.assertEqual(len(schema.code_version()), 16)
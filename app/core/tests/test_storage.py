@@ -0,0 +1,32 @@
+"""
+Tests for the file storages.
+"""
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from core.storage import ManifestStaticStorage
+
+
+class ManifestStaticStorageTests(SimpleTestCase):
+    """Test the static files storage."""
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location)
+        self.storage = ManifestStaticStorage(location=self.location, base_url='/static/static/')
+
+    def test_collected_files_hashed(self):
+        """Test collected files get urls with their content hash."""
+        self.storage.save('css/app.css', ContentFile(b'body { color: red; }'))
+        list(self.storage.post_process({'css/app.css': (self.storage, 'css/app.css')}))  # what collectstatic runs
+
+        url = ManifestStaticStorage(location=self.location, base_url='/static/static/').url('css/app.css')  # reads the manifest
+
+        self.assertRegex(url, r'^/static/static/css/app\.[0-9a-f]{12}\.css$')
+
+    def test_uncollected_files_plain(self):
+        """Test files missing from the manifest keep their plain url."""
+        self.assertEqual(self.storage.url('admin/css/base.css'), '/static/static/admin/css/base.css')
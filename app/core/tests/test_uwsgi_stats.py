@@ -0,0 +1,74 @@
+"""
+Tests for the uWSGI stats server metrics.
+"""
+import json
+import socket
+import threading
+
+from django.test import SimpleTestCase, override_settings
+
+from core import metrics
+from core.uwsgi_stats import uwsgi_metrics
+
+
+STATS = {
+    'version': '2.0.21',
+    'listen_queue': 3,
+    'listen_queue_errors': 1,
+    'load': 5,
+    'workers': [
+        {'id': 1, 'pid': 101, 'status': 'busy', 'requests': 40, 'exceptions': 0, 'harakiri_count': 0, 'avg_rt': 12500, 'rss': 0,
+         'cores': [{'id': 0, 'in_request': 1}, {'id': 1, 'in_request': 1}]},
+        {'id': 2, 'pid': 102, 'status': 'idle', 'requests': 35, 'exceptions': 2, 'harakiri_count': 1, 'avg_rt': 8000, 'rss': 0,
+         'cores': [{'id': 0, 'in_request': 0}, {'id': 1, 'in_request': 0}]},
+        {'id': 3, 'pid': 0, 'status': 'cheap', 'requests': 0, 'avg_rt': 0, 'rss': 0, 'cores': []},
+    ],
+}
+
+
+class UwsgiStatsTests(SimpleTestCase):
+    """Test reading the uWSGI stats server."""
+
+    def serve_stats(self):
+        """Start a stats server stand in answering one connection and return its address."""
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        self.addCleanup(server.close)
+
+        def answer():
+            connection, _ = server.accept()
+            with connection:
+                connection.sendall(json.dumps(STATS).encode())
+
+        threading.Thread(target=answer, daemon=True).start()
+        return '127.0.0.1:%d' % server.getsockname()[1]
+
+    def test_summary(self):
+        """Test the queue backlog and worker states are reported."""
+        with override_settings(SERVER_MODE='wsgi', UWSGI_STATS=self.serve_stats()):
+            data = uwsgi_metrics()
+
+        self.assertEqual(data['listen_queue'], 3)
+        self.assertEqual(data['listen_queue_errors'], 1)
+        self.assertEqual((data['workers_busy'], data['workers_idle'], data['workers_cheap']), (1, 1, 1))
+        self.assertEqual(data['workers'][0]['busy_threads'], 2)
+        self.assertEqual(data['workers'][0]['avg_rt_ms'], 12.5)
+        self.assertEqual(data['workers'][1]['harakiri_count'], 1)
+
+    def test_unreachable(self):
+        """Test an unreachable stats server is reported as an error."""
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        address = '127.0.0.1:%d' % server.getsockname()[1]
+        server.close()  # nothing listens there now
+
+        with override_settings(SERVER_MODE='wsgi', UWSGI_STATS=address):
+            self.assertIn('error', uwsgi_metrics())
+
+    def test_left_out_when_not_configured(self):
+        """Test the metrics snapshot has no uwsgi section without a stats server."""
+        with override_settings(UWSGI_STATS=''):
+            self.assertNotIn('uwsgi', metrics.snapshot())
+        with override_settings(SERVER_MODE='asgi', UWSGI_STATS='127.0.0.1:9191'):
+            self.assertNotIn('uwsgi', metrics.snapshot())
@@ -0,0 +1,69 @@
+"""
+uWSGI stats server metrics.
+"""
+import json
+import socket
+
+from django.conf import settings
+
+from core import metrics
+
+
+def read_stats(address, timeout=1.0):
+    """Return the JSON document the uWSGI stats server at address (host:port or a unix socket path) sends."""
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+        sock = socket.create_connection((host or '127.0.0.1', int(port)), timeout=timeout)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(address)
+    chunks = []
+    with sock:
+        while True:  # the server writes the document and closes the connection
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b''.join(chunks))
+
+
+def summarize(stats):
+    """Return the queue backlog and worker states of a stats document."""
+    workers = [
+        {
+            'id': worker['id'],
+            'pid': worker['pid'],
+            'status': worker['status'],  # idle, busy, cheap (stopped by cheaper mode), pause, sig...
+            'requests': worker['requests'],
+            'exceptions': worker.get('exceptions', 0),
+            'harakiri_count': worker.get('harakiri_count', 0),
+            'avg_rt_ms': round(worker.get('avg_rt', 0) / 1000, 3),  # microseconds in the stats
+            'rss_bytes': worker.get('rss', 0),
+            'busy_threads': sum(1 for core in worker.get('cores', []) if core.get('in_request')),
+        }
+        for worker in stats.get('workers', [])
+    ]
+    statuses = [worker['status'] for worker in workers]
+    return {
+        'listen_queue': stats.get('listen_queue', 0),  # requests accepted by the kernel, waiting for a free worker
+        'listen_queue_errors': stats.get('listen_queue_errors', 0),  # connections dropped with the queue full
+        'load': stats.get('load', 0),
+        'workers_busy': statuses.count('busy'),
+        'workers_idle': statuses.count('idle'),
+        'workers_cheap': statuses.count('cheap'),
+        'workers': workers,
+    }
+
+
+def uwsgi_metrics():
+    """Return the uWSGI server's metrics, which cover all of its workers, not just this one."""
+    if settings.SERVER_MODE != 'wsgi' or not settings.UWSGI_STATS:
+        return None
+    try:
+        return summarize(read_stats(settings.UWSGI_STATS))
+    except (OSError, ValueError) as exc:  # not running under uwsgi (ie runserver), or it went away
+        return {'error': str(exc)}
+
+
+metrics.register_source('uwsgi', uwsgi_metrics)
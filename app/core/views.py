@@ -1,12 +1,91 @@
 """
 Core views for app.
 """
-from rest_framework.decorators import api_view
+import os
+import threading
+
+from drf_spectacular.utils import extend_schema, OpenApiTypes
+
+from django.http import HttpResponse, HttpResponseNotAllowed, HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from django.utils.module_loading import import_string
+from django.views.decorators.http import require_safe
+
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 
+from core import metrics as request_metrics, schema as schema_documents
+from core.authentication import CachedTokenAuthentication
+from core.permissions import IsInternalRequest
+
 
 # this is the basic django view structure as opposed to the class based views normally used
+@extend_schema(responses=OpenApiTypes.OBJECT)
 @api_view(['GET'])
 def health_check(request):
     """Returns successful response."""
-    return Response({'healthy': True})
\ No newline at end of file
+    return Response({'healthy': True})
+
+
+# served instead of health_check under ASGI (app.urls), answered on the event loop; a plain django view, DRF views can't be async
+async def health_check_async(request):
+    """Returns successful response."""
+    if request.method not in ('GET', 'HEAD'):  # django 3.2's require_http_methods doesn't support async views
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    return JsonResponse({'healthy': True})
+
+
+health_check_async.cls = health_check.cls  # so the schema generator documents it like the DRF view it stands in for
+health_check_async.initkwargs = health_check.initkwargs
+
+
+# metrics are kept per process, so each response describes the worker that served it
+@extend_schema(responses=OpenApiTypes.OBJECT)
+@api_view(['GET'])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsInternalRequest])
+def metrics(request):
+    """Returns the request metrics of this worker process."""
+    return Response({'pid': os.getpid(), **request_metrics.snapshot()})
+
+
+# serves the schema generated by the generate_schema command (core.schema) instead of introspecting every view per request;
+# a plain django view, no need for DRF's auth/negotiation to return a fixed file
+@require_safe
+def schema(request):
+    """Returns the OpenAPI schema, as YAML or as JSON for ?format=json or Accept: ...json."""
+    fmt = 'json' if request.GET.get('format') == 'json' or 'json' in request.headers.get('Accept', '') else 'yaml'
+    body, etag = schema_documents.get_document(fmt)
+    client_etags = [tag[2:] if tag.startswith('W/') else tag for tag in parse_etags(request.headers.get('If-None-Match', ''))]
+    if etag in client_etags:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type=schema_documents.FORMATS[fmt][2])
+    response['ETag'] = etag
+    if request.GET.get('v') == schema_documents.code_version():
+        patch_cache_control(response, public=True, max_age=365 * 24 * 60 * 60, immutable=True)  # versioned url, a new deploy gets a new url
+    else:
+        patch_cache_control(response, public=True, no_cache=True)  # may be kept, but revalidated with the ETag
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+# the urlconf imports every view when a worker loads it; views few requests use (the swagger ui) are only imported by the worker
+# that first serves one. the csrf middleware checks the wrapper before the view is loaded, so it's exempt like DRF's views are:
+# only for DRF views or views that don't change anything
+def lazy_view(dotted_path, **initkwargs):
+    """Return a view that imports the view at dotted_path (calling as_view(**initkwargs) on a class) when first requested."""
+    loaded = []
+    lock = threading.Lock()
+
+    def view(request, *args, **kwargs):
+        if not loaded:
+            with lock:
+                if not loaded:
+                    target = import_string(dotted_path)
+                    loaded.append(target.as_view(**initkwargs) if hasattr(target, 'as_view') else target)
+        return loaded[0](request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    return view
@@ -0,0 +1,114 @@
+"""
+Bulk import and export of recipes.
+"""
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from recipe.cache import bump_user_version
+from recipe.search import update_search_index
+from recipe.serializers import RecipeBulkSerializer
+
+
+class InvalidRow():
+    """A line of an NDJSON body that isn't valid JSON."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+# newline delimited json, one recipe per line; rows are parsed lazily as the import reads them so the body is never held in memory at once
+class NDJSONParser(BaseParser):
+    """Parser for NDJSON request bodies."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        return self._rows(stream, encoding)
+
+    def _rows(self, stream, encoding):
+        for line in stream:
+            line = line.strip()
+            if not line:
+                yield None  # keeps row numbers equal to line numbers, skipped by import_recipes
+                continue
+            try:
+                yield json.loads(line.decode(encoding))
+            except (UnicodeDecodeError, ValueError) as exc:
+                yield InvalidRow(f'Invalid JSON: {exc}')
+
+
+# lets clients send Accept: application/x-ndjson to the export; the export body itself is streamed by export_recipes
+class NDJSONRenderer(BaseRenderer):
+    """Renderer for NDJSON responses."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return (JSONEncoder().encode(data) + '\n').encode()
+
+
+def import_recipes(rows, context):
+    """Validate and create recipes chunk by chunk, returning the new recipe ids and the errors by row number."""
+    if isinstance(rows, dict):  # a single object, or an empty body
+        raise ParseError('Expected a JSON array or NDJSON of recipes.')
+    chunk_size, max_rows = settings.RECIPE_IMPORT_CHUNK_SIZE, settings.RECIPE_IMPORT_MAX_ROWS
+    numbered = enumerate(rows, 1)
+    created_ids, errors, truncated = [], [], False
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            break
+        if chunk[-1][0] > max_rows:  # import up to the limit and report the rest, rather than reading an unbounded body
+            chunk = [(row_number, row) for row_number, row in chunk if row_number <= max_rows]
+            numbered, truncated = iter(()), True
+        valid = []
+        for row_number, row in chunk:
+            if row is None:
+                continue
+            if isinstance(row, InvalidRow):
+                errors.append({'row': row_number, 'errors': {'non_field_errors': [row.message]}})
+                continue
+            serializer = RecipeBulkSerializer(data=row, context=context)
+            if serializer.is_valid():
+                valid.append(serializer.validated_data)
+            else:
+                errors.append({'row': row_number, 'errors': serializer.errors})
+        if valid:
+            with transaction.atomic():  # a chunk is created in full or not at all
+                recipes = RecipeBulkSerializer(context=context).bulk_create(valid)
+                update_search_index([recipe.pk for recipe in recipes])  # bulk inserts skip the post_save signals
+            created_ids.extend(recipe.pk for recipe in recipes)
+    if truncated:
+        errors.append({'row': max_rows + 1, 'errors': {'non_field_errors': [
+            f'Too many recipes, the limit is {max_rows} per request. This row and the rest were not imported.'
+        ]}})
+    if created_ids:
+        bump_user_version(context['request'].user.id)
+    return created_ids, errors
+
+
+def export_recipes(queryset, context):
+    """Yield the recipes in queryset as NDJSON lines."""
+    encoder = JSONEncoder()
+    batch_size = settings.RECIPE_IMPORT_CHUNK_SIZE
+    queryset = queryset.with_nested().defer('search_vector', 'image', 'image_variants').order_by('pk')
+    last_id = 0
+    while True:
+        # keyset batches rather than iterator(), which can't prefetch the tags/ingredients; only one batch is in memory at a time
+        batch = list(queryset.filter(pk__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        for recipe in batch:
+            yield encoder.encode(RecipeBulkSerializer(recipe, context=context).data) + '\n'
+        last_id = batch[-1].pk
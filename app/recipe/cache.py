@@ -0,0 +1,63 @@
+"""
+Per-user response cache for the recipe APIs.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.db_router import pin_to_primary
+
+
+# every cached response key includes the user's version number, so bumping the version on a write makes all of that user's cached responses unreachable at once (no need to find and delete them)
+def _version_key(user_id):
+    return f'recipe:version:{user_id}'
+
+
+def get_user_version(user_id):
+    """Return the current cache version for the user's recipe data."""
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = time.time_ns()  # start from a new number if the key was evicted, so old entries can't be served again
+        if not cache.add(_version_key(user_id), version, timeout=None):  # add() won't overwrite a version set by a concurrent request
+            version = cache.get(_version_key(user_id), version)
+    return version
+
+
+def _bump(user_id):
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:  # key doesn't exist (never read or evicted)
+        cache.set(_version_key(user_id), time.time_ns(), timeout=None)
+
+
+def bump_user_version(user_id):
+    """Invalidate every cached recipe response for the user."""
+    _bump(user_id)  # now, so this request's own reads miss the cache
+    transaction.on_commit(lambda: _bump(user_id))  # and after commit, in case a concurrent read cached the pre-commit data
+    pin_to_primary(user_id)  # and their next reads skip the replicas, which may not have the write yet
+
+
+def response_cache_key(request, action, pk=None):
+    """Return the cache key for a recipe response to request."""
+    params = []
+    for name in sorted(request.query_params):
+        value = ','.join(request.query_params.getlist(name))
+        if name in ('tags', 'ingredients'):
+            value = ','.join(sorted(filter(None, value.split(','))))  # '2,1' and '1,2' return the same recipes
+        params.append(f'{name}={value}')
+    version = get_user_version(request.user.id)
+    query = hashlib.md5('&'.join(params).encode()).hexdigest()  # keeps the key short and free of characters memcached rejects
+    return f'recipe:response:{request.user.id}:{version}:{request.get_host()}:{action}:{pk}:{query}'
+
+
+def etag_for_key(key):
+    """Return a strong ETag for the response stored under key."""
+    return '"%s"' % hashlib.md5(key.encode()).hexdigest()  # the key changes whenever the user's data changes
+
+
+def get_timeout():
+    """Return how long cached responses are kept for, in seconds."""
+    return settings.RECIPE_CACHE_TIMEOUT
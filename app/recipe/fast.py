@@ -0,0 +1,89 @@
+"""
+Fast read path for the recipe, tag and ingredient lists.
+"""
+from django.core.exceptions import ImproperlyConfigured
+
+from rest_framework import serializers
+
+
+# fields whose to_representation returns db values unchanged (str/int), so they can be copied straight from the row
+PASSTHROUGH_FIELDS = (serializers.CharField, serializers.IntegerField)
+
+
+# renders .values() rows the same way a ModelSerializer renders model instances, without creating the instances or running each field's
+# get_attribute/to_representation per object; only supports the plain model fields and nested many=True model serializers the list serializers use
+class ValuesSerializer():
+    """Read only serializer for .values() rows, built from a ModelSerializer class."""
+
+    def __init__(self, serializer_class, fields=None):
+        self.model = serializer_class.Meta.model
+        self.fields = []  # (output name, model field, converter or None, ValuesSerializer for nested m2m fields or None), in output order
+        serializer = serializer_class(fields=fields) if fields is not None else serializer_class()
+        for name, field in serializer.fields.items():
+            if isinstance(field, serializers.ListSerializer):
+                self.fields.append((name, field.source, None, ValuesSerializer(type(field.child))))
+            elif not self.supports(field):
+                raise ImproperlyConfigured(f'{serializer_class.__name__}.{name} is not a plain model field, it has no fast read path.')
+            elif isinstance(field, PASSTHROUGH_FIELDS):
+                self.fields.append((name, field.source, None, None))
+            else:
+                self.fields.append((name, field.source, field.to_representation, None))  # ie DecimalField's fixed point string
+
+    @staticmethod
+    def supports(field):
+        """Return whether field renders straight from its model column."""
+        if isinstance(field, serializers.FileField):  # renders a url from the FieldFile, not the stored name
+            return False
+        if type(field).get_attribute is not serializers.Field.get_attribute:  # ie ImageVariantsField reads more than its column
+            return False
+        return '.' not in field.source and field.source != '*'
+
+    @property
+    def sources(self):
+        return [source for _, source, _, child in self.fields if child is None]
+
+    def values(self, queryset):
+        """Return queryset as the .values() rows render_rows takes."""
+        extra = list(queryset.query.annotations)  # ie search_rank, which the pagination orders and builds cursors from
+        return queryset.prefetch_related(None).values(*dict.fromkeys(['id'] + self.sources + extra))  # id for the nested lookups and cursor
+
+    def render_rows(self, rows):
+        """Render a list of .values() rows."""
+        nested = {name: self._nested_map(source, child, rows) for name, source, _, child in self.fields if child is not None}
+        data = []
+        for row in rows:
+            item = {}
+            for name, source, convert, child in self.fields:
+                if child is not None:
+                    item[name] = nested[name].get(row['id'], [])
+                    continue
+                value = row[source]
+                item[name] = value if convert is None or value is None else convert(value)  # like Serializer, None skips to_representation
+            data.append(item)
+        return data
+
+    def _nested_map(self, source, child, rows):
+        """Return {row id: [rendered related objects]} for the m2m field, in 1 query."""
+        m2m = self.model._meta.get_field(source)
+        parent_key = f'{m2m.related_query_name()}__id'  # ie recipe__id, read from the link table in the same join the prefetch uses
+        related = child.model.objects.filter(**{f'{parent_key}__in': [row['id'] for row in rows]}).order_by('id')
+        related_rows = list(related.values(parent_key, *child.sources))
+        rendered = child.render_rows(related_rows)
+        result = {}
+        for related_row, item in zip(related_rows, rendered):
+            result.setdefault(related_row[parent_key], []).append(item)
+        return result
+
+
+_values_serializers = {}
+
+
+def get_values_serializer(serializer_class, fields=None):
+    """Return the ValuesSerializer for serializer_class trimmed to fields, or None if it has fields the fast path can't render."""
+    key = (serializer_class, tuple(sorted(fields)) if fields is not None else None)  # output order follows the serializer, not fields
+    if key not in _values_serializers:
+        try:
+            _values_serializers[key] = ValuesSerializer(serializer_class, fields)
+        except ImproperlyConfigured:
+            _values_serializers[key] = None  # ie ?expand=image, rendered by the serializer instead
+    return _values_serializers[key]
@@ -0,0 +1,149 @@
+"""
+Background processing of recipe images.
+"""
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from PIL import Image, ImageOps, features
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+
+from core.models import Recipe
+from recipe.cache import bump_user_version
+
+
+logger = logging.getLogger(__name__)
+
+# longest side in pixels of each generated variant
+VARIANTS = {
+    'thumbnail': 150,
+    'card': 480,
+    'full': 1200,
+}
+FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+
+def variants_dir(image_name):
+    """Return the storage dir holding the variants of image_name."""
+    return os.path.splitext(image_name)[0]  # uploads/recipe/<uuid>.jpg -> uploads/recipe/<uuid>/
+
+
+def generate_variants(image_path, output_path):
+    """Write resized, EXIF free variants of image_path into output_path and return their details.
+
+    Runs in a worker process, so it only uses the file system (no db or django storage).
+    Existing variants newer than the original are reused, so running it again is safe.
+    """
+    os.makedirs(output_path, exist_ok=True)
+    original_mtime = os.path.getmtime(image_path)
+    formats = {ext: fmt for ext, fmt in FORMATS.items() if ext != 'webp' or features.check('webp')}  # pillow may be built without libwebp
+    result = {}
+    with Image.open(image_path) as original:
+        original = ImageOps.exif_transpose(original)  # apply the EXIF rotation before the EXIF data is dropped
+        original = original.convert('RGB')  # drops alpha/palette and the EXIF/info of the source
+        for variant, size in VARIANTS.items():
+            image = original.copy()
+            image.thumbnail((size, size))  # keeps the aspect ratio and never upscales
+            result[variant] = {'width': image.width, 'height': image.height}
+            for ext, fmt in formats.items():
+                path = os.path.join(output_path, f'{variant}.{ext}')
+                if not os.path.exists(path) or os.path.getmtime(path) < original_mtime:
+                    tmp_path = f'{path}.tmp'
+                    image.save(tmp_path, format=fmt, quality=82, optimize=True)
+                    os.replace(tmp_path, path)  # atomic, readers never see a half written file
+                result[variant][ext] = f'{variant}.{ext}'
+    return result
+
+
+class SyncExecutor():
+    """Executor that runs jobs in the calling thread (for tests)."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+
+_executor = None
+_executor_key = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return this process's image processing executor."""
+    global _executor, _executor_key
+    with _executor_lock:
+        kind = settings.IMAGE_PROCESSING_EXECUTOR
+        if _executor_key != (os.getpid(), kind):  # pools don't survive a fork (ie uwsgi workers), so each process creates its own
+            if kind == 'process':
+                _executor = ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESSING_WORKERS)
+            elif kind == 'thread':
+                _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_PROCESSING_WORKERS, thread_name_prefix='recipe-image')
+            else:
+                _executor = SyncExecutor()
+            _executor_key = (os.getpid(), kind)
+        return _executor
+
+
+def save_variants(recipe_id, image_name, variants):
+    """Store the generated variants on the recipe, unless its image changed meanwhile."""
+    user_id = Recipe.objects.filter(pk=recipe_id).values_list('user_id', flat=True).first()
+    updated = Recipe.objects.filter(pk=recipe_id, image=image_name).update(image_variants=variants)  # update() skips post_save
+    if updated:
+        bump_user_version(user_id)  # so cached recipe responses pick up the variants
+
+
+def _submit(recipe_id, image_name, attempt=1):
+    output_path = default_storage.path(variants_dir(image_name))
+    future = get_executor().submit(generate_variants, default_storage.path(image_name), output_path)
+    future.add_done_callback(lambda f: _on_done(f, recipe_id, image_name, attempt))
+
+
+def _on_done(future, recipe_id, image_name, attempt):
+    try:
+        variants = future.result()
+    except Exception:
+        if attempt < settings.IMAGE_PROCESSING_ATTEMPTS:
+            logger.warning('Retrying image variants for recipe %s (attempt %s)', recipe_id, attempt + 1)
+            _submit(recipe_id, image_name, attempt + 1)
+        else:
+            logger.exception('Could not generate image variants for recipe %s', recipe_id)
+        return
+    try:
+        save_variants(recipe_id, image_name, variants)
+    except Exception:
+        logger.exception('Could not save image variants for recipe %s', recipe_id)
+    finally:
+        if not isinstance(get_executor(), SyncExecutor):
+            connection.close()  # callbacks run on a pool thread, don't leave its db connection open
+
+
+def schedule_image_processing(recipe):
+    """Generate the recipe image's variants in the background once the upload is committed."""
+    image_name = recipe.image.name
+    transaction.on_commit(lambda: _submit(recipe.pk, image_name))
+
+
+def process_image(recipe):
+    """Generate and store the recipe image's variants in the calling thread."""
+    output_path = default_storage.path(variants_dir(recipe.image.name))
+    variants = generate_variants(recipe.image.path, output_path)
+    save_variants(recipe.pk, recipe.image.name, variants)
+    return variants
+
+
+def delete_image_variants(image_name):
+    """Delete the variants generated for image_name."""
+    if image_name:
+        shutil.rmtree(default_storage.path(variants_dir(image_name)), ignore_errors=True)
@@ -0,0 +1,31 @@
+"""
+Django command to generate the variants of existing recipe images.
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe.images import process_image
+
+
+class Command(BaseCommand):
+    """Django command to backfill recipe image variants."""
+    help = 'Generate resized variants for recipe images that do not have them yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Also reprocess images that already have variants.')
+        parser.add_argument('--batch-size', type=int, default=100, help='Recipes loaded from the db at a time.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        recipes = Recipe.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image', 'user_id')
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        processed = failed = 0
+        for recipe in recipes.order_by('id').iterator(chunk_size=options['batch_size']):
+            try:
+                process_image(recipe)  # safe to rerun, existing up to date variants are reused
+                processed += 1
+            except Exception as exc:  # ie missing or corrupt original, keep going with the rest
+                failed += 1
+                self.stderr.write(f'Recipe {recipe.id}: {exc}')
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} images, {failed} failed.'))
@@ -0,0 +1,42 @@
+"""
+Django command to fix drifted recipe counts on tags and ingredients.
+"""
+from django.db.models import F
+from django.core.management.base import BaseCommand
+
+from core.models import Tag, Ingredient
+
+
+class Command(BaseCommand):
+    """Django command to reconcile Tag/Ingredient.recipe_count with the recipe links."""
+    help = 'Recount recipe_count for tags and ingredients whose stored count is wrong.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows checked per query.')
+        parser.add_argument('--dry-run', action='store_true', help='Report drifted rows without fixing them.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        for model in (Tag, Ingredient):
+            checked = drifted = 0
+            last_id = 0
+            while True:
+                # walk the table by primary key so every batch is an index range scan, no matter how large the table
+                batch = list(model.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:options['batch_size']])
+                if not batch:
+                    break
+                last_id = batch[-1]
+                checked += len(batch)
+                wrong = list(
+                    model.objects.filter(pk__in=batch)
+                    .annotate(live_count=model.objects.live_recipe_count())
+                    .exclude(recipe_count=F('live_count'))
+                    .values_list('pk', flat=True)
+                )
+                drifted += len(wrong)
+                if wrong and not options['dry_run']:
+                    model.objects.filter(pk__in=wrong).refresh_recipe_counts()
+            verb = 'found' if options['dry_run'] else 'fixed'
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural.capitalize()}: checked {checked}, {verb} {drifted} drifted counts.'
+            ))
@@ -0,0 +1,36 @@
+"""
+Pagination for the recipe APIs.
+"""
+from django.conf import settings
+
+from rest_framework.pagination import CursorPagination
+
+
+# cursor (keyset) pagination filters on the ordering column instead of using OFFSET, so deep pages cost the same as the first one
+class RecipeCursorPagination(CursorPagination):
+    """Cursor pagination for recipes, newest first."""
+    ordering = '-id'  # must be unique and unchanging for a stable cursor
+    page_size_query_param = 'page_size'  # lets the api user choose the page size ie ?page_size=20
+    max_page_size = 100  # server side cap on page_size so one request can't serialize the whole table
+
+    def get_page_size(self, request):
+        self.page_size = settings.API_PAGE_SIZE  # the default, read per request rather than when the module is imported
+        return super().get_page_size(request)
+
+    def get_ordering(self, request, queryset, view):
+        if 'search_rank' in queryset.query.annotations:
+            return ('-search_rank', '-id')  # best search matches first
+        return super().get_ordering(request, queryset, view)
+
+
+class RecipeAttrCursorPagination(RecipeCursorPagination):
+    """Cursor pagination for recipe attributes (tags and ingredients)."""
+    ordering = ('-name', 'id')  # id breaks ties between attributes with the same name
+    ordering_param = 'ordering'
+    ORDERINGS = ('name', '-name', 'recipe_count', '-recipe_count')  # ie ?ordering=-recipe_count for the most used first
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get(self.ordering_param)
+        if ordering in self.ORDERINGS:
+            return (ordering, 'id')
+        return super().get_ordering(request, queryset, view)
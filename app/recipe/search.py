@@ -0,0 +1,179 @@
+"""
+Full text search over recipes.
+"""
+import re
+import threading
+from collections import defaultdict
+from functools import partial
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+
+from core.models import Recipe
+
+
+# title matches rank highest, then tag/ingredient names, then the description
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2}
+SEARCH_CONFIG = 'english'
+
+
+def _documents(recipe_ids):
+    """Return {recipe id: {weight: text}} for the recipes."""
+    recipes = Recipe.objects.filter(pk__in=recipe_ids).only('id', 'title', 'description').prefetch_related('tags', 'ingredients')
+    return {
+        recipe.id: {
+            'A': recipe.title,
+            'B': ' '.join([t.name for t in recipe.tags.all()] + [i.name for i in recipe.ingredients.all()]),
+            'C': recipe.description,
+        }
+        for recipe in recipes
+    }
+
+
+# the backfill of the migration adding the column (core 0009) for just the given recipes: every vector is computed in the database, in
+# one statement however many recipes there are; a raw update doesn't send post_save, so no loop
+UPDATE_VECTORS_SQL = '''
+    UPDATE core_recipe SET search_vector = d.vector
+    FROM (
+        SELECT r.id,
+            setweight(to_tsvector(%(config)s, coalesce(r.title, '')), 'A') ||
+            setweight(to_tsvector(%(config)s, coalesce((
+                SELECT string_agg(name, ' ') FROM (
+                    SELECT t.name FROM core_tag t
+                    JOIN core_recipe_tags rt ON rt.tag_id = t.id WHERE rt.recipe_id = r.id
+                    UNION ALL
+                    SELECT i.name FROM core_ingredient i
+                    JOIN core_recipe_ingredients ri ON ri.ingredient_id = i.id WHERE ri.recipe_id = r.id
+                ) AS names
+            ), '')), 'B') ||
+            setweight(to_tsvector(%(config)s, coalesce(r.description, '')), 'C') AS vector
+        FROM core_recipe r
+        WHERE r.id = ANY(%(ids)s)
+    ) AS d
+    WHERE core_recipe.id = d.id
+'''
+
+
+# postgres: a precomputed tsvector column (Recipe.search_vector, GIN indexed) ranked with ts_rank
+class PostgresSearchBackend():
+    def update(self, recipe_ids):
+        with connection.cursor() as cursor:
+            cursor.execute(UPDATE_VECTORS_SQL, {'config': SEARCH_CONFIG, 'ids': list(recipe_ids)})
+
+    def remove(self, recipe_ids):
+        pass  # the vector is deleted with the row
+
+    def search(self, queryset, text):
+        query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)  # supports "quoted phrases", or, -exclusions
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=Cast(SearchRank(F('search_vector'), query), FloatField()),  # double precision, so the cursor position round trips exactly
+        )
+
+
+def tokenize(text):
+    """Split text into lowercase search terms."""
+    return [word[:-1] if len(word) > 3 and word.endswith('s') else word for word in re.findall(r'\w+', text.lower())]  # naive plural folding: 'onions' finds 'onion'
+
+
+# everything else (sqlite in tests/dev): an inverted index held in this process, filled from the db on first use
+class InMemorySearchBackend():
+    def __init__(self):
+        self._index = defaultdict(dict)  # term -> {recipe id: score}
+        self._terms = {}  # recipe id -> terms, to unindex a recipe before reindexing it
+        self._built = False
+        self._lock = threading.RLock()
+
+    def _unindex(self, recipe_id):
+        for term in self._terms.pop(recipe_id, ()):
+            self._index[term].pop(recipe_id, None)
+
+    def update(self, recipe_ids):
+        with self._lock:
+            documents = _documents(recipe_ids)
+            for recipe_id in recipe_ids:
+                self._unindex(recipe_id)
+            for recipe_id, document in documents.items():
+                scores = defaultdict(float)
+                for weight, text in document.items():
+                    for term in tokenize(text):
+                        scores[term] += WEIGHTS[weight]
+                for term, score in scores.items():
+                    self._index[term][recipe_id] = score
+                self._terms[recipe_id] = set(scores)
+
+    def remove(self, recipe_ids):
+        with self._lock:
+            for recipe_id in recipe_ids:
+                self._unindex(recipe_id)
+
+    def rebuild(self):
+        with self._lock:
+            self._index.clear()
+            self._terms.clear()
+            self.update(list(Recipe.objects.values_list('id', flat=True)))
+            self._built = True
+
+    def search(self, queryset, text):
+        with self._lock:
+            if not self._built:
+                self.rebuild()
+            scores = None
+            for term in set(tokenize(text)):
+                matches = self._index.get(term, {})
+                if scores is None:
+                    scores = dict(matches)
+                else:  # every term has to match
+                    scores = {recipe_id: score + matches[recipe_id] for recipe_id, score in scores.items() if recipe_id in matches}
+        if not scores:
+            return queryset.none()
+        return queryset.filter(pk__in=scores).annotate(
+            search_rank=Case(
+                *[When(pk=recipe_id, then=Value(score)) for recipe_id, score in scores.items()],
+                output_field=FloatField(),
+            ),
+        )
+
+
+_postgres_backend = PostgresSearchBackend()
+_memory_backend = InMemorySearchBackend()
+
+
+def get_backend():
+    """Return the search backend for the database in use."""
+    return _postgres_backend if connection.vendor == 'postgresql' else _memory_backend
+
+
+def search_recipes(queryset, text):
+    """Filter queryset to recipes matching text, annotated with a search_rank."""
+    return get_backend().search(queryset, text)
+
+
+def _flush_search_index(conn):
+    recipe_ids = conn.search_index_pending[1]
+    conn.search_index_pending = None
+    get_backend().update(sorted(recipe_ids))
+
+
+# a recipe create or update changes the row and both its tag and ingredient links, a tag rename every recipe using it, a bulk import
+# a chunk of recipes: the ids are collected and reindexed once, after the transaction commits (straight away outside of one)
+def update_search_index(recipe_ids):
+    """Reindex the recipes after they or their tags/ingredients changed."""
+    if not recipe_ids:
+        return
+    conn = transaction.get_connection()
+    if not conn.in_atomic_block:
+        get_backend().update(list(recipe_ids))
+        return
+    pending = getattr(conn, 'search_index_pending', None)  # (the flush registered with on_commit, the recipe ids it will reindex)
+    if pending is None or all(func is not pending[0] for _, func in conn.run_on_commit):  # none yet, or rolled back with its savepoint
+        flush = partial(_flush_search_index, conn)
+        pending = conn.search_index_pending = (flush, set())
+        transaction.on_commit(flush)
+    pending[1].update(recipe_ids)
+
+
+def remove_from_search_index(recipe_ids):
+    """Unindex deleted recipes."""
+    get_backend().remove(list(recipe_ids))
@@ -1,30 +1,68 @@
 """
 Serializers for recipe APIs.
 """
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+
 from rest_framework import serializers
 
+from core.metrics import TimedSerializerMixin
 from core.models import Recipe, Tag, Ingredient
-
-
-class IngredientSerializer(serializers.ModelSerializer):
+from recipe.images import variants_dir
+
+
+# renders the stored variant file names as urls, ie {'thumbnail': {'width': 150, 'height': 100, 'webp': 'http://.../thumbnail.webp', 'jpeg': ...}, ...}
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Field for the generated image variants."""
+
+    def get_attribute(self, instance):
+        return (instance.image.name, instance.image_variants)
+
+    def to_representation(self, value):
+        image_name, variants = value
+        if not image_name or not variants:
+            return {}  # no image, or its variants are still being generated
+        request = self.context.get('request')
+        result = {}
+        for variant, details in variants.items():
+            result[variant] = {}
+            for key, detail in details.items():
+                if key in ('width', 'height'):
+                    result[variant][key] = detail
+                    continue
+                url = default_storage.url(f'{variants_dir(image_name)}/{detail}')
+                result[variant][key] = request.build_absolute_uri(url) if request else url
+        return result
+
+
+# lets a view trim a serializer to the fields a client asked for, ie RecipeSerializer(recipe, fields=['id', 'title'])
+class SelectableFieldsMixin():
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for ingredients."""
 
     class Meta:
         model = Ingredient
-        fields = ['id', 'name']
-        read_only_fields = ['id']
+        fields = ['id', 'name', 'recipe_count']
+        read_only_fields = ['id', 'recipe_count']
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for tags."""
 
     class Meta:
         model = Tag
-        fields = ['id', 'name']
-        read_only_fields = ['id']  # api user should not be able to modify tag id, only other fields
+        fields = ['id', 'name', 'recipe_count']
+        read_only_fields = ['id', 'recipe_count']  # api user should not be able to modify tag id, only other fields
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SelectableFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for recipes."""
     tags = TagSerializer(many=True, required=False)  # set up a field to TagSerializer with multiple available, but no tags are required (field can be blank)
     ingredients = IngredientSerializer(many=True, required=False)
@@ -44,27 +82,34 @@ class RecipeSerializer(serializers.ModelSerializer):
 
 
     # using '_' at fn start signifies internal use
+    def _get_or_create_attrs(self, model, attrs):
+        """Return the user's tags/ingredients for attrs, creating missing ones in bulk."""
+        auth_user = self.context['request'].user  # context is a serializer variable passed in from its view
+        names = list(dict.fromkeys(attr['name'] for attr in attrs))  # unique names, keeping payload order
+        if not names:
+            return []
+        existing = {
+            obj.name: obj
+            for obj in model.objects.filter(user=auth_user, name__in=names)  # 1 query for all the names that already exist
+        }
+        missing = [model(user=auth_user, name=name) for name in names if name not in existing]
+        if missing:
+            model.objects.bulk_create(missing, ignore_conflicts=True)  # 1 insert for all the new names; skips names a concurrent request just created (unique user/name constraint)
+            created = model.objects.filter(user=auth_user, name__in=[obj.name for obj in missing])  # ignore_conflicts doesn't return ids, so fetch them
+            existing.update({obj.name: obj for obj in created})
+        return [existing[name] for name in names]
+
     def _get_or_create_tags(self, tags, recipe):
         """Handle getting or creating tags as needed."""
-        auth_user = self.context['request'].user  # context is a serializer variable passed in from its view
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(  # get or create gets or creates an object
-                user=auth_user,  # include the user that is trying to access their Tags
-                **tag,  # input all of the tag kwargs required (may update tag reqs which is why **tag helps)
-            )
-            recipe.tags.add(tag_obj)
+        recipe.tags.set(self._get_or_create_attrs(Tag, tags))  # set() only adds/removes the difference, in bulk
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         """Handle getting or creating ingredients as needed."""
-        auth_user = self.context['request'].user  # context is a serializer variable passed in from its view
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(  # get or create gets or creates an object
-                user=auth_user,  # include the user that is trying to access their ingredients
-                **ingredient,  # input all of the tag kwargs required (may update tag reqs which is why **tag helps)
-            )
-            recipe.ingredients.add(ingredient_obj)
+        recipe.ingredients.set(self._get_or_create_attrs(Ingredient, ingredients))
 
     # override the create() fn for ModelSerializer in order to create recipe serializer as well as its tags serializers separately
+    # atomic, so a recipe is never left without its tags/ingredients, and it's reindexed for search (recipe.search) once on commit
+    @transaction.atomic
     def create(self, validated_data):
         """Create a recipe."""
         tags = validated_data.pop('tags', [])  # remove the 'tags' field from validated_data dict and store it, default to [] if no data
@@ -76,16 +121,15 @@ class RecipeSerializer(serializers.ModelSerializer):
         return recipe
 
     # override update method for serializers, includes the instance variable which is the existing instance to update
+    @transaction.atomic
     def update(self, instance, validated_data):  # instance is a RecipeSerializer object
         """Update recipe."""
         tags = validated_data.pop('tags', None)
-        # if tags contains tags, clear all of them, then get or create tags from http req
+        # if tags contains tags, get or create tags from http req and swap them in for the old ones
         ingredients = validated_data.pop('ingredients', None)
         if tags is not None:  # if tags is an empty list (as when it's created or tags are removed) this will run
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            self._get_or_create_tags(tags, instance)  # replaces the recipe's tags with the ones in the http req
         if ingredients is not None:
-            instance.ingredients.clear()
             self._get_or_create_ingredients(ingredients, instance)
 
         for attr, value in validated_data.items():
@@ -99,16 +143,54 @@ class RecipeSerializer(serializers.ModelSerializer):
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for recipe detail view."""
 
+    image_variants = ImageVariantsField()
+
     class Meta(RecipeSerializer.Meta):  # this inherits from parent's Meta to access all of those configs
-        fields = RecipeSerializer.Meta.fields + ['description', 'image']  # add this new field to existing fields list
+        fields = RecipeSerializer.Meta.fields + ['description', 'image', 'image_variants']  # add this new field to existing fields list
+
+
+# the portable part of a recipe (no image files), used by the bulk import/export endpoints in recipe.bulk
+class RecipeBulkSerializer(RecipeSerializer):
+    """Serializer for importing and exporting recipes in bulk."""
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['description']
+
+    def bulk_create(self, rows):
+        """Create recipes for a list of validated rows with a fixed number of queries, returning them."""
+        user = self.context['request'].user
+        recipes = [
+            Recipe(user=user, **{key: value for key, value in row.items() if key not in ('tags', 'ingredients')})
+            for row in rows
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes)  # 1 insert, ids come back via RETURNING (postgres)
+        else:
+            for recipe in recipes:  # other dbs don't return the new ids from a bulk insert, and they're needed for the links below
+                recipe.save()
+
+        for model, field_name in ((Tag, 'tags'), (Ingredient, 'ingredients')):
+            attrs = self._get_or_create_attrs(model, [attr for row in rows for attr in row.get(field_name, [])])
+            by_name = {attr.name: attr for attr in attrs}
+            through = getattr(Recipe, field_name).through
+            links = [
+                through(recipe_id=recipe.pk, **{f'{model._meta.model_name}_id': by_name[name].pk})
+                for recipe, row in zip(recipes, rows)
+                for name in dict.fromkeys(attr['name'] for attr in row.get(field_name, []))  # a name listed twice is linked once
+            ]
+            through.objects.bulk_create(links)  # bulk inserts skip m2m_changed, so recount here
+            model.objects.filter(pk__in=[attr.pk for attr in attrs]).refresh_recipe_counts()
+        return recipes
 
 
 # need a separate serializer for images since its best practice to create different APIs/serializers for different data types, in this case image is diff from the json/text content of recipe serializer
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to recipes."""
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'image_variants']
         read_only_field = ['id']
         extra_kwargs = {'image': {'required': 'True'}}  # if creating an image, then there needs to be an image field
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""
+Signal handlers for the recipe APIs.
+"""
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import bump_user_version
+from recipe.search import update_search_index, remove_from_search_index
+
+
+# any write to a user's recipes, tags or ingredients invalidates their cached recipe responses
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_on_write(sender, instance, **kwargs):
+    """Invalidate the owner's cached responses when an object is saved or deleted."""
+    bump_user_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_on_m2m_change(sender, instance, action, **kwargs):
+    """Invalidate the owner's cached responses when recipe tags/ingredients change."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_user_version(instance.user_id)  # instance is a Recipe, or a Tag/Ingredient for reverse changes
+
+
+# keep the search index (recipe.search) in step with recipe, tag and ingredient writes
+@receiver(post_save, sender=Recipe)
+def index_saved_recipe(sender, instance, **kwargs):
+    """Reindex a saved recipe."""
+    update_search_index([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_deleted_recipe(sender, instance, **kwargs):
+    """Unindex a deleted recipe."""
+    remove_from_search_index([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def index_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Reindex recipes whose tags/ingredients changed."""
+    if reverse and action == 'pre_clear':  # tag.recipe_set.clear(), remember which recipes lose it
+        instance._search_recipe_ids = list(instance.recipe_set.values_list('id', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        update_search_index([instance.pk])
+    elif action == 'post_clear':
+        update_search_index(getattr(instance, '_search_recipe_ids', []))
+    else:
+        update_search_index(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def index_renamed_attr(sender, instance, created, **kwargs):
+    """Reindex the recipes using a renamed tag/ingredient."""
+    if not created:
+        update_search_index(instance.recipe_set.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_attr_recipes(sender, instance, **kwargs):
+    """Remember the recipes using a tag/ingredient that is about to be deleted."""
+    instance._search_recipe_ids = list(instance.recipe_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def index_deleted_attr(sender, instance, **kwargs):
+    """Reindex the recipes that used a deleted tag/ingredient."""
+    update_search_index(getattr(instance, '_search_recipe_ids', []))
+
+
+# keep Tag/Ingredient.recipe_count (core.models.RecipeAttrQuerySet) in step with the recipe links
+def _refresh_recipe_counts(model, ids):
+    if ids:
+        model.objects.filter(pk__in=ids).refresh_recipe_counts()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def count_m2m_change(sender, instance, action, reverse, model, pk_set, **kwargs):
+    """Recount the tags/ingredients added to or removed from recipes."""
+    if reverse:  # tag.recipe_set.add/remove/clear, only the one tag's count changes
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _refresh_recipe_counts(type(instance), [instance.pk])
+    elif action == 'pre_clear':  # recipe.tags.clear(), remember which tags lose the recipe
+        setattr(instance, f'_count_{model._meta.model_name}_ids', list(
+            model.objects.filter(recipe=instance).values_list('id', flat=True)
+        ))
+    elif action == 'post_clear':
+        _refresh_recipe_counts(model, getattr(instance, f'_count_{model._meta.model_name}_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        _refresh_recipe_counts(model, pk_set)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_recipe_attrs(sender, instance, **kwargs):
+    """Remember the tags/ingredients of a recipe that is about to be deleted."""
+    # the link rows are deleted with the recipe without sending m2m_changed
+    instance._count_attr_ids = {
+        Tag: list(instance.tags.values_list('id', flat=True)),
+        Ingredient: list(instance.ingredients.values_list('id', flat=True)),
+    }
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(sender, instance, **kwargs):
+    """Recount the tags/ingredients of a deleted recipe."""
+    for model, ids in getattr(instance, '_count_attr_ids', {}).items():
+        _refresh_recipe_counts(model, ids)
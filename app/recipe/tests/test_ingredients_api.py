@@ -58,7 +58,7 @@ class PrivateIngredientsAPITests(TestCase):
         ingredients = Ingredient.objects.all().order_by('-name')
         serializer = IngredientSerializer(ingredients, many=True)  # serialize all of the Ingredient instances already in the Ingredient model
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_ingredients_limited_to_user(self):
         """Test list of ingredients is limited to the authenticated user."""
@@ -69,9 +69,9 @@ class PrivateIngredientsAPITests(TestCase):
         res = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)  # only expecting the ingredient linked to the user
-        self.assertEqual(res.data[0]['name'], ingredient.name)  # checking name is auth user created ingredient name
-        self.assertEqual(res.data[0]['id'], ingredient.id)  # checking ingredient id from res = auth user ingredient id
+        self.assertEqual(len(res.data['results']), 1)  # only expecting the ingredient linked to the user
+        self.assertEqual(res.data['results'][0]['name'], ingredient.name)  # checking name is auth user created ingredient name
+        self.assertEqual(res.data['results'][0]['id'], ingredient.id)  # checking ingredient id from res = auth user ingredient id
 
     def test_update_ingredient(self):
         """Test updating an ingredient."""
@@ -107,13 +107,14 @@ class PrivateIngredientsAPITests(TestCase):
             user=self.user,
         )
         recipe.ingredients.add(ing1)
+        ing1.refresh_from_db()  # picks up the recipe_count the add updated
 
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})  # assigned_only is a parameter value
 
         s1 = IngredientSerializer(ing1)
         s2 = IngredientSerializer(ing2)
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])
 
     def test_filtered_ingredients_unique(self):
         """Test filtered ingredients returns a unique list."""
@@ -137,4 +138,4 @@ class PrivateIngredientsAPITests(TestCase):
 
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)  # data is a list so you can get its length. each item in list should be a different ingredient
\ No newline at end of file
+        self.assertEqual(len(res.data['results']), 1)  # data is a list so you can get its length. each item in list should be a different ingredient
\ No newline at end of file
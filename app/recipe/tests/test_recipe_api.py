@@ -3,12 +3,18 @@ Tests for recipe APIs.
 """
 import os, tempfile
 
+from io import StringIO
+from unittest.mock import patch
+
 from PIL import Image
 
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -16,6 +22,7 @@ from rest_framework.test import APIClient
 
 from core.models import Recipe, Tag, Ingredient
 
+from recipe.images import delete_image_variants
 from recipe.serializers import (
     RecipeSerializer,
     RecipeDetailSerializer,
@@ -90,7 +97,7 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)  # serializers can return one item (detail) or a list of items; many is builtin attr to indicate multiple objects
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)  # make sure the data dict returned in the http response is equal to serializer.data (which is not clear how that works)
+        self.assertEqual(res.data['results'], serializer.data)  # make sure the data dict returned in the http response is equal to serializer.data (which is not clear how that works)
 
     def test_recipe_list_limited_to_user(self):
         """Test list of recipes is limited to authenticated user."""
@@ -104,7 +111,7 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_get_recipe_detail(self):
         """Test get recipe detail."""
@@ -382,6 +389,60 @@ class PrivateRecipeAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.ingredients.count(), 0)
 
+    def test_nested_writes_query_count_constant(self):
+        """Test creating/updating a recipe uses the same number of queries regardless of nested item count."""
+        def write_query_count(method, url, size, prefix):
+            payload = {
+                'title': 'Bulk recipe',
+                'time_minutes': 10,
+                'price': Decimal('1.00'),
+                'tags': [{'name': f'{prefix} tag {i}'} for i in range(size)],
+                'ingredients': [{'name': f'{prefix} ingredient {i}'} for i in range(size)],
+            }
+            with CaptureQueriesContext(connection) as ctx:
+                res = getattr(self.client, method)(url, payload, format='json')
+            self.assertIn(res.status_code, [status.HTTP_200_OK, status.HTTP_201_CREATED])
+            return len(ctx.captured_queries), res.data['id']
+
+        small_count, recipe_id = write_query_count('post', RECIPES_URL, 2, 'small')
+        large_count, _ = write_query_count('post', RECIPES_URL, 30, 'large')
+        self.assertEqual(small_count, large_count)
+
+        small_count, _ = write_query_count('put', detail_url(recipe_id), 2, 'other')
+        large_count, _ = write_query_count('put', detail_url(recipe_id), 30, 'more')
+        self.assertEqual(small_count, large_count)
+        recipe = Recipe.objects.get(id=recipe_id)
+        self.assertEqual(recipe.tags.count(), 30)
+        self.assertEqual(recipe.ingredients.count(), 30)
+
+    def test_update_keeps_unchanged_tags(self):
+        """Test updating tags only adds/removes the difference."""
+        tag_keep = Tag.objects.create(user=self.user, name='Keep')
+        tag_drop = Tag.objects.create(user=self.user, name='Drop')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag_keep, tag_drop)
+        through_id = Recipe.tags.through.objects.get(recipe=recipe, tag=tag_keep).id
+
+        payload = {'tags': [{'name': 'Keep'}, {'name': 'New'}]}
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(t.name for t in recipe.tags.all()), ['Keep', 'New'])
+        self.assertTrue(Recipe.tags.through.objects.filter(id=through_id).exists())  # row for kept tag was not deleted and re-inserted
+
+    def test_duplicate_tag_names_in_payload(self):
+        """Test repeated tag names in a payload create a single tag."""
+        payload = {
+            'title': 'Twice tagged',
+            'time_minutes': 5,
+            'price': Decimal('1.00'),
+            'tags': [{'name': 'Quick'}, {'name': 'Quick'}],
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user, name='Quick').count(), 1)
+
     def test_filter_by_tags(self):
         """Test filtering recipes by tags."""
         r1 = create_recipe(user=self.user, title='Thai Vegetable Curry')
@@ -399,9 +460,9 @@ class PrivateRecipeAPITests(TestCase):
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
         # only first 2 recipes should appear, not recipe 3 which has no tags
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
 
     def test_filter_by_ingredients(self):
         """Test filtering recipes by ingredients."""
@@ -420,9 +481,160 @@ class PrivateRecipeAPITests(TestCase):
         s2 = RecipeSerializer(r2)
         s3 = RecipeSerializer(r3)
         # only first 2 recipes should appear, not recipe 3 which has no ingredients
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
+
+    def test_filter_match_all(self):
+        """Test match=all only returns recipes with every tag and ingredient."""
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dinner')
+        ing = Ingredient.objects.create(user=self.user, name='Tofu')
+        r1 = create_recipe(user=self.user, title='Tofu stir fry')
+        r1.tags.add(tag1, tag2)
+        r1.ingredients.add(ing)
+        r2 = create_recipe(user=self.user, title='Vegan salad')
+        r2.tags.add(tag1)
+        r2.ingredients.add(ing)
+        r3 = create_recipe(user=self.user, title='Vegan stew')
+        r3.tags.add(tag1, tag2)
+
+        params = {'tags': f'{tag1.id},{tag2.id},{tag1.id}', 'ingredients': f'{ing.id}', 'match': 'all'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data['results']], [r1.id])
+
+    def test_filter_match_any_no_duplicates(self):
+        """Test match=any returns each recipe once even when several tags match."""
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dinner')
+        r1 = create_recipe(user=self.user, title='Tofu stir fry')
+        r1.tags.add(tag1, tag2)
+        r2 = create_recipe(user=self.user, title='Vegan salad')
+        r2.tags.add(tag1)
+
+        res = self.client.get(RECIPES_URL, {'tags': f'{tag1.id},{tag2.id}', 'match': 'any'})
+
+        self.assertEqual([r['id'] for r in res.data['results']], [r2.id, r1.id])
+
+    def test_filter_invalid_params(self):
+        """Test malformed ids and match values return a 400."""
+        for params in [
+            {'tags': '1,abc'},
+            {'ingredients': '1,,2'},
+            {'ingredients': '-1'},
+            {'tags': str(2 ** 64)},
+            {'tags': '1', 'match': 'some'},
+        ]:
+            res = self.client.get(RECIPES_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_list_query_count_constant(self):
+        """Test listing recipes uses the same number of queries regardless of recipe count."""
+        def list_query_count():
+            with CaptureQueriesContext(connection) as ctx:  # records every query run inside the with block
+                res = self.client.get(RECIPES_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            return len(ctx.captured_queries)
+
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Tofu')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        single_count = list_query_count()
+
+        for i in range(10):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+
+        self.assertEqual(list_query_count(), single_count)  # nested tags/ingredients must be prefetched, not queried per recipe
+
+    def test_recipe_list_paginated_by_cursor(self):
+        """Test recipe list is paginated with a cursor and page_size param."""
+        recipes = [create_recipe(user=self.user, title=f'Recipe {i}') for i in range(3)]
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data['results']], [recipes[2].id, recipes[1].id])  # newest first
+        self.assertIn('cursor=', res.data['next'])  # cursor links, not page numbers/offsets
+
+        res = self.client.get(res.data['next'])  # follow the next link to get the last page
+
+        self.assertEqual([r['id'] for r in res.data['results']], [recipes[0].id])
+        self.assertIsNone(res.data['next'])
+
+    def test_recipe_list_page_size_capped(self):
+        """Test page_size above the server max is capped."""
+        for i in range(3):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+
+        with patch('recipe.pagination.RecipeCursorPagination.max_page_size', 2):
+            res = self.client.get(RECIPES_URL, {'page_size': 1000})
+
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_recipe_list_default_page_size(self):
+        """Test the default page size follows the API_PAGE_SIZE setting."""
+        for i in range(3):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+
+        with override_settings(API_PAGE_SIZE=2):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_list_sparse_fields(self):
+        """Test ?fields= trims the list results and skips unneeded columns and prefetches."""
+        recipe = create_recipe(user=self.user, description='Long description')
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPES_URL, {'fields': 'id,title,time_minutes'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [{'id': recipe.id, 'title': recipe.title, 'time_minutes': recipe.time_minutes}])
+        sql = ' '.join(query['sql'] for query in ctx.captured_queries)
+        self.assertNotIn('core_tag', sql)  # no prefetch of the tags
+        self.assertNotIn('"price"', sql)  # only the requested columns are loaded
+
+    def test_list_expand_fields(self):
+        """Test ?expand= adds detail fields to the list results."""
+        create_recipe(user=self.user, description='Long description')
+
+        res = self.client.get(RECIPES_URL, {'expand': 'description,image'})
+        result = res.data['results'][0]
+        self.assertEqual(result['description'], 'Long description')
+        self.assertIsNone(result['image'])
+        self.assertIn('tags', result)
+
+        res = self.client.get(RECIPES_URL, {'fields': 'title', 'expand': 'description'})
+        self.assertEqual(res.data['results'], [{'title': 'Sample recipe title.', 'description': 'Long description'}])
+
+    def test_retrieve_sparse_fields(self):
+        """Test ?fields= trims the recipe detail."""
+        recipe = create_recipe(user=self.user)
+        recipe.ingredients.add(Ingredient.objects.create(user=self.user, name='Salt'))
+
+        res = self.client.get(detail_url(recipe.id), {'fields': 'ingredients,description'})
+
+        self.assertEqual(set(res.data), {'ingredients', 'description'})
+        self.assertEqual([i['name'] for i in res.data['ingredients']], ['Salt'])
+
+    def test_sparse_fields_invalid(self):
+        """Test unknown fields return a 400."""
+        recipe = create_recipe(user=self.user)
+        for url, params in [
+            (RECIPES_URL, {'fields': 'id,password'}),
+            (RECIPES_URL, {'fields': ''}),
+            (RECIPES_URL, {'expand': 'title'}),  # already included, nothing to expand
+            (detail_url(recipe.id), {'expand': 'description'}),
+        ]:
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, params)
 
 
 class ImageUploadTests(TestCase):
@@ -438,6 +650,8 @@ class ImageUploadTests(TestCase):
         self.recipe = create_recipe(user=self.user)
 
     def tearDown(self):
+        self.recipe.refresh_from_db()
+        delete_image_variants(self.recipe.image.name)
         self.recipe.image.delete()  # delete the image if recipe has an image (don't know why images persist where as recipes or any other instance does not persist in test mode?)
 
     def test_upload_image(self):
@@ -462,4 +676,63 @@ class ImageUploadTests(TestCase):
         payload = {'image': 'not_an_image'}
         res = self.client.post(url, payload, format='multipart')
 
-        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _upload(self, exif=None):
+        """Upload a sample 800x400 JPEG to the recipe."""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            img = Image.new('RGB', (800, 400))
+            img.save(image_file, format='JPEG', exif=exif or Image.Exif())
+            image_file.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):  # run the on_commit processing hook like a real request would
+                return self.client.post(image_upload_url(self.recipe.id), {'image': image_file}, format='multipart')
+
+    @override_settings(IMAGE_PROCESSING_EXECUTOR='sync')
+    def test_upload_image_generates_variants(self):
+        """Test uploading an image generates resized variants without EXIF data."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'  # EXIF 'Make' tag
+        res = self._upload(exif=exif)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants['thumbnail']['width'], 150)
+        self.assertEqual(self.recipe.image_variants['card']['height'], 240)
+        self.assertEqual(self.recipe.image_variants['full']['width'], 800)  # never upscaled
+        with Image.open(os.path.join(os.path.splitext(self.recipe.image.path)[0], 'card.jpeg')) as card:
+            self.assertEqual(card.size, (480, 240))
+            self.assertEqual(len(card.getexif()), 0)
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertTrue(res.data['image_variants']['thumbnail']['webp'].endswith('/thumbnail.webp'))
+        self.assertTrue(res.data['image_variants']['card']['jpeg'].startswith('http://'))
+
+    def test_variants_pending_until_processed(self):
+        """Test the upload responds before the variants exist."""
+        with patch('recipe.images._submit') as patched_submit:
+            res = self._upload()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_variants'], {})
+        patched_submit.assert_called_once()
+
+    @override_settings(IMAGE_PROCESSING_EXECUTOR='sync', IMAGE_PROCESSING_ATTEMPTS=2)
+    def test_processing_retried(self):
+        """Test failed processing is retried."""
+        with patch('recipe.images.generate_variants', side_effect=[OSError, {'thumbnail': {}}]) as patched_generate:
+            self._upload()
+
+        self.assertEqual(patched_generate.call_count, 2)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {'thumbnail': {}})
+
+    def test_backfill_image_variants(self):
+        """Test the backfill command generates variants for existing images."""
+        with patch('recipe.images._submit'):
+            self._upload()
+
+        call_command('backfill_image_variants', stdout=StringIO())
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(set(self.recipe.image_variants), {'thumbnail', 'card', 'full'})
@@ -0,0 +1,114 @@
+"""
+Tests for the recipe, tag and ingredient views served over ASGI.
+"""
+import asyncio
+import io
+import json
+import os
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.asgi import StreamingASGIHandler
+from core.models import Recipe, Tag, Ingredient
+from recipe import views
+from recipe.images import delete_image_variants
+
+
+@override_settings(SERVER_MODE='asgi')
+class AsyncActionsTests(TransactionTestCase):  # the views run on pool threads, with their own connections, so data must be committed
+    """Test the async versions of the list and upload views."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Tofu')
+        for i in range(3):
+            recipe = Recipe.objects.create(user=self.user, title=f'Recipe {i}', time_minutes=i, price='5.50')
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+
+    def test_routes_wrapped(self):
+        """Test only the routes of async_actions get async views, and only under ASGI."""
+        self.assertTrue(asyncio.iscoroutinefunction(views.RecipeViewSet.as_view({'get': 'list', 'post': 'create'})))
+        self.assertTrue(asyncio.iscoroutinefunction(views.RecipeViewSet.as_view({'post': 'upload_image'})))
+        self.assertTrue(asyncio.iscoroutinefunction(views.TagViewSet.as_view({'get': 'list'})))
+        self.assertFalse(asyncio.iscoroutinefunction(views.RecipeViewSet.as_view({'get': 'retrieve'})))
+        with override_settings(SERVER_MODE='wsgi'):
+            self.assertFalse(asyncio.iscoroutinefunction(views.RecipeViewSet.as_view({'get': 'list'})))
+
+    def test_lists_match_sync_views(self):
+        """Test the async list views return the same responses as the sync ones."""
+        for viewset in (views.RecipeViewSet, views.TagViewSet, views.IngredientViewSet):
+            async_view = viewset.as_view({'get': 'list'})
+            with override_settings(SERVER_MODE='wsgi'):
+                sync_view = viewset.as_view({'get': 'list'})
+            responses = []
+            for view in (async_to_sync(async_view), sync_view):
+                cache.clear()
+                request = self.factory.get('/')
+                force_authenticate(request, self.user)
+                res = view(request)
+                res.render()
+                responses.append(res)
+
+            self.assertEqual(responses[0].status_code, status.HTTP_200_OK)
+            self.assertEqual(responses[0].content, responses[1].content, viewset.__name__)
+
+    def test_upload_image(self):
+        """Test uploading an image through the async view."""
+        recipe = Recipe.objects.first()
+        image_file = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+        image_file.name = 'image.jpg'
+        image_file.seek(0)
+        request = self.factory.post('/', {'image': image_file}, format='multipart')
+        force_authenticate(request, self.user)
+
+        res = async_to_sync(views.RecipeViewSet.as_view({'post': 'upload_image'}))(request, pk=recipe.id)
+
+        recipe.refresh_from_db()
+        self.addCleanup(recipe.image.delete)
+        self.addCleanup(delete_image_variants, recipe.image.name)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(os.path.exists(recipe.image.path))
+
+    @override_settings(RECIPE_IMPORT_CHUNK_SIZE=2)
+    def test_export_streams_over_asgi(self):
+        """Test the export, which queries as it streams, sends every recipe through the ASGI application."""
+        token = Token.objects.create(user=self.user)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': reverse('recipe:recipe-export'), 'raw_path': reverse('recipe:recipe-export').encode(), 'query_string': b'',
+            'headers': [(b'host', b'testserver'), (b'authorization', f'Token {token.key}'.encode())],
+            'client': ('127.0.0.1', 12345), 'server': ('testserver', 80),
+        }
+
+        async def request():
+            communicator = ApplicationCommunicator(StreamingASGIHandler(), scope)
+            await communicator.send_input({'type': 'http.request', 'body': b''})
+            start = await communicator.receive_output(10)
+            body = b''
+            while True:
+                message = await communicator.receive_output(10)
+                body += message.get('body', b'')
+                if not message.get('more_body'):
+                    return start, body
+
+        start, body = async_to_sync(request)()
+
+        self.assertEqual(start['status'], status.HTTP_200_OK)
+        titles = [json.loads(line)['title'] for line in body.decode().splitlines()]
+        self.assertEqual(sorted(titles), ['Recipe 0', 'Recipe 1', 'Recipe 2'])
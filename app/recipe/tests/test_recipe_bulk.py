@@ -0,0 +1,169 @@
+"""
+Tests for the recipe bulk import and export APIs.
+"""
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.search import get_backend
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def recipe_payload(title, **params):
+    """Return a recipe import row."""
+    payload = {
+        'title': title,
+        'time_minutes': 10,
+        'price': '2.50',
+        'tags': [{'name': 'Dinner'}],
+        'ingredients': [{'name': 'Salt'}],
+    }
+    payload.update(params)
+    return payload
+
+
+def ndjson(rows):
+    """Return rows as an NDJSON body."""
+    return ''.join(row if isinstance(row, str) else json.dumps(row) + '\n' for row in rows)
+
+
+class PublicRecipeBulkAPITests(TestCase):
+    """Test unauthenticated bulk API requests."""
+
+    def test_auth_required(self):
+        """Test auth is required to import and export."""
+        client = APIClient()
+
+        self.assertEqual(client.post(BULK_URL, [], format='json').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(client.get(EXPORT_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateRecipeBulkAPITests(TestCase):
+    """Test authenticated bulk API requests."""
+
+    def setUp(self):
+        cache.clear()
+        if hasattr(get_backend(), 'rebuild'):
+            get_backend().rebuild()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def post_ndjson(self, rows):
+        return self.client.post(BULK_URL, ndjson(rows), content_type='application/x-ndjson')
+
+    def test_import_json_array(self):
+        """Test importing a JSON array creates the recipes with their tags and ingredients."""
+        existing = Tag.objects.create(user=self.user, name='Dinner')
+        payload = [
+            recipe_payload('Curry', tags=[{'name': 'Dinner'}, {'name': 'Spicy'}, {'name': 'Spicy'}]),
+            recipe_payload('Soup', description='Warm'),
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['errors'], [])
+        curry, soup = Recipe.objects.filter(id__in=res.data['ids']).order_by('id')
+        self.assertEqual(curry.user, self.user)
+        self.assertEqual(curry.price, Decimal('2.50'))
+        self.assertEqual(sorted(t.name for t in curry.tags.all()), ['Dinner', 'Spicy'])
+        self.assertEqual(soup.description, 'Warm')
+        self.assertEqual(Tag.objects.filter(user=self.user, name='Dinner').count(), 1)  # existing tag reused
+        existing.refresh_from_db()
+        self.assertEqual(existing.recipe_count, 2)
+        self.assertEqual(Ingredient.objects.get(user=self.user, name='Salt').recipe_count, 2)
+
+    def test_import_ndjson_reports_row_errors(self):
+        """Test invalid NDJSON rows are reported by line while valid rows are imported."""
+        res = self.post_ndjson([
+            recipe_payload('Curry'),
+            '{"title": \n',
+            '\n',
+            recipe_payload('', time_minutes='soon'),
+            recipe_payload('Soup'),
+        ])
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual([e['row'] for e in res.data['errors']], [2, 4])
+        self.assertIn('non_field_errors', res.data['errors'][0]['errors'])
+        self.assertEqual(set(res.data['errors'][1]['errors']), {'title', 'time_minutes'})
+        self.assertEqual(
+            sorted(Recipe.objects.filter(user=self.user).values_list('title', flat=True)),
+            ['Curry', 'Soup'],
+        )
+
+    def test_import_all_invalid(self):
+        """Test an import with only invalid rows returns a 400."""
+        res = self.client.post(BULK_URL, [{'title': 'No time or price'}], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_import_requires_list(self):
+        """Test posting a single recipe object returns a 400."""
+        res = self.client.post(BULK_URL, recipe_payload('Curry'), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMPORT_CHUNK_SIZE=2, RECIPE_IMPORT_MAX_ROWS=5)
+    def test_import_chunks_and_row_limit(self):
+        """Test rows are imported in chunks up to the row limit."""
+        res = self.post_ndjson([recipe_payload(f'Recipe {i}') for i in range(7)])
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 5)
+        self.assertEqual([e['row'] for e in res.data['errors']], [6])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(Tag.objects.get(user=self.user, name='Dinner').recipe_count, 5)
+
+    def test_import_updates_list_and_search(self):
+        """Test imported recipes show up in cached lists and search."""
+        self.client.get(RECIPES_URL)  # caches the empty list
+
+        with self.captureOnCommitCallbacks(execute=True):  # the search index is updated on commit
+            self.client.post(BULK_URL, [recipe_payload('Garlic bread')], format='json')
+
+        self.assertEqual(len(self.client.get(RECIPES_URL).data['results']), 1)
+        res = self.client.get(RECIPES_URL, {'search': 'garlic'})
+        self.assertEqual([r['title'] for r in res.data['results']], ['Garlic bread'])
+
+    @override_settings(RECIPE_IMPORT_CHUNK_SIZE=2)
+    def test_export_round_trip(self):
+        """Test exported recipes stream as NDJSON that imports back the same."""
+        self.client.post(BULK_URL, [
+            recipe_payload(f'Recipe {i}', description=f'Description {i}') for i in range(3)
+        ], format='json')
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='password123')
+        Recipe.objects.create(user=other_user, title='Other', time_minutes=1, price=Decimal('1.00'))
+
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(res.streaming_content).decode().splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['Recipe 0', 'Recipe 1', 'Recipe 2'])
+        self.assertEqual(rows[0]['tags'][0]['name'], 'Dinner')
+
+        self.client.force_authenticate(other_user)
+        res = self.client.post(BULK_URL, rows, format='json')
+        self.assertEqual(res.data['created'], 3)
+        imported = Recipe.objects.filter(user=other_user, title='Recipe 1').get()
+        self.assertEqual(imported.description, 'Description 1')
+        self.assertEqual([t.name for t in imported.tags.all()], ['Dinner'])
+        self.assertEqual(imported.tags.get().user, other_user)
@@ -0,0 +1,141 @@
+"""
+Tests for the recipe response cache.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title.',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeCacheTests(TestCase):
+    """Test caching of recipe responses."""
+
+    def setUp(self):
+        cache.clear()  # the local memory cache is not rolled back between tests like the db
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def test_list_served_from_cache(self):
+        """Test a repeated list request doesn't hit the database."""
+        create_recipe(user=self.user)
+        res1 = self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(0):
+            res2 = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res1.data, res2.data)
+        self.assertEqual(res1['ETag'], res2['ETag'])
+
+    def test_detail_served_from_cache(self):
+        """Test a repeated detail request doesn't hit the database."""
+        recipe = create_recipe(user=self.user)
+        self.client.get(detail_url(recipe.id))
+
+        with self.assertNumQueries(0):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.data['id'], recipe.id)
+
+    def test_recipe_write_invalidates_cache(self):
+        """Test updating a recipe invalidates the cached list."""
+        recipe = create_recipe(user=self.user, title='Old title')
+        res1 = self.client.get(RECIPES_URL)
+
+        self.client.patch(detail_url(recipe.id), {'title': 'New title'})
+        res2 = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res2.data['results'][0]['title'], 'New title')
+        self.assertNotEqual(res1['ETag'], res2['ETag'])
+
+    def test_tag_write_invalidates_cache(self):
+        """Test renaming a tag invalidates the cached recipes that show it."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+        self.client.get(detail_url(recipe.id))
+
+        tag.name = 'Vegetarian'
+        tag.save()
+        res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegetarian')
+
+    def test_other_users_write_keeps_cache(self):
+        """Test another user's write doesn't invalidate the user's cache."""
+        create_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='password123')
+        create_recipe(user=other_user)
+
+        with self.assertNumQueries(0):
+            self.client.get(RECIPES_URL)
+
+    def test_filter_params_normalized(self):
+        """Test the same tag IDs in a different order share a cache entry."""
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Dinner')
+        self.client.get(RECIPES_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        with self.assertNumQueries(0):
+            self.client.get(RECIPES_URL, {'tags': f'{tag2.id},{tag1.id}'})
+
+    def test_if_none_match_returns_not_modified(self):
+        """Test sending back the ETag returns a 304 without a body."""
+        create_recipe(user=self.user)
+        res1 = self.client.get(RECIPES_URL)
+
+        res2 = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=res1['ETag'])
+
+        self.assertEqual(res2.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res2.content, b'')
+        self.assertEqual(res2['ETag'], res1['ETag'])
+
+    def test_stale_etag_returns_data(self):
+        """Test an ETag from before a write returns the new data."""
+        create_recipe(user=self.user)
+        res1 = self.client.get(RECIPES_URL)
+        create_recipe(user=self.user)
+
+        res2 = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=res1['ETag'])
+
+        self.assertEqual(res2.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res2.data['results']), 2)
+
+    @override_settings(RECIPE_CACHE_TIMEOUT=0)
+    def test_cache_turned_off(self):
+        """Test a zero timeout neither caches responses nor answers 304."""
+        create_recipe(user=self.user)
+        res1 = self.client.get(RECIPES_URL)
+
+        res2 = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=res1.get('ETag', '"x"'))
+
+        self.assertNotIn('ETag', res1)
+        self.assertEqual(res2.status_code, status.HTTP_200_OK)
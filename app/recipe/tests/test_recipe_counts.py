@@ -0,0 +1,125 @@
+"""
+Tests for the recipe counts on tags and ingredients.
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title.',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeCountTests(TestCase):
+    """Test recipe_count is kept up to date."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def assertCount(self, obj, expected):
+        obj.refresh_from_db()
+        self.assertEqual(obj.recipe_count, expected)
+
+    def test_counts_follow_recipe_links(self):
+        """Test adding, removing and clearing links updates the counts."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Tofu')
+        r1 = create_recipe(user=self.user)
+        r2 = create_recipe(user=self.user)
+
+        r1.tags.add(tag)
+        r1.tags.add(tag)  # adding again is a no-op
+        r2.tags.add(tag)
+        r1.ingredients.add(ingredient)
+        self.assertCount(tag, 2)
+        self.assertCount(ingredient, 1)
+
+        r1.tags.remove(tag)
+        r1.tags.remove(tag)
+        self.assertCount(tag, 1)
+
+        r2.tags.clear()
+        self.assertCount(tag, 0)
+
+        ingredient.recipe_set.add(r2)
+        self.assertCount(ingredient, 2)
+        ingredient.recipe_set.clear()
+        self.assertCount(ingredient, 0)
+
+    def test_counts_follow_api_writes(self):
+        """Test creating, updating and deleting recipes through the API updates the counts."""
+        payload = {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': Decimal('5.50'),
+            'tags': [{'name': 'Dinner'}, {'name': 'Spicy'}],
+        }
+        res = self.client.post(RECIPES_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        url = reverse('recipe:recipe-detail', args=[res.data['id']])
+        dinner = Tag.objects.get(user=self.user, name='Dinner')
+        spicy = Tag.objects.get(user=self.user, name='Spicy')
+        self.assertCount(dinner, 1)
+
+        self.client.patch(url, {'tags': [{'name': 'Dinner'}]}, format='json')
+        self.assertCount(dinner, 1)
+        self.assertCount(spicy, 0)
+
+        self.client.delete(url)
+        self.assertCount(dinner, 0)
+
+    def test_list_counts_and_ordering(self):
+        """Test tags list includes counts and can be ordered by them."""
+        popular = Tag.objects.create(user=self.user, name='Dinner')
+        used = Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Breakfast')
+        for _ in range(2):
+            create_recipe(user=self.user).tags.add(popular)
+        create_recipe(user=self.user).tags.add(used, popular)
+
+        res = self.client.get(TAGS_URL, {'ordering': '-recipe_count'})
+
+        self.assertEqual(
+            [(t['name'], t['recipe_count']) for t in res.data['results']],
+            [('Dinner', 3), ('Vegan', 1), ('Breakfast', 0)],
+        )
+
+    def test_reconcile_command(self):
+        """Test the reconcile command fixes drifted counts in batches."""
+        tags = [Tag.objects.create(user=self.user, name=f'Tag {i}') for i in range(5)]
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(*tags[:3])
+        Tag.objects.filter(pk__in=[tags[0].pk, tags[4].pk]).update(recipe_count=7)  # ie a raw sql write skipped the signals
+
+        out = StringIO()
+        call_command('reconcile_recipe_counts', '--batch-size', '2', '--dry-run', stdout=out)
+        self.assertIn('Tags: checked 5, found 2 drifted counts.', out.getvalue())
+        self.assertCount(tags[0], 7)
+
+        out = StringIO()
+        call_command('reconcile_recipe_counts', '--batch-size', '2', stdout=out)
+        self.assertIn('Tags: checked 5, fixed 2 drifted counts.', out.getvalue())
+        self.assertCount(tags[0], 1)
+        self.assertCount(tags[4], 0)
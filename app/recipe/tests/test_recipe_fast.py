@@ -0,0 +1,69 @@
+"""
+Tests for the fast read path of the list endpoints.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from core.renderers import FastJSONRenderer
+from recipe.fast import get_values_serializer
+from recipe.serializers import RecipeSerializer, TagSerializer, IngredientSerializer
+
+
+class FastReadPathTests(TestCase):
+    """Test the fast read path renders the same bytes as the serializers."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.client.force_authenticate(self.user)
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        spicy = Tag.objects.create(user=self.user, name='Spicy 🌶')
+        tofu = Ingredient.objects.create(user=self.user, name='Tofu')
+        Ingredient.objects.create(user=self.user, name='Unused')
+        for i, price in enumerate([Decimal('5.5'), Decimal('0.01'), Decimal('999.99')]):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Recipe ñ {i}', time_minutes=i, price=price, link='' if i else 'https://example.com/ ',
+            )
+            recipe.tags.add(*[spicy, vegan][:i])
+            if i:
+                recipe.ingredients.add(tofu)
+
+    def test_rows_match_serializer(self):
+        """Test .values() rows render byte for byte like the ModelSerializers."""
+        for serializer_class, queryset in [
+            (RecipeSerializer, Recipe.objects.for_action('list').order_by('-id')),
+            (TagSerializer, Tag.objects.order_by('-name')),
+            (IngredientSerializer, Ingredient.objects.order_by('-name')),
+        ]:
+            fast_serializer = get_values_serializer(serializer_class)
+            fast = fast_serializer.render_rows(list(fast_serializer.values(queryset)))
+            slow = serializer_class(queryset, many=True).data
+            self.assertEqual(FastJSONRenderer().render(fast), JSONRenderer().render(slow), serializer_class.__name__)
+
+    def test_api_responses_match(self):
+        """Test the list endpoints return the same bodies with the fast read path on and off."""
+        tag_ids = ','.join(str(pk) for pk in Tag.objects.values_list('id', flat=True))
+        for url, params in [
+            (reverse('recipe:recipe-list'), {}),
+            (reverse('recipe:recipe-list'), {'page_size': 2}),
+            (reverse('recipe:recipe-list'), {'tags': tag_ids, 'search': 'recipe'}),
+            (reverse('recipe:recipe-list'), {'fields': 'title,price,tags', 'page_size': 2}),
+            (reverse('recipe:recipe-list'), {'expand': 'description'}),
+            (reverse('recipe:tag-list'), {'ordering': '-recipe_count'}),
+            (reverse('recipe:ingredient-list'), {'assigned_only': 1}),
+        ]:
+            bodies = []
+            for enabled in (True, False):
+                cache.clear()
+                with override_settings(API_FAST_READ_PATH=enabled):
+                    bodies.append(self.client.get(url, params).content)
+            self.assertEqual(bodies[0], bodies[1], (url, params))
@@ -0,0 +1,88 @@
+"""
+Tests for serving recipe images to their owners.
+"""
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+
+def media_url(path):
+    return reverse('media', args=[path])
+
+
+@override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='/protected/media/')
+class MediaTests(TestCase):
+    """Test the media endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.client.force_authenticate(self.user)
+        self.image = 'uploads/recipe/0b7e5a3e-8a4c-4f8e-9d55-5a0e1c7b2f10.jpg'
+        self.recipe = Recipe.objects.create(user=self.user, title='Recipe', time_minutes=5, price='5.00', image=self.image)
+
+    def test_owner_gets_accel_redirect(self):
+        """Test nginx is told to send the image of the user's recipe."""
+        res = self.client.get(media_url(self.image))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['X-Accel-Redirect'], f'/protected/media/{self.image}')
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('private', res['Cache-Control'])
+        self.assertEqual(res.content, b'')
+
+    def test_variant(self):
+        """Test the variants of the user's image are served too."""
+        variant = f'{os.path.splitext(self.image)[0]}/card.webp'
+
+        res = self.client.get(media_url(variant))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['X-Accel-Redirect'], f'/protected/media/{variant}')
+        self.assertEqual(res['Content-Type'], 'image/webp')
+
+    def test_other_users_image_not_found(self):
+        """Test images of other users' recipes aren't served."""
+        other = get_user_model().objects.create_user(email='other@example.com', password='password123')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(media_url(self.image))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(res.has_header('X-Accel-Redirect'))
+
+    def test_path_traversal_not_found(self):
+        """Test paths leaving the media dir are rejected."""
+        for path in [f'{os.path.splitext(self.image)[0]}/../../../../etc/passwd', f'{self.image}/..']:
+            res = self.client.get(media_url(path))
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND, path)
+
+    def test_auth_required(self):
+        """Test anonymous requests are rejected."""
+        res = APIClient().get(media_url(self.image))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='')
+    def test_streamed_without_nginx(self):
+        """Test django sends the file itself without an X-Accel-Redirect prefix."""
+        name = default_storage.save(self.image, ContentFile(b'jpeg bytes'))
+        self.addCleanup(default_storage.delete, name)
+        Recipe.objects.filter(id=self.recipe.id).update(image=name)
+
+        res = self.client.get(media_url(name))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(res.streaming_content), b'jpeg bytes')
+        self.assertFalse(res.has_header('X-Accel-Redirect'))
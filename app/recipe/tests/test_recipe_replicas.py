@@ -0,0 +1,111 @@
+"""
+Tests for reading recipes, tags and ingredients from a read replica.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.db_router import read_alias, replica_status
+from core.models import Recipe, Tag
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+# the stand-in replica is a second alias for the test database, like DB_REPLICA_HOSTS replicas are in tests (TEST MIRROR), added
+# here so the tests don't depend on it being set; data must be committed to be seen from its connection, hence TransactionTestCase
+@override_settings(DB_REPLICAS=['replica'], DB_REPLICA_MAX_LAG=5, DB_REPLICA_PIN_SECONDS=10)
+class ReplicaReadsTests(TransactionTestCase):
+    """Test safe requests to the recipe views read from the replica."""
+
+    def setUp(self):
+        connections.settings['replica'] = {**connections['default'].settings_dict, 'TEST': {'MIRROR': 'default'}}
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = Recipe.objects.create(user=self.user, title='Sample recipe', time_minutes=5, price='5.50')
+        recipe.tags.add(tag)
+        cache.clear()  # the writes above pinned the user to the primary
+        replica_status.reset()
+
+    def tearDown(self):
+        connections['replica'].close()
+        del connections.settings['replica']
+        delattr(connections._connections, 'replica')
+
+    def get(self, url):
+        """Return the response and the queries run on the replica for it."""
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, replica_queries
+
+    def test_lists_read_from_replica(self):
+        """Test the recipe and tag lists are read from the replica."""
+        for url in (RECIPES_URL, TAGS_URL):
+            res, replica_queries = self.get(url)
+
+            self.assertEqual(len(res.data['results']), 1)
+            self.assertGreater(len(replica_queries), 0, url)
+        self.assertIsNone(read_alias.get())  # back on the primary once the request is done
+        self.assertEqual(replica_status.snapshot()['routed'], {'replica': 2})
+
+    def test_pinned_to_primary_after_write(self):
+        """Test a user's reads go to the primary for a while after they write, so they see their changes."""
+        res = self.client.post(RECIPES_URL, {'title': 'New recipe', 'time_minutes': 10, 'price': '2.00'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res, replica_queries = self.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertEqual(len(replica_queries), 0)
+        self.assertEqual(replica_status.snapshot()['routed'], {'primary_pinned': 1})
+
+    def test_other_users_not_pinned(self):
+        """Test one user's writes don't pin another user to the primary."""
+        other = get_user_model().objects.create_user(email='other@example.com', password='password123')
+        Recipe.objects.create(user=other, title='Other recipe', time_minutes=5, price='5.50')  # pins other
+
+        _, replica_queries = self.get(RECIPES_URL)
+
+        self.assertGreater(len(replica_queries), 0)
+
+    @patch('core.db_router.measure_lag', return_value=30.0)
+    def test_lagging_replica_falls_back_to_primary(self, patched_measure_lag):
+        """Test reads go to the primary while the replica lags more than DB_REPLICA_MAX_LAG."""
+        _, replica_queries = self.get(RECIPES_URL)
+        self.get(RECIPES_URL + '?match=all')
+
+        self.assertEqual(len(replica_queries), 0)
+        patched_measure_lag.assert_called_once_with('replica')  # measured once per DB_REPLICA_LAG_CHECK_SECONDS
+        self.assertEqual(replica_status.snapshot()['routed'], {'primary_lagging': 2})
+
+    @patch('core.db_router.measure_lag', return_value=None)
+    def test_unreachable_replica_falls_back_to_primary(self, patched_measure_lag):
+        """Test reads go to the primary when the replica's lag can't be measured."""
+        _, replica_queries = self.get(TAGS_URL)
+
+        self.assertEqual(len(replica_queries), 0)
+
+    def test_writes_go_to_primary(self):
+        """Test unsafe requests read and write on the primary."""
+        tag = Tag.objects.get()
+        cache.clear()
+
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            res = self.client.patch(reverse('recipe:tag-detail', args=[tag.id]), {'name': 'Vegetarian'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(replica_queries), 0)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Vegetarian')
@@ -0,0 +1,160 @@
+"""
+Tests for searching recipes.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.search import get_backend
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe."""
+    defaults = {
+        'title': 'Sample recipe title.',
+        'description': '',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+# recipes are reindexed when the transaction writing them commits, which a TestCase's never does
+class RecipeSearchTests(TransactionTestCase):
+    """Test the recipe search parameter."""
+
+    def setUp(self):
+        cache.clear()
+        if hasattr(get_backend(), 'rebuild'):
+            get_backend().rebuild()  # the in process index outlives each test's db rollback
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='password123')
+        self.client.force_authenticate(self.user)
+
+    def search(self, text, **params):
+        res = self.client.get(RECIPES_URL, {'search': text, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res
+
+    def search_titles(self, text):
+        return [r['title'] for r in self.search(text).data['results']]
+
+    def test_search_title_and_description(self):
+        """Test recipes matching the text in title or description are returned."""
+        create_recipe(user=self.user, title='Garlic bread')
+        create_recipe(user=self.user, title='Pasta', description='Lots of garlic and oil')
+        create_recipe(user=self.user, title='Pancakes')
+
+        self.assertEqual(sorted(self.search_titles('garlic')), ['Garlic bread', 'Pasta'])
+
+    def test_search_ranks_title_first(self):
+        """Test title matches rank above description matches."""
+        create_recipe(user=self.user, title='Pasta', description='Lots of garlic')
+        create_recipe(user=self.user, title='Garlic bread')
+
+        self.assertEqual(self.search_titles('garlic'), ['Garlic bread', 'Pasta'])
+
+    def test_search_tags_and_ingredients(self):
+        """Test recipes are found by tag and ingredient names."""
+        r1 = create_recipe(user=self.user, title='Curry')
+        r1.tags.add(Tag.objects.create(user=self.user, name='Spicy'))
+        r2 = create_recipe(user=self.user, title='Salsa')
+        r2.ingredients.add(Ingredient.objects.create(user=self.user, name='Jalapeno'))
+
+        self.assertEqual(self.search_titles('spicy'), ['Curry'])
+        self.assertEqual(self.search_titles('jalapeno'), ['Salsa'])
+
+    def test_search_all_terms_required(self):
+        """Test every search term has to match."""
+        create_recipe(user=self.user, title='Garlic bread')
+        create_recipe(user=self.user, title='Garlic prawns')
+
+        self.assertEqual(self.search_titles('garlic prawns'), ['Garlic prawns'])
+
+    def test_index_follows_tag_changes(self):
+        """Test renaming, removing and deleting tags updates the results."""
+        recipe = create_recipe(user=self.user, title='Curry')
+        tag = Tag.objects.create(user=self.user, name='Spicy')
+        recipe.tags.add(tag)
+
+        tag.name = 'Mild'
+        tag.save()
+        self.assertEqual(self.search_titles('spicy'), [])
+        self.assertEqual(self.search_titles('mild'), ['Curry'])
+
+        recipe.tags.remove(tag)
+        self.assertEqual(self.search_titles('mild'), [])
+
+        recipe.tags.add(tag)
+        tag.delete()
+        self.assertEqual(self.search_titles('mild'), [])
+
+    def test_index_follows_recipe_updates(self):
+        """Test updating a recipe through the API updates the results."""
+        recipe = create_recipe(user=self.user, title='Curry')
+
+        self.client.patch(reverse('recipe:recipe-detail', args=[recipe.id]), {'title': 'Stew'})
+
+        self.assertEqual(self.search_titles('curry'), [])
+        self.assertEqual(self.search_titles('stew'), ['Stew'])
+
+    def test_search_limited_to_user(self):
+        """Test other users' recipes aren't returned."""
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='password123')
+        create_recipe(user=other_user, title='Garlic bread')
+
+        self.assertEqual(self.search_titles('garlic'), [])
+
+    def test_search_paginated_by_rank(self):
+        """Test search results are paged in rank order."""
+        create_recipe(user=self.user, title='Soup', description='garlic')
+        create_recipe(user=self.user, title='Garlic soup')
+        create_recipe(user=self.user, title='Garlic bread')
+
+        res = self.search('garlic', page_size=2)
+        first_page = [r['title'] for r in res.data['results']]
+        res = self.client.get(res.data['next'])
+        second_page = [r['title'] for r in res.data['results']]
+
+        self.assertEqual(sorted(first_page), ['Garlic bread', 'Garlic soup'])
+        self.assertEqual(second_page, ['Soup'])
+
+    def test_recipe_create_indexed_once(self):
+        """Test creating a recipe with tags and ingredients reindexes it once, on commit."""
+        payload = {
+            'title': 'Curry', 'time_minutes': 30, 'price': '5.00',
+            'tags': [{'name': 'Spicy'}], 'ingredients': [{'name': 'Rice'}],
+        }
+        with patch.object(get_backend(), 'update', wraps=get_backend().update) as patched_update:
+            res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        patched_update.assert_called_once_with([res.data['id']])
+        self.assertEqual(self.search_titles('spicy rice'), ['Curry'])
+
+    def test_index_after_rolled_back_savepoint(self):
+        """Test recipes written after a rolled back savepoint are still indexed on commit."""
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    create_recipe(user=self.user, title='Stew')
+                    raise ValueError
+            except ValueError:
+                pass
+            create_recipe(user=self.user, title='Curry')
+
+        self.assertEqual(self.search_titles('curry'), ['Curry'])
+        self.assertEqual(self.search_titles('stew'), [])
@@ -61,7 +61,7 @@ class PrivateTagsAPITests(TestCase):
         serializer = TagSerializer(tags, many=True)  # serialize the result of query, and will me multiple obj
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """Test list of tags is limited to authenticated user."""
@@ -72,9 +72,9 @@ class PrivateTagsAPITests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)  # only expect the auth user's tag to be included, not the other user's
-        self.assertEqual(res.data[0]['name'], tag.name)  # to check 1st result matches auth user's created tag
-        self.assertEqual(res.data[0]['id'], tag.id)
+        self.assertEqual(len(res.data['results']), 1)  # only expect the auth user's tag to be included, not the other user's
+        self.assertEqual(res.data['results'][0]['name'], tag.name)  # to check 1st result matches auth user's created tag
+        self.assertEqual(res.data['results'][0]['id'], tag.id)
 
     def test_update_tag(self):
         """Test updating a tag."""
@@ -89,6 +89,17 @@ class PrivateTagsAPITests(TestCase):
         tag.refresh_from_db()  # required for put/patch
         self.assertEqual(tag.name, payload.get('name'))
 
+    def test_update_tag_duplicate_name_error(self):
+        """Test renaming a tag to a name the user already has returns an error."""
+        Tag.objects.create(user=self.user, name='Dessert')
+        tag = Tag.objects.create(user=self.user, name='After Dinner')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'Dessert'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'After Dinner')
+
     def test_delete_tag(self):
         """Test deleting a tag."""
         tag = Tag.objects.create(user=self.user, name='Breakfast')
@@ -111,13 +122,14 @@ class PrivateTagsAPITests(TestCase):
             user=self.user,
         )
         recipe.tags.add(tag1)
+        tag1.refresh_from_db()  # picks up the recipe_count the add updated
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})  # assigned_only is an optional parameter
 
         s1 = TagSerializer(tag1)
         s2 = TagSerializer(tag2)
-        self.assertIn(s1.data, res.data)
-        self.assertNotIn(s2.data, res.data)  # make sure tag 2 is not in data since it wasn't assigned to recipe
+        self.assertIn(s1.data, res.data['results'])
+        self.assertNotIn(s2.data, res.data['results'])  # make sure tag 2 is not in data since it wasn't assigned to recipe
 
     def test_filtered_tags_unique(self):
         """Test filtered tags returns a unique list."""
@@ -140,4 +152,16 @@ class PrivateTagsAPITests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})  # assigned_only is an optional parameter
 
-        self.assertEqual(len(res.data), 1)  # make sure just 1 unique tag is returned
\ No newline at end of file
+        self.assertEqual(len(res.data['results']), 1)  # make sure just 1 unique tag is returned
+
+    def test_tags_paginated_by_name(self):
+        """Test tags list is paginated by name descending."""
+        Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Dinner')
+        Tag.objects.create(user=self.user, name='Lunch')
+
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+
+        self.assertEqual([t['name'] for t in res.data['results']], ['Lunch', 'Dinner'])
+        res = self.client.get(res.data['next'])
+        self.assertEqual([t['name'] for t in res.data['results']], ['Breakfast'])
@@ -1,29 +1,153 @@
 """
 Views for the recipe APIs.
 """
+import mimetypes
+import posixpath
+from urllib.parse import quote
+
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
+    inline_serializer,
     OpenApiParameter,
     OpenApiTypes,
 )
 
-from rest_framework import viewsets, mixins, status  # mixins are fns you can mix into the view for addtl use
-from rest_framework.decorators import action
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from django.utils.translation import gettext as _
+
+from rest_framework import viewsets, mixins, status, serializers as drf_serializers  # mixins are fns you can mix into the view for addtl use
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 
+from core.async_views import run_in_thread_pool
+from core.authentication import CachedTokenAuthentication
+from core.db_router import choose_read_alias, read_alias
+from core.metrics import timed_serialization
 from core.models import Recipe, Tag, Ingredient
 from . import serializers
+from .bulk import NDJSONParser, NDJSONRenderer, import_recipes, export_recipes
+from .fast import get_values_serializer
+from .cache import response_cache_key, etag_for_key, get_timeout
+from .images import schedule_image_processing, delete_image_variants
+from .pagination import RecipeCursorPagination, RecipeAttrCursorPagination
+from .search import search_recipes
 
 
 # ADDED THIS MANUALLY, MAKE SURE PERMISSIONS AND AUTH WORKS ACROSS ALL API ENDPOINTS IN SWAGGER API SITE
 class BaseAuthPermissions():
-    authentication_classes = [TokenAuthentication]  # users must have a token
+    authentication_classes = [CachedTokenAuthentication]  # users must have a token
     permission_classes = [IsAuthenticated]  # users must be authenticated
 
 
+# caches list/retrieve response data per user (see recipe.cache) and answers If-None-Match with a 304 and no body
+class CachedResponseMixin():
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(super().retrieve, request, *args, **kwargs)
+
+    def _cached_response(self, handler, request, *args, **kwargs):
+        if get_timeout() <= 0:  # turned off
+            return handler(request, *args, **kwargs)
+        key = response_cache_key(request, self.action, kwargs.get('pk'))
+        etag = etag_for_key(key)
+        client_etags = [tag[2:] if tag.startswith('W/') else tag for tag in parse_etags(request.headers.get('If-None-Match', ''))]  # weak comparison, compressed responses get W/ etags
+        if etag in client_etags:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = cache.get(key)
+            if data is None:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, get_timeout())
+            else:
+                response = Response(data)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)  # clients may keep it but must revalidate with the ETag
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+
+# builds list pages from .values() rows (recipe.fast) instead of model instances + ModelSerializer, same output
+class FastListMixin():
+    def get_selected_fields(self):
+        """Return the serializer fields to render, or None for all of them."""
+        return None
+
+    def list(self, request, *args, **kwargs):
+        fast_serializer = settings.API_FAST_READ_PATH and get_values_serializer(self.get_serializer_class(), self.get_selected_fields())
+        if not fast_serializer:  # turned off, or fields only the serializer can render (ie image urls)
+            return super().list(request, *args, **kwargs)
+        queryset = fast_serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+        with timed_serialization():
+            data = fast_serializer.render_rows(rows)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+
+# under ASGI (SERVER_MODE=asgi) the routes of async_actions are served by async views (core.async_views), so slow requests to them
+# don't queue behind each other on the single thread django 3.2 runs sync views on; a route covers all its methods, ie the list route's create too
+class AsyncActionsMixin():
+    async_actions = ('list',)
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if settings.SERVER_MODE == 'asgi' and set(actions.values()) & set(cls.async_actions):
+            return run_in_thread_pool(view)
+        return view
+
+
+# safe requests read from a replica (core.db_router) once authenticated; authentication itself and any other reads before then, like
+# everything done for unsafe requests, stay on the primary. the user's writes (recipe.cache.bump_user_version) pin them to the primary
+class ReplicaReadMixin():
+    def dispatch(self, request, *args, **kwargs):
+        token = read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            read_alias.reset(token)  # threads serve many requests, the next one starts on the primary
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            read_alias.set(choose_read_alias(request.user.id))
+
+
+# sparse fieldsets for the recipe list/detail, ie ?fields=id,title,time_minutes or ?expand=description
+FIELD_SELECTION_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='Comma separated list of the fields to return, from: %s. Defaults to all of the endpoint\'s fields.'
+                    % ', '.join(serializers.RecipeDetailSerializer.Meta.fields),
+    ),
+    OpenApiParameter(
+        'expand',
+        OpenApiTypes.STR,
+        description='Comma separated list of extra fields to add to the list results: %s.'
+                    % ', '.join(f for f in serializers.RecipeDetailSerializer.Meta.fields if f not in serializers.RecipeSerializer.Meta.fields),
+    ),
+]
+
+
 # update the api docs auto generated in swagger/drf spectacular schema
 @extend_schema_view(
     list=extend_schema(  # 'list' means extend the schema for the list endpoint
@@ -37,52 +161,125 @@ class BaseAuthPermissions():
                 'ingredients',
                 OpenApiTypes.STR,
                 description='Comma separated list of ingredient IDs to filter'
-            )
+            ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR, enum=['any', 'all'],
+                description='any (default) returns recipes with at least one of the tags/ingredients, all only those with every one',
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description='Text to search for in recipe titles, descriptions, tags and ingredients; results are ranked best match first',
+            ),
+            *FIELD_SELECTION_PARAMETERS,
         ]
-    )
+    ),
+    retrieve=extend_schema(parameters=FIELD_SELECTION_PARAMETERS),
 )
 # this viewset will handle multiple endpoints (list, detail) as well as different actions (GET, POST, PUT, PATCH, DELETE)
 class RecipeViewSet(
+    AsyncActionsMixin,
+    ReplicaReadMixin,
     BaseAuthPermissions,
+    CachedResponseMixin,
+    FastListMixin,
     viewsets.ModelViewSet
 ):
     """View for manage recipe APIs."""
     serializer_class = serializers.RecipeDetailSerializer  # related serializer model to respond with to request
     queryset = Recipe.objects.all()  # queryset represents the objects available for this viewset
+    pagination_class = RecipeCursorPagination  # list responses are paginated by cursor ie {'next': ..., 'previous': ..., 'results': [...]}
     # authentication_classes = [TokenAuthentication]  # users must have a token
     # permission_classes = [IsAuthenticated]  # users must be authenticated
 
-    def _params_to_ints(self, qs):
+    async_actions = ('list', 'upload_image')  # uploads are read by the ASGI server before the view runs, a slow client holds no thread
+    MATCH_MODES = ('any', 'all')
+    MAX_ID = 2 ** 63 - 1  # BigAutoField, larger values would make the db raise instead of just not matching
+
+    def _params_to_ints(self, qs, param):
         """Convert a list of strings to integers."""
-        return [int(str_id) for str_id in qs.split(',')]  # string in qs looks like this: "1,2,3"
+        try:
+            ids = [int(str_id) for str_id in qs.split(',')]  # string in qs looks like this: "1,2,3"
+        except ValueError:
+            ids = None
+        if not ids or not all(0 < id_ <= self.MAX_ID for id_ in ids):
+            raise ValidationError({param: [_('Expected a comma separated list of IDs.')]})  # 400 instead of a 500 from int()
+        return ids
 
     # overriding the get_queryset fn since need to create specific queryset for user accessing it (otherwise would return result of all global recipes)
     def get_queryset(self):
         """Retrieve recipes for the authenticated user."""
         tags = self.request.query_params.get('tags')  # query_params seems to be like request.user which is included in django view request objects
         ingredients = self.request.query_params.get('ingredients')
+        match = self.request.query_params.get('match', 'any')
+        if match not in self.MATCH_MODES:
+            raise ValidationError({'match': [_('Expected one of: %s.') % ', '.join(self.MATCH_MODES)]})
         queryset = self.queryset
         if tags:
             # return the queryset of recipes filtered/containing the tags
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            tag_ids = self._params_to_ints(tags, 'tags')
+            queryset = queryset.with_related('tags', tag_ids, match_all=match == 'all')
         if ingredients:
-            ingredients_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredients_ids)
+            ingredients_ids = self._params_to_ints(ingredients, 'ingredients')
+            queryset = queryset.with_related('ingredients', ingredients_ids, match_all=match == 'all')
+        search = self.request.query_params.get('search', '').strip()
+        if search and self.action == 'list':
+            queryset = search_recipes(queryset, search)  # adds a search_rank the pagination orders by
+        queryset = queryset.for_action(self.action)
+        if self.get_selected_fields() is not None:
+            queryset = queryset.for_fields(self.get_selected_fields())  # skip the columns and prefetches of fields that weren't asked for
         return queryset.filter(
             user=self.request.user
-        ).order_by('-id').distinct() # self.request trails back to parent View class's request object. request contains headers, query params, data (request body), and user if auth is required
+        ).order_by('-id')  # the filters above are subqueries, so no duplicate rows to DISTINCT away; self.request trails back to parent View class's request object. request contains headers, query params, data (request body), and user if auth is required
 
     # manage the serializer returned based on the request
     def get_serializer_class(self):
         """Return the serializer class for request."""
         # if the action is a list action (not detail) then return a list, else detail
         if self.action == 'list':
+            if set(self.get_selected_fields() or []) - set(serializers.RecipeSerializer.Meta.fields):
+                return serializers.RecipeDetailSerializer  # ?expand= or ?fields= asked for detail fields
             return serializers.RecipeSerializer  # return reference to class, not an instance
         elif self.action == 'upload_image':  # upload_image is a custom action we define in our recipe viewset
             return serializers.RecipeImageSerializer
+        elif self.action in ('bulk', 'export'):
+            return serializers.RecipeBulkSerializer
         return self.serializer_class
 
+    def _field_names_param(self, param):
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        return list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+
+    def get_selected_fields(self):
+        """Return the fields chosen with ?fields= and ?expand=, or None for the endpoint's defaults."""
+        if self.action not in ('list', 'retrieve'):
+            return None
+        if not hasattr(self, '_selected_fields'):  # the view instance only lives for one request
+            available = serializers.RecipeDetailSerializer.Meta.fields
+            default = serializers.RecipeSerializer.Meta.fields if self.action == 'list' else available
+            fields, expand = self._field_names_param('fields'), self._field_names_param('expand')
+            errors = {}
+            if fields is not None and (not fields or set(fields) - set(available)):
+                errors['fields'] = [_('Expected a comma separated list of fields from: %s.') % ', '.join(available)]
+            expandable = [name for name in available if name not in default]
+            if expand and set(expand) - set(expandable):
+                errors['expand'] = [_('Expected a comma separated list of fields from: %s.') % ', '.join(expandable)]
+            if errors:
+                raise ValidationError(errors)
+            if fields is None and not expand:
+                self._selected_fields = None
+            else:
+                self._selected_fields = list(dict.fromkeys((default if fields is None else fields) + (expand or [])))
+        return self._selected_fields
+
+    def get_serializer(self, *args, **kwargs):
+        if self.get_selected_fields() is not None:
+            kwargs['fields'] = self.get_selected_fields()  # see serializers.SelectableFieldsMixin
+        return super().get_serializer(*args, **kwargs)
+
     # use builtin perform_create to modify how django saves a serializer/model (should only apply to POST method)
     def perform_create(self, serializer):  # serializer is already validated prior to this fn call
         """Create a new recipe."""
@@ -97,11 +294,46 @@ class RecipeViewSet(
 
         # returning responses here like flask routes files if requests are valid/invalid
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            old_image_name = recipe.image.name
+            serializer.save(image_variants={})  # variants of the new image are generated in the background
+            delete_image_variants(old_image_name)
+            schedule_image_processing(recipe)
+            return Response(serializer.data, status=status.HTTP_200_OK)  # respond right away, image_variants fills in once processed
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        request=serializers.RecipeBulkSerializer(many=True),
+        responses=inline_serializer('RecipeBulkImportResult', fields={
+            'created': drf_serializers.IntegerField(),
+            'ids': drf_serializers.ListField(child=drf_serializers.IntegerField()),
+            'errors': drf_serializers.ListField(child=drf_serializers.DictField()),  # [{'row': 3, 'errors': {'title': [...]}}, ...]
+        }),
+        description='Create many recipes from a JSON array or an application/x-ndjson body (one recipe per line). '
+                    'Rows are validated and inserted in chunks; invalid rows are skipped and reported by row number.',
+    )
+    @action(methods=['POST'], detail=False, url_path='bulk', parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """Import recipes in bulk."""
+        created_ids, errors = import_recipes(request.data, self.get_serializer_context())
+        result = {'created': len(created_ids), 'ids': created_ids, 'errors': errors}
+        if errors and not created_ids:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        responses=serializers.RecipeBulkSerializer(many=True),
+        description='Stream all of your recipes as application/x-ndjson, one recipe per line, in the format the bulk endpoint accepts. '
+                    'Takes the same tags/ingredients/match filters as the list.',
+    )
+    @action(methods=['GET'], detail=False, url_path='export', renderer_classes=[JSONRenderer, NDJSONRenderer])
+    def export(self, request):
+        """Export recipes as NDJSON."""
+        rows = export_recipes(self.get_queryset(), self.get_serializer_context())
+        response = StreamingHttpResponse(rows, content_type='application/x-ndjson')  # sent as it's generated, memory use doesn't grow with the number of recipes
+        response['Content-Disposition'] = 'attachment; filename="recipes.ndjson"'
+        return response
+
 
 # documentation for tags and ingredients
 @extend_schema_view(
@@ -111,18 +343,27 @@ class RecipeViewSet(
                 'assigned_only',
                 OpenApiTypes.INT, enum=[0,1],  # enumerator for valid values that can be assigned to this param
                 description='Filter by items assigned to recipes.'
-            )
+            ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR, enum=list(RecipeAttrCursorPagination.ORDERINGS),
+                description='Sort by name or by recipe_count (number of recipes using the item), prefix with - for descending. Defaults to -name.'
+            ),
         ]
     )
 )
 class BaseRecipeAttrViewSet(
+    AsyncActionsMixin,
+    ReplicaReadMixin,
     BaseAuthPermissions,
+    FastListMixin,
     mixins.DestroyModelMixin,
     mixins.UpdateModelMixin,
     mixins.ListModelMixin,  # important to ALWAYS DEFINE MIXINS BEFORE VIEWSETS or they'll be overwritten
     viewsets.GenericViewSet,
 ):
     """Base viewset for recipe attributes."""
+    pagination_class = RecipeAttrCursorPagination
 
     def get_queryset(self):
         """Filter queryset to authenticated user."""
@@ -131,11 +372,19 @@ class BaseRecipeAttrViewSet(
         )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)  # this filters if there IS a recipe associated w queryset
+            queryset = queryset.filter(recipe_count__gt=0)  # this filters if there IS a recipe associated w queryset, using the (user, recipe_count) index instead of joining recipes
 
         return queryset.filter(
             user=self.request.user
-        ).order_by('-name').distinct()  # distinct() ensures only unique values added to result
+        ).order_by('-name')
+
+    def perform_update(self, serializer):
+        """Update the attribute, rejecting names the user already has."""
+        try:
+            with transaction.atomic():  # savepoint so the failed insert doesn't break the outer transaction
+                serializer.save()
+        except IntegrityError:  # unique (user, name) constraint
+            raise ValidationError({'name': [_('An item with this name already exists.')]})
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
@@ -148,3 +397,34 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage ingredients in the database."""
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
+
+
+# with MEDIA_ACCESS = 'protected' image urls point here instead of at nginx: django checks the image belongs to one of the user's recipes and
+# nginx sends the file (X-Accel-Redirect), so no worker is held up streaming it
+@extend_schema(
+    responses=OpenApiTypes.BINARY,
+    description='An uploaded recipe image or one of its variants, for the owner of the recipe only.',
+)
+@api_view(['GET'])
+@authentication_classes([CachedTokenAuthentication])
+@permission_classes([IsAuthenticated])
+def media(request, path):
+    """Returns an uploaded image of the user's recipes."""
+    if posixpath.normpath(path) != path or path.startswith(('/', '..')):
+        raise Http404  # only plain paths inside the media dir
+    # the original, uploads/recipe/<uuid>.jpg, or a variant of it, uploads/recipe/<uuid>/card.webp (recipe.images.variants_dir)
+    owner_filter = Q(image=path) | Q(image__startswith=f'{posixpath.dirname(path)}.')
+    if not Recipe.objects.filter(owner_filter, user=request.user).exists():
+        raise Http404
+
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'  # nginx keeps the content type of this response
+    if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_REDIRECT_PREFIX + path)
+    else:  # no nginx in front, ie runserver
+        try:
+            response = FileResponse(default_storage.open(path), content_type=content_type)
+        except FileNotFoundError:
+            raise Http404
+    patch_cache_control(response, private=True, max_age=365 * 24 * 60 * 60, immutable=True)  # file names are unique per upload, the bytes never change
+    return response
@@ -1,6 +1,9 @@
 """
 Tests for the user API.
 """
+from unittest.mock import patch
+
+from django.core.cache import cache
 from django.test import TestCase
 from django.contrib.auth import get_user_model  # the user model default is changed in 'core' app
 from django.urls import reverse
@@ -8,6 +11,8 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status  # this to access the different http status types ie 200, 400
 
+from user.throttles import LoginIPThrottle, LoginEmailThrottle
+
 
 # this references the api url endpoint that will be used to create users in user app
 CREATE_USER_URL = reverse('user:create')  # reverse() takes app name first, then endpoint
@@ -123,6 +128,57 @@ class PublicUserApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class LoginThrottleTests(TestCase):
+    """Test throttling of the token API."""
+
+    def setUp(self):
+        cache.clear()  # throttle history is kept in the cache
+        self.client = APIClient()
+        create_user(email='test@example.com', password='goodpass123')
+
+    def tearDown(self):
+        cache.clear()
+
+    @patch.dict(LoginEmailThrottle.THROTTLE_RATES, {'login_email': '2/min'})
+    def test_throttled_per_email(self):
+        """Test too many token requests for one email are throttled."""
+        payload = {'email': 'test@example.com', 'password': 'badpass123'}
+        for _ in range(2):
+            self.client.post(TOKEN_URL, payload)
+
+        res = self.client.post(TOKEN_URL, {**payload, 'email': 'TEST@example.com'}, REMOTE_ADDR='10.0.0.2')  # different IP and email case, same account
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        res = self.client.post(TOKEN_URL, {'email': 'other@example.com', 'password': 'badpass123'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)  # other emails are unaffected
+
+    @patch.dict(LoginIPThrottle.THROTTLE_RATES, {'login_ip': '2/min'})
+    def test_throttled_per_ip(self):
+        """Test too many token requests from one IP are throttled."""
+        for i in range(2):
+            self.client.post(TOKEN_URL, {'email': f'user{i}@example.com', 'password': 'badpass123'})
+
+        res = self.client.post(TOKEN_URL, {'email': 'test@example.com', 'password': 'goodpass123'})
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @patch.dict(LoginIPThrottle.THROTTLE_RATES, {'login_ip': '2/min'})
+    def test_throttled_per_ip_with_spoofed_forwarded_for(self):
+        """Test a client can't dodge the IP throttle by sending its own X-Forwarded-For."""
+        def post(i):
+            return self.client.post(
+                TOKEN_URL, {'email': f'user{i}@example.com', 'password': 'badpass123'},
+                HTTP_X_FORWARDED_FOR=f'10.0.0.{i}, 203.0.113.7',  # what the client sent, then the address nginx appended
+                REMOTE_ADDR='172.18.0.5',  # nginx
+            )
+        for i in range(2):
+            post(i)
+
+        res = post(2)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
 class PrivateUserApiTests(TestCase):
     """Test API requests that require authentication."""
 
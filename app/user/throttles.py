@@ -0,0 +1,26 @@
+"""
+Throttles for the user API.
+"""
+import hashlib
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginIPThrottle(SimpleRateThrottle):
+    """Limit token requests per client IP."""
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginEmailThrottle(SimpleRateThrottle):
+    """Limit token requests per email, whichever IPs they come from."""
+    scope = 'login_email'
+
+    def get_cache_key(self, request, view):
+        email = request.data.get('email')
+        if not email:
+            return None  # nothing to throttle on, the serializer rejects the request anyway
+        ident = hashlib.md5(str(email).strip().lower().encode()).hexdigest()  # the email as sent, may be too long or have characters memcached rejects
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
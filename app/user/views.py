@@ -1,14 +1,16 @@
 """
 Views for the user API.
 """
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from core.authentication import CachedTokenAuthentication
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
 )
+from user.throttles import LoginIPThrottle, LoginEmailThrottle
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -20,13 +22,14 @@ class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for user."""
     serializer_class = AuthTokenSerializer  # this overrides the default username:password auth with our customized AuthTokenSerializer class which is email:password
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES  # this to view in browsable api interface (Swagger)
+    throttle_classes = [LoginIPThrottle, LoginEmailThrottle]  # caps login attempts per IP and per email (rates in settings)
 
 
 # RetrieveUpdateAPIView supports GET, PUT and PATCH
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]  # using token auth
+    authentication_classes = [CachedTokenAuthentication]  # using token auth, cached per process
     permission_classes = [permissions.IsAuthenticated]  # checking if user has auth permissions
 
     # override the get_object method from RetrieveUpdateAPIView
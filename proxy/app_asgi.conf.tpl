@@ -0,0 +1,7 @@
+# SERVER_MODE=asgi: gunicorn + uvicorn workers, spoken to over http; keepalive isn't needed on the docker network
+proxy_pass              http://${APP_HOST}:${APP_PORT};
+proxy_http_version      1.1;
+proxy_set_header        Host $host;
+proxy_set_header        X-Forwarded-For $proxy_add_x_forwarded_for;
+proxy_set_header        X-Forwarded-Proto $scheme;
+proxy_redirect          off;
@@ -0,0 +1,6 @@
+# SERVER_MODE=wsgi: uwsgi, spoken to in the uwsgi protocol
+uwsgi_pass              ${APP_HOST}:${APP_PORT};
+include                 /etc/nginx/uwsgi_params;
+# the client's X-Forwarded-For with the address nginx got the request from appended, replacing the header as sent; the app's throttles
+# key on that last entry (NUM_PROXIES in settings), like gunicorn gets from proxy_set_header in app_asgi.conf.tpl
+uwsgi_param             HTTP_X_FORWARDED_FOR $proxy_add_x_forwarded_for;
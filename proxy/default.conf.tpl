@@ -1,13 +1,54 @@
 server {
     listen ${LISTEN_PORT};
 
-    location /static {
-        alias /vol/static;
+    set $media_access "${MEDIA_ACCESS}";  # public or protected, must match the app's MEDIA_ACCESS
+
+    # compress text responses nginx serves itself (static files) or gets uncompressed from the app; the app already compresses
+    # its own responses (core.middleware.CompressionMiddleware) and nginx passes those through as they are. images are not in
+    # gzip_types, they're already compressed
+    gzip                on;
+    gzip_comp_level     5;
+    gzip_min_length     1024;
+    gzip_proxied        any;
+    gzip_vary           on;
+    gzip_types          text/plain text/css text/javascript application/javascript application/json application/x-ndjson application/vnd.oai.openapi application/xml image/svg+xml;
+
+    # static files and uploads are sent by the kernel straight from the page cache (sendfile), their open file descriptors and metadata are
+    # cached; errors aren't, an image variant that's missing now is generated in the background moments later
+    sendfile            on;
+    tcp_nopush          on;
+    open_file_cache             max=2000 inactive=60s;
+    open_file_cache_valid       60s;
+    open_file_cache_errors      off;
+
+    # /static/static/<file> -> /vol/static/static/<file> (the app's STATIC_ROOT, shared through the static-data volume)
+    location /static/static/ {
+        root /vol;
+        add_header Cache-Control "public, max-age=3600";  # files collected without a hash in their name may change with a deploy
+        # names collectstatic hashed (core.storage.ManifestStaticStorage), ie base.5af66c1b1797.css; a changed file gets a new name
+        location ~ "\.[0-9a-f]{12}\.\w+$" {
+            add_header Cache-Control "public, max-age=31536000, immutable";
+        }
+    }
+
+    # uploaded recipe images and their variants, named by a uuid per upload, so the file behind a url never changes
+    location /static/media/ {
+        root /vol;
+        if ($media_access = "protected") {
+            return 404;  # only served through the app, see below
+        }
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+
+    # MEDIA_ACCESS=protected: /api/media/ checks the image belongs to the user and answers with X-Accel-Redirect: /protected/media/<name>,
+    # nginx then sends the file, with the Content-Type and Cache-Control of the app's response
+    location /protected/media/ {
+        internal;  # not reachable from outside
+        alias /vol/static/media/;
     }
 
     location / {
-        uwsgi_pass              ${APP_HOST}:${APP_PORT};
-        include                 /etc/nginx/uwsgi_params;
+        include                 /etc/nginx/conf.d/app.inc;  # how to reach the app server, app_wsgi.conf.tpl or app_asgi.conf.tpl by SERVER_MODE (run.sh)
         client_max_body_size    10M;
     }
 }
\ No newline at end of file
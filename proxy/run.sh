@@ -2,5 +2,6 @@
 
 set -e  # to make sure entire script fails if any of the subscripts fail
 
-envsubst < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf  # env substitute to insert our default.conf.tpl nginx file into our docker image environment, and substitute its dynamic variables ${} with the env variable that matches its name
+envsubst '${APP_HOST} ${APP_PORT}' < /etc/nginx/app_${SERVER_MODE}.conf.tpl > /etc/nginx/conf.d/app.inc  # only our variables, the file also uses nginx's ($host etc.)
+envsubst '${LISTEN_PORT} ${MEDIA_ACCESS}' < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf  # env substitute to insert our default.conf.tpl nginx file into our docker image environment, and substitute its dynamic variables ${} with the env variable that matches its name; only the ones listed, so nginx's own ($media_access etc.) are kept
 nginx -g 'daemon off;'  # starts nginx with the config above, but instead of running in background of the image, runs in the foreground so that all the logs can be output for the nginx server in our CLI
\ No newline at end of file
@@ -5,9 +5,61 @@
 # set -e: if any command within this file fails, then entire script fails
 set -e
 
-python manage.py wait_for_db  # need to wait for the db to be available or app will crash
-python manage.py collectstatic --noinput  # collects all initial static files
-python manage.py migrate  # run migrations that have been applied (updated) or created (first-time) so our db is up to date
+# need to wait for the db to be available or app will crash; retries with backoff, failing the container (so it's restarted) after the timeout
+python manage.py wait_for_db --timeout ${DB_WAIT_TIMEOUT:-60}
 
-# run uwsgi app/service on a tcp socket on port 9000 (nginx will connect to it); set app to run w/ 4 workers; --master sets this uwsgi app/service as the main app running on the nginx server; --enable-threads to allow multi-threading; --module to specify the module which is app > wsgi.py (not app.app.wsgi since this script will run within the main app dir)
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
\ No newline at end of file
+# settings the app can't run correctly with, ie a cache each worker process keeps its own copy of (core.checks), fail the container here;
+# warnings, ie a pgbouncer pool smaller than the request threads, are only printed
+python manage.py check --deploy --tag caches --tag database --fail-level ERROR
+
+# `run.sh migrate` runs the migrations as a one off job (ie before a rolling deploy, with MIGRATE_ON_START=0 on the app replicas) and exits
+if [ "$1" = "migrate" ]; then
+    exec python manage.py migrate_locked
+fi
+
+# static files and the OpenAPI schema are built into the image (Dockerfile), only the static files are published to the volume nginx
+# serves them from, and only when this image's differ from what's there; old hashed files stay, for replicas still running the last version
+STATIC_PUBLISH_ROOT=${STATIC_PUBLISH_ROOT:-/vol/web/static}
+if ! cmp -s "$STATIC_ROOT/staticfiles.json" "$STATIC_PUBLISH_ROOT/staticfiles.json"; then
+    cp -R "$STATIC_ROOT/." "$STATIC_PUBLISH_ROOT/"
+fi
+
+# run migrations that have been applied (updated) or created (first-time) so our db is up to date; returns straight away when there are
+# none, otherwise one replica migrates under a postgres advisory lock while the others wait for it
+if [ "${MIGRATE_ON_START:-1}" = "1" ]; then
+    python manage.py migrate_locked
+fi
+
+# SERVER_MODE picks the app server, the proxy service must be given the same value (it talks the uwsgi protocol to uwsgi, http to gunicorn)
+SERVER_MODE=${SERVER_MODE:-wsgi}
+
+if [ "$SERVER_MODE" = "asgi" ]; then
+    # gunicorn managing uvicorn workers running app.asgi, each serving many requests at once on an event loop; slow clients and uploads are read
+    # without holding a thread, the async views (core.async_views) run the ORM work on a thread pool; --forwarded-allow-ips trusts nginx's
+    # X-Forwarded-For, like uwsgi's REMOTE_ADDR from uwsgi_params
+    gunicorn app.asgi:application --bind :9000 --workers ${ASGI_WORKERS:-4} --worker-class uvicorn.workers.UvicornWorker --forwarded-allow-ips '*'
+else
+    # uwsgi reads any of its options from an UWSGI_<OPTION> env var (ie UWSGI_HARAKIRI=60 is --harakiri 60), so each of these can be overridden
+    # from the environment; the defaults are sized from the cpu count
+    CPU_COUNT=$(nproc)
+    SOMAXCONN=$(cat /proc/sys/net/core/somaxconn 2>/dev/null || echo 128)  # uwsgi refuses to start with a listen queue above the kernel's max
+    export UWSGI_PROCESSES=${UWSGI_PROCESSES:-$((CPU_COUNT * 2 + 1))}  # most workers cheaper mode may grow to
+    export UWSGI_THREADS=${UWSGI_THREADS:-2}  # threads per worker, requests mostly wait on the db; each keeps a db connection (CONN_MAX_AGE)
+    export UWSGI_CHEAPER=${UWSGI_CHEAPER:-$(( CPU_COUNT > 1 ? CPU_COUNT / 2 : 1 ))}  # fewest workers kept running when idle
+    export UWSGI_CHEAPER_INITIAL=${UWSGI_CHEAPER_INITIAL:-$CPU_COUNT}  # workers started with
+    export UWSGI_CHEAPER_STEP=${UWSGI_CHEAPER_STEP:-1}  # workers added at a time once all the running ones are busy
+    export UWSGI_CHEAPER_OVERLOAD=${UWSGI_CHEAPER_OVERLOAD:-5}  # seconds between checks, an idle worker above the minimum is stopped per check
+    export UWSGI_LISTEN=${UWSGI_LISTEN:-$(( SOMAXCONN < 1024 ? SOMAXCONN : 1024 ))}  # connections queued while all workers are busy
+    # seconds before a stuck request's worker is killed and replaced, with every request it's serving; it's the limit of each request,
+    # so it's sized for the longest legitimate one, the streamed recipe export (api/recipe/recipes/export/), which is cut off mid-stream
+    # past it. uwsgi 2.0 has no per route harakiri: the per request override (uwsgi.set_user_harakiri) is per worker, shared by its
+    # threads and cleared when any of their requests ends, and can only be shorter than this one; see RECIPE_IMPORT_CHUNK_SIZE in settings
+    export UWSGI_HARAKIRI=${UWSGI_HARAKIRI:-300}
+    export UWSGI_MAX_REQUESTS=${UWSGI_MAX_REQUESTS:-5000}  # requests before a worker is recycled, bounds slow memory leaks
+    export UWSGI_STATS=${UWSGI_STATS:-127.0.0.1:9191}  # stats server, read by the app's metrics endpoint (core.uwsgi_stats)
+    # the master imports the app (app.wsgi, which loads every view too) and forks the workers from it, so they share that memory; setting
+    # UWSGI_LAZY_APPS=1 makes each worker import its own copy instead, measured at 3x the boot time and 5x the private memory per worker
+
+    # run uwsgi app/service on a tcp socket on port 9000 (nginx will connect to it); --master sets this uwsgi app/service as the main app running on the nginx server; --enable-threads to allow multi-threading; --module to specify the module which is app > wsgi.py (not app.app.wsgi since this script will run within the main app dir)
+    uwsgi --socket :9000 --master --enable-threads --module app.wsgi
+fi